@@ -12,6 +12,20 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+from langchain_google_cloud_sql_mysql.embedding_cache import CachedEmbeddings
+from langchain_google_cloud_sql_mysql.indexes import (
+    BaseIndex,
+    DistanceStrategy,
+    FlatIndex,
+    IVFFlatIndex,
+)
+from langchain_google_cloud_sql_mysql.message_buffer import MessageWriteBuffer
+from langchain_google_cloud_sql_mysql.message_cache import MessageCache
+from langchain_google_cloud_sql_mysql.metrics import (
+    InMemoryMetricsSink,
+    MetricEvent,
+    OpenTelemetryMetricsSink,
+)
 from langchain_google_cloud_sql_mysql.mysql_chat_message_history import (
     MySQLChatMessageHistory,
 )
@@ -20,10 +34,24 @@ from langchain_google_cloud_sql_mysql.mysql_loader import (
     MySQLDocumentSaver,
     MySQLLoader,
 )
+from langchain_google_cloud_sql_mysql.mysql_vectorstore import CloudSQLVectorStore
+from langchain_google_cloud_sql_mysql.vector_codec import EmbeddingDtype
 
 __all__ = [
+    "BaseIndex",
+    "CachedEmbeddings",
+    "CloudSQLVectorStore",
+    "DistanceStrategy",
+    "EmbeddingDtype",
+    "FlatIndex",
+    "IVFFlatIndex",
+    "InMemoryMetricsSink",
+    "MessageCache",
+    "MessageWriteBuffer",
+    "MetricEvent",
     "MySQLChatMessageHistory",
     "MySQLDocumentSaver",
     "MySQLEngine",
     "MySQLLoader",
+    "OpenTelemetryMetricsSink",
 ]
@@ -0,0 +1,270 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# TODO: Remove below import when minimum supported Python version is 3.10
+from __future__ import annotations
+
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Sequence, TypeVar
+
+from langchain_core.embeddings import Embeddings
+from sqlalchemy import bindparam, text
+
+from .mysql_engine import MySQLEngine
+from .vector_codec import EmbeddingCodec
+
+T = TypeVar("T")
+
+DEFAULT_CACHE_SIZE = 10000
+DEFAULT_CACHE_BATCH_SIZE = 500
+
+# Separate key spaces, as models may embed queries and documents differently.
+_DOCUMENT = "document"
+_QUERY = "query"
+
+
+def _model_name(embedding_service: Embeddings) -> str:
+    for attribute in ("model", "model_name"):
+        value = getattr(embedding_service, attribute, None)
+        if isinstance(value, str) and value:
+            return value
+    return type(embedding_service).__name__
+
+
+class CachedEmbeddings(Embeddings):
+    """Embeddings wrapper that caches embeddings of repeated texts.
+
+    Embeddings are keyed by the SHA-256 of the model name, the kind of
+    embedding (query or document) and the text. Lookups go to an in-process
+    LRU tier first and then, if configured, to a MySQL table created with
+    `MySQLEngine.init_embedding_cache_table`. Only texts missing from both
+    tiers are sent to the wrapped service, in batches of `batch_size`.
+
+    Example:
+        .. code-block:: python
+
+            engine.init_embedding_cache_table("embedding_cache")
+            embedding = CachedEmbeddings(
+                VertexAIEmbeddings(model_name="textembedding-gecko@003"),
+                engine=engine,
+                table_name="embedding_cache",
+            )
+            vectorstore = CloudSQLVectorStore(engine, embedding, "my_table")
+    """
+
+    def __init__(
+        self,
+        embedding_service: Embeddings,
+        model: Optional[str] = None,
+        max_size: int = DEFAULT_CACHE_SIZE,
+        engine: Optional[MySQLEngine] = None,
+        table_name: Optional[str] = None,
+        batch_size: int = DEFAULT_CACHE_BATCH_SIZE,
+    ) -> None:
+        """
+        Args:
+            embedding_service (Embeddings): Text embedding model to cache.
+            model (str, optional): Name of the model, part of the cache key.
+                Defaults to the `model` or `model_name` attribute of
+                `embedding_service`, or its class name.
+            max_size (int): Number of embeddings kept in the LRU tier. 0
+                disables it. Defaults to 10000.
+            engine (MySQLEngine, optional): Engine of the MySQL tier.
+            table_name (str, optional): Table of the MySQL tier.
+            batch_size (int): Maximum number of texts per call to the wrapped
+                service and per MySQL statement. Defaults to 500.
+        """
+        if (engine is None) != (table_name is None):
+            raise ValueError(
+                "Both 'engine' and 'table_name' must be specified to use the "
+                "MySQL cache tier."
+            )
+        if max_size < 0:
+            raise ValueError("'max_size' must not be negative.")
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be a positive integer.")
+        self.embedding_service = embedding_service
+        self.model = model or _model_name(embedding_service)
+        self.max_size = max_size
+        self.engine = engine
+        self.table_name = table_name
+        self.batch_size = batch_size
+        self.hits = 0
+        self.misses = 0
+        self._codec = EmbeddingCodec()
+        self._lock = threading.Lock()
+        self._cache: OrderedDict[str, List[float]] = OrderedDict()
+
+    def _key(self, kind: str, text: str) -> str:
+        payload = f"{self.model}\0{kind}\0{text}"
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def _get_local(self, keys: Sequence[str]) -> Dict[str, List[float]]:
+        found = {}
+        with self._lock:
+            for key in keys:
+                embedding = self._cache.get(key)
+                if embedding is not None:
+                    self._cache.move_to_end(key)
+                    found[key] = embedding
+        return found
+
+    def _put_local(self, embeddings: Dict[str, List[float]]) -> None:
+        if not self.max_size:
+            return
+        with self._lock:
+            for key, embedding in embeddings.items():
+                self._cache[key] = embedding
+                self._cache.move_to_end(key)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+
+    def _get_stored(self, keys: List[str]) -> Dict[str, List[float]]:
+        if self.engine is None or not keys:
+            return {}
+        stmt = text(
+            f"SELECT cache_key, embedding FROM `{self.table_name}` "
+            "WHERE cache_key IN :keys"
+        ).bindparams(bindparam("keys", expanding=True))
+        found = {}
+        with self.engine.connect("embedding_cache.get") as conn:
+            for start in range(0, len(keys), self.batch_size):
+                result = conn.execute(
+                    stmt, {"keys": keys[start : start + self.batch_size]}
+                )
+                for key, value in result:
+                    found[key] = self._codec.decode(value).tolist()
+        return found
+
+    def _put_stored(self, embeddings: Dict[str, List[float]]) -> None:
+        if self.engine is None or not embeddings:
+            return
+        # another process may have cached the same text in the meantime
+        stmt = text(
+            f"INSERT IGNORE INTO `{self.table_name}` (cache_key, embedding) "
+            "VALUES (:key, :embedding)"
+        )
+        rows = [
+            {"key": key, "embedding": self._codec.encode(embedding)}
+            for key, embedding in embeddings.items()
+        ]
+        with self.engine.connect("embedding_cache.put") as conn:
+            for start in range(0, len(rows), self.batch_size):
+                conn.execute(stmt, rows[start : start + self.batch_size])
+                conn.commit()
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        """Return the cached embeddings of `keys` from both tiers."""
+        found = self._get_local(keys)
+        missing = [key for key in dict.fromkeys(keys) if key not in found]
+        stored = self._get_stored(missing)
+        self._put_local(stored)
+        found.update(stored)
+        with self._lock:
+            self.hits += sum(1 for key in keys if key in found)
+            self.misses += sum(1 for key in keys if key not in found)
+        return found
+
+    def _store(self, embeddings: Dict[str, List[float]]) -> None:
+        self._put_local(embeddings)
+        self._put_stored(embeddings)
+
+    def _missing(
+        self, keys: List[str], texts: List[str], found: Dict[str, List[float]]
+    ) -> Dict[str, str]:
+        """Map each uncached key to its text, in first-seen order."""
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+        return missing
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents, calling the wrapped service only for cache misses.
+
+        Args:
+            texts (List[str]): The texts to embed.
+
+        Returns:
+            (List[List[float]]): One embedding per text.
+        """
+        keys = [self._key(_DOCUMENT, text) for text in texts]
+        found = self._lookup(keys)
+        missing = self._missing(keys, texts, found)
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch = missing_keys[start : start + self.batch_size]
+            embeddings = self.embedding_service.embed_documents(
+                [missing[key] for key in batch]
+            )
+            computed = dict(zip(batch, embeddings))
+            self._store(computed)
+            found.update(computed)
+        return [list(found[key]) for key in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        """Embed a query, calling the wrapped service only on a cache miss.
+
+        Args:
+            text (str): The query to embed.
+
+        Returns:
+            (List[float]): The embedding of the query.
+        """
+        key = self._key(_QUERY, text)
+        found = self._lookup([key])
+        if key not in found:
+            found[key] = self.embedding_service.embed_query(text)
+            self._store(found)
+        return list(found[key])
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        """Embed documents with the async API of the wrapped service, see
+        `embed_documents`."""
+        keys = [self._key(_DOCUMENT, text) for text in texts]
+        found = await self._arun(self._lookup, keys)
+        missing = self._missing(keys, texts, found)
+        missing_keys = list(missing)
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch = missing_keys[start : start + self.batch_size]
+            embeddings = await self.embedding_service.aembed_documents(
+                [missing[key] for key in batch]
+            )
+            computed = dict(zip(batch, embeddings))
+            await self._arun(self._store, computed)
+            found.update(computed)
+        return [list(found[key]) for key in keys]
+
+    async def aembed_query(self, text: str) -> List[float]:
+        """Embed a query with the async API of the wrapped service, see
+        `embed_query`."""
+        key = self._key(_QUERY, text)
+        found = await self._arun(self._lookup, [key])
+        if key not in found:
+            found[key] = await self.embedding_service.aembed_query(text)
+            await self._arun(self._store, found)
+        return list(found[key])
+
+    async def _arun(self, func: Callable[..., T], *args: Any) -> T:
+        # only the MySQL tier blocks, keep LRU-only lookups on the event loop
+        if self.engine is None:
+            return func(*args)
+        return await self.engine._run_in_executor(func, *args)
+
+    def clear(self) -> None:
+        """Drop all embeddings from the LRU tier."""
+        with self._lock:
+            self._cache.clear()
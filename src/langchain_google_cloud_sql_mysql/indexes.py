@@ -0,0 +1,618 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# TODO: Remove below import when minimum supported Python version is 3.10
+from __future__ import annotations
+
+import json
+import os
+import struct
+import threading
+from abc import ABC, abstractmethod
+from enum import Enum
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, Type
+
+import numpy as np
+
+# Guards against division by zero for all-zero embeddings.
+_EPSILON = 1e-12
+
+
+class DistanceStrategy(str, Enum):
+    """Distance functions used to rank embeddings.
+
+    Scores returned by the vector store are distances, lower is more similar.
+    The inner product is returned negated so that the same ordering applies.
+    """
+
+    COSINE_DISTANCE = "cosine_distance"
+    EUCLIDEAN = "euclidean"
+    INNER_PRODUCT = "inner_product"
+
+
+DEFAULT_DISTANCE_STRATEGY = DistanceStrategy.COSINE_DISTANCE
+
+
+def _prepare_query(query: np.ndarray, strategy: DistanceStrategy) -> np.ndarray:
+    query = np.asarray(query, dtype=np.float32)
+    if strategy == DistanceStrategy.COSINE_DISTANCE:
+        query = query / max(float(np.linalg.norm(query)), _EPSILON)
+    return query
+
+
+def _similarities(
+    matrix: np.ndarray, query: np.ndarray, strategy: DistanceStrategy
+) -> np.ndarray:
+    """Score every row of `matrix` against a prepared query, higher is better.
+
+    Each call does one matrix-vector product plus, for cosine and euclidean,
+    the squared row norms.
+    """
+    products = matrix @ query
+    if strategy == DistanceStrategy.INNER_PRODUCT:
+        return products
+    squared_norms = np.einsum("ij,ij->i", matrix, matrix)
+    if strategy == DistanceStrategy.COSINE_DISTANCE:
+        return products / np.maximum(np.sqrt(squared_norms), _EPSILON)
+    # -||x - q||^2 = 2 x.q - ||x||^2 - ||q||^2
+    return 2 * products - squared_norms - float(query @ query)
+
+
+def _distances(similarities: np.ndarray, strategy: DistanceStrategy) -> np.ndarray:
+    """Convert similarities from `_similarities` into distances."""
+    if strategy == DistanceStrategy.COSINE_DISTANCE:
+        return 1.0 - similarities
+    if strategy == DistanceStrategy.EUCLIDEAN:
+        return np.sqrt(np.maximum(-similarities, 0.0))
+    return -similarities
+
+
+class _TopK:
+    """Running top-k over scored chunks, bounded to k entries.
+
+    Each pushed chunk is reduced with `np.argpartition` and merged with the
+    current best entries, so memory stays proportional to k and the chunk
+    size no matter how many rows are scanned.
+    """
+
+    def __init__(self, k: int, keep_vectors: bool = False) -> None:
+        self.k = k
+        self.keep_vectors = keep_vectors
+        self._ids: np.ndarray = np.empty(0, dtype=object)
+        self._scores: np.ndarray = np.empty(0, dtype=np.float32)
+        self._vectors: Optional[np.ndarray] = None
+
+    def push(
+        self,
+        ids: np.ndarray,
+        scores: np.ndarray,
+        vectors: Optional[np.ndarray] = None,
+    ) -> None:
+        if self.k <= 0 or len(ids) == 0:
+            return
+        ids, scores, vectors = self._select(ids, scores, vectors)
+        if len(self._ids):
+            ids = np.concatenate([self._ids, ids])
+            scores = np.concatenate([self._scores, scores])
+            if self.keep_vectors:
+                vectors = np.concatenate([self._vectors, vectors])  # type: ignore
+            ids, scores, vectors = self._select(ids, scores, vectors)
+        self._ids, self._scores = ids, scores
+        if self.keep_vectors:
+            # copy so the chunk buffer the vectors came from can be released
+            self._vectors = np.array(vectors, dtype=np.float32)
+
+    def _select(
+        self,
+        ids: np.ndarray,
+        scores: np.ndarray,
+        vectors: Optional[np.ndarray],
+    ) -> Tuple[np.ndarray, np.ndarray, Optional[np.ndarray]]:
+        if len(ids) <= self.k:
+            return ids, scores, vectors
+        best = np.argpartition(-scores, self.k - 1)[: self.k]
+        return (
+            ids[best],
+            scores[best],
+            vectors[best] if vectors is not None and self.keep_vectors else None,
+        )
+
+    def results(self) -> Tuple[List[str], np.ndarray, Optional[np.ndarray]]:
+        """Return ids, scores and (if kept) vectors, best first."""
+        order = np.argsort(-self._scores, kind="stable")
+        vectors = self._vectors[order] if self._vectors is not None else None
+        return list(self._ids[order]), self._scores[order], vectors
+
+
+class BaseIndex(ABC):
+    """In-process vector index attached to a CloudSQLVectorStore.
+
+    The index holds embeddings keyed by row id and answers nearest neighbour
+    queries without scanning the table. Content and metadata stay in MySQL.
+    """
+
+    def __init__(self) -> None:
+        self.distance_strategy = DEFAULT_DISTANCE_STRATEGY
+        self._lock = threading.RLock()
+
+    @abstractmethod
+    def build(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        distance_strategy: DistanceStrategy = DEFAULT_DISTANCE_STRATEGY,
+    ) -> None:
+        """Replace the contents of the index."""
+
+    @abstractmethod
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        """Add or replace embeddings."""
+
+    @abstractmethod
+    def remove(self, ids: Iterable[str]) -> None:
+        """Remove embeddings, unknown ids are ignored."""
+
+    @abstractmethod
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+        """Return up to k ids and their similarities (higher is better)."""
+
+    @abstractmethod
+    def ids(self) -> List[str]:
+        """Ids of all embeddings in the index."""
+
+    @abstractmethod
+    def get_vectors(self, ids: Sequence[str]) -> np.ndarray:
+        """Embeddings of the given ids as a 2D float32 matrix."""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        """Number of embeddings in the index."""
+
+    @abstractmethod
+    def _state(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        """Parameters and arrays written to a snapshot."""
+
+    @classmethod
+    @abstractmethod
+    def _from_state(
+        cls, params: Dict[str, Any], arrays: Dict[str, np.ndarray]
+    ) -> BaseIndex:
+        """Restore an index from `_state` output read from a snapshot."""
+
+
+class FlatIndex(BaseIndex):
+    """Exact in-memory index that scores every embedding on each query.
+
+    Keeps the table's embeddings in one contiguous float32 matrix so searches
+    skip the database scan. Removed embeddings are tombstoned and compacted
+    away once they make up half the index.
+    """
+
+    def __init__(self) -> None:
+        super().__init__()
+        self._vectors = np.empty((0, 0), dtype=np.float32)
+        self._ids = np.empty(0, dtype=object)
+        self._alive = np.empty(0, dtype=bool)
+        self._size = 0
+        self._rows: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def ids(self) -> List[str]:
+        with self._lock:
+            return list(self._rows)
+
+    def get_vectors(self, ids: Sequence[str]) -> np.ndarray:
+        with self._lock:
+            rows = [self._rows[id] for id in ids]
+            return np.array(self._vectors[rows], dtype=np.float32)
+
+    def _reset(self, dimension: int) -> None:
+        self._vectors = np.empty((0, dimension), dtype=np.float32)
+        self._ids = np.empty(0, dtype=object)
+        self._alive = np.empty(0, dtype=bool)
+        self._size = 0
+        self._rows = {}
+
+    def build(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        distance_strategy: DistanceStrategy = DEFAULT_DISTANCE_STRATEGY,
+    ) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self.distance_strategy = DistanceStrategy(distance_strategy)
+            self._reset(vectors.shape[1] if vectors.ndim == 2 else 0)
+            self._append(ids, vectors)
+
+    def _reserve(self, size: int) -> None:
+        # grows geometrically; also moves a memory-mapped matrix into memory
+        # on the first write
+        capacity = len(self._vectors)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        vectors = np.empty((capacity, self._vectors.shape[1]), dtype=np.float32)
+        vectors[: self._size] = self._vectors[: self._size]
+        ids = np.empty(capacity, dtype=object)
+        ids[: self._size] = self._ids[: self._size]
+        alive = np.zeros(capacity, dtype=bool)
+        alive[: self._size] = self._alive[: self._size]
+        self._vectors, self._ids, self._alive = vectors, ids, alive
+
+    def _append(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        if not len(ids):
+            return
+        if not self._size and self._vectors.shape[1] != vectors.shape[1]:
+            self._vectors = np.empty((0, vectors.shape[1]), dtype=np.float32)
+        start, end = self._size, self._size + len(ids)
+        self._reserve(end)
+        self._vectors[start:end] = vectors
+        self._ids[start:end] = list(ids)
+        self._alive[start:end] = True
+        self._size = end
+        for row, id in enumerate(ids, start=start):
+            self._rows[id] = row
+        self._on_append(start, vectors)
+
+    def _on_append(self, start: int, vectors: np.ndarray) -> None:
+        """Hook for subclasses, called after rows `start:` were appended."""
+
+    def add(self, ids: Sequence[str], vectors: np.ndarray) -> None:
+        vectors = np.asarray(vectors, dtype=np.float32)
+        with self._lock:
+            self.remove(ids)
+            self._append(ids, vectors)
+
+    def remove(self, ids: Iterable[str]) -> None:
+        with self._lock:
+            for id in ids:
+                row = self._rows.pop(id, None)
+                if row is not None:
+                    self._alive[row] = False
+            if self._size and len(self._rows) < self._size // 2:
+                self._compact()
+
+    def _compact(self) -> None:
+        alive = np.flatnonzero(self._alive[: self._size])
+        ids, vectors = self._ids[alive], self._vectors[alive]
+        self._reset(vectors.shape[1])
+        self._append(list(ids), vectors)
+
+    def _candidates(self, query: np.ndarray) -> Optional[np.ndarray]:
+        """Rows to score for `query`, None to score all rows."""
+        return None
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[List[str], np.ndarray]:
+        query = np.asarray(query, dtype=np.float32)
+        with self._lock:
+            if not self._rows:
+                return [], np.empty(0, dtype=np.float32)
+            candidates = self._candidates(query)
+            prepared = _prepare_query(query, self.distance_strategy)
+            top_k = _TopK(min(k, len(self._rows)))
+            if candidates is None:
+                # score the matrix in place rather than gathering the live
+                # rows, which would copy a memory-mapped snapshot per query
+                similarities = _similarities(
+                    self._vectors[: self._size], prepared, self.distance_strategy
+                )
+                similarities[~self._alive[: self._size]] = -np.inf
+                top_k.push(self._ids[: self._size], similarities)
+            else:
+                similarities = _similarities(
+                    self._vectors[candidates], prepared, self.distance_strategy
+                )
+                top_k.push(self._ids[candidates], similarities)
+            ids, similarities, _ = top_k.results()
+            return ids, similarities
+
+    def _state(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        alive = np.flatnonzero(self._alive[: self._size])
+        arrays = {"ids": self._ids[alive], "vectors": self._vectors[alive]}
+        return {"distance_strategy": self.distance_strategy.value}, arrays
+
+    @classmethod
+    def _from_state(
+        cls, params: Dict[str, Any], arrays: Dict[str, np.ndarray]
+    ) -> BaseIndex:
+        index = cls()
+        index._restore(params, arrays)
+        return index
+
+    def _restore(self, params: Dict[str, Any], arrays: Dict[str, np.ndarray]) -> None:
+        self.distance_strategy = DistanceStrategy(params["distance_strategy"])
+        # keep the (possibly memory-mapped) matrix as is, it is only copied
+        # once embeddings are added
+        self._vectors = arrays["vectors"]
+        self._ids = arrays["ids"]
+        self._size = len(self._ids)
+        self._alive = np.ones(self._size, dtype=bool)
+        self._rows = {id: row for row, id in enumerate(self._ids)}
+
+
+class IVFFlatIndex(FlatIndex):
+    """Inverted file index with exact re-ranking, in pure NumPy.
+
+    Embeddings are clustered into `lists` partitions with k-means. A query is
+    compared against the centroids and only the rows of the `probes` closest
+    partitions are scored exactly. Cosine distance clusters normalized
+    embeddings; euclidean distance and inner product cluster raw embeddings.
+
+    Added embeddings are assigned to the nearest existing centroid. Rebuild
+    the index after large changes to the data distribution.
+    """
+
+    def __init__(
+        self,
+        lists: int = 100,
+        probes: int = 10,
+        kmeans_iterations: int = 10,
+        max_training_rows: int = 256 * 100,
+        seed: Optional[int] = None,
+    ) -> None:
+        """
+        Args:
+            lists (int): Number of k-means partitions.
+            probes (int): Number of partitions scored per query. Higher values
+                trade latency for recall.
+            kmeans_iterations (int): Number of k-means iterations.
+            max_training_rows (int): Number of rows sampled to train k-means.
+            seed (int, optional): Seed for sampling and centroid initialization.
+        """
+        super().__init__()
+        if lists < 1 or probes < 1:
+            raise ValueError("lists and probes must be positive integers.")
+        self.lists = lists
+        self.probes = probes
+        self.kmeans_iterations = kmeans_iterations
+        self.max_training_rows = max_training_rows
+        self.seed = seed
+        self._centroids = np.empty((0, 0), dtype=np.float32)
+        self._list_rows: List[List[int]] = []
+
+    def _clustering_view(self, vectors: np.ndarray) -> np.ndarray:
+        if self.distance_strategy == DistanceStrategy.COSINE_DISTANCE:
+            norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+            return vectors / np.maximum(norms, _EPSILON)
+        return vectors
+
+    def _nearest_centroids(self, vectors: np.ndarray, count: int = 1) -> np.ndarray:
+        """Indices of the `count` nearest centroids of each row."""
+        vectors = self._clustering_view(vectors)
+        scores = vectors @ self._centroids.T
+        if self.distance_strategy != DistanceStrategy.COSINE_DISTANCE:
+            # argmin ||x - c||^2 == argmax (x.c - ||c||^2 / 2)
+            scores -= 0.5 * np.einsum("ij,ij->i", self._centroids, self._centroids)
+        if count >= scores.shape[1]:
+            return np.argsort(-scores, axis=1)
+        return np.argpartition(-scores, count - 1, axis=1)[:, :count]
+
+    def _assign(self, vectors: np.ndarray, batch_size: int = 8192) -> np.ndarray:
+        assignments = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), batch_size):
+            batch = vectors[start : start + batch_size]
+            assignments[start : start + batch_size] = self._nearest_centroids(batch)[
+                :, 0
+            ]
+        return assignments
+
+    def _train(self, vectors: np.ndarray) -> None:
+        rng = np.random.default_rng(self.seed)
+        if len(vectors) > self.max_training_rows:
+            sample = rng.choice(len(vectors), self.max_training_rows, replace=False)
+            vectors = vectors[np.sort(sample)]
+        vectors = self._clustering_view(vectors)
+        lists = min(self.lists, len(vectors))
+        centroids = vectors[rng.choice(len(vectors), lists, replace=False)].copy()
+        for _ in range(self.kmeans_iterations):
+            self._centroids = centroids
+            assignments = self._assign(vectors)
+            counts = np.bincount(assignments, minlength=lists)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, vectors)
+            empty = counts == 0
+            centroids = sums / np.maximum(counts, 1)[:, None]
+            # re-seed empty partitions with random rows
+            if empty.any():
+                centroids[empty] = vectors[rng.choice(len(vectors), int(empty.sum()))]
+            if self.distance_strategy == DistanceStrategy.COSINE_DISTANCE:
+                centroids = self._clustering_view(centroids)
+        self._centroids = centroids.astype(np.float32)
+        self._list_rows = [[] for _ in range(len(self._centroids))]
+
+    def _reset(self, dimension: int) -> None:
+        super()._reset(dimension)
+        # centroids are kept when compacting, a new build retrains them
+        self._list_rows = [[] for _ in range(len(self._centroids))]
+
+    def build(
+        self,
+        ids: Sequence[str],
+        vectors: np.ndarray,
+        distance_strategy: DistanceStrategy = DEFAULT_DISTANCE_STRATEGY,
+    ) -> None:
+        with self._lock:
+            self._centroids = np.empty((0, 0), dtype=np.float32)
+            super().build(ids, vectors, distance_strategy)
+
+    def _on_append(self, start: int, vectors: np.ndarray) -> None:
+        if not len(self._centroids):
+            # an index built from an empty table is trained on its first rows
+            self._train(vectors)
+        for row, assignment in enumerate(self._assign(vectors), start=start):
+            self._list_rows[assignment].append(row)
+
+    def _candidates(self, query: np.ndarray) -> np.ndarray:
+        probes = min(self.probes, len(self._centroids))
+        lists = self._nearest_centroids(query[None, :], probes)[0]
+        candidates = np.fromiter(
+            (row for list_id in lists for row in self._list_rows[list_id]),
+            dtype=np.int64,
+        )
+        return candidates[self._alive[candidates]]
+
+    def _state(self) -> Tuple[Dict[str, Any], Dict[str, np.ndarray]]:
+        params, arrays = super()._state()
+        assignments = np.empty(self._size, dtype=np.int32)
+        for list_id, rows in enumerate(self._list_rows):
+            assignments[rows] = list_id
+        arrays["centroids"] = self._centroids
+        arrays["assignments"] = assignments[np.flatnonzero(self._alive[: self._size])]
+        params.update(
+            lists=self.lists,
+            probes=self.probes,
+            kmeans_iterations=self.kmeans_iterations,
+            max_training_rows=self.max_training_rows,
+            seed=self.seed,
+        )
+        return params, arrays
+
+    @classmethod
+    def _from_state(
+        cls, params: Dict[str, Any], arrays: Dict[str, np.ndarray]
+    ) -> BaseIndex:
+        index = cls(
+            lists=params["lists"],
+            probes=params["probes"],
+            kmeans_iterations=params["kmeans_iterations"],
+            max_training_rows=params["max_training_rows"],
+            seed=params["seed"],
+        )
+        index._restore(params, arrays)
+        index._centroids = np.asarray(arrays["centroids"], dtype=np.float32)
+        assignments = np.asarray(arrays["assignments"])
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.cumsum(np.bincount(assignments, minlength=len(index._centroids)))
+        index._list_rows = [rows.tolist() for rows in np.split(order, bounds[:-1])]
+        return index
+
+
+_SNAPSHOT_MAGIC = b"LCMYSQLV"
+_SNAPSHOT_VERSION = 1
+# Arrays are aligned so memory-mapped matrices are suitably aligned for NumPy.
+_SNAPSHOT_ALIGNMENT = 64
+_INDEX_TYPES: Dict[str, Type[BaseIndex]] = {
+    "flat": FlatIndex,
+    "ivfflat": IVFFlatIndex,
+}
+
+
+def _align(offset: int) -> int:
+    return -(-offset // _SNAPSHOT_ALIGNMENT) * _SNAPSHOT_ALIGNMENT
+
+
+def save_index(
+    index: BaseIndex, path: str, metadata: Optional[Dict[str, Any]] = None
+) -> None:
+    """Write an index to a snapshot file that `load_index` can memory-map.
+
+    The file holds a JSON header followed by aligned raw arrays: the ids as
+    fixed width UTF-8 strings, the embeddings as one contiguous little-endian
+    float32 matrix and any index specific arrays.
+
+    Args:
+        index (BaseIndex): The index to save.
+        path (str): Destination file. Written to a temporary file first and
+            atomically renamed.
+        metadata (dict, optional): JSON serializable values stored in the
+            header, returned by `load_index`.
+    """
+    index_type = next(
+        (name for name, cls in _INDEX_TYPES.items() if type(index) is cls), None
+    )
+    if index_type is None:
+        raise ValueError(f"Unsupported index type {type(index).__name__}.")
+    with index._lock:
+        params, arrays = index._state()
+    encoded_ids = [id.encode("utf-8") for id in arrays.pop("ids")]
+    id_width = max((len(id) for id in encoded_ids), default=1)
+    arrays = {"ids": np.array(encoded_ids, dtype=f"S{id_width}"), **arrays}
+    arrays["vectors"] = np.ascontiguousarray(arrays["vectors"], dtype="<f4")
+
+    sections = {}
+    offset = 0
+    for name, array in arrays.items():
+        sections[name] = {
+            "offset": offset,
+            "dtype": array.dtype.str,
+            "shape": list(array.shape),
+        }
+        offset = _align(offset + array.nbytes)
+    header = json.dumps(
+        {
+            "version": _SNAPSHOT_VERSION,
+            "index_type": index_type,
+            "params": params,
+            "sections": sections,
+            "metadata": metadata or {},
+        }
+    ).encode("utf-8")
+    data_start = _align(len(_SNAPSHOT_MAGIC) + 8 + len(header))
+
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(_SNAPSHOT_MAGIC)
+        f.write(struct.pack("<Q", len(header)))
+        f.write(header)
+        for name, array in arrays.items():
+            f.seek(data_start + sections[name]["offset"])
+            f.write(np.ascontiguousarray(array).tobytes())
+        f.truncate(data_start + offset)
+    os.replace(tmp_path, path)
+
+
+def load_index(path: str, mmap: bool = True) -> Tuple[BaseIndex, Dict[str, Any]]:
+    """Load an index written by `save_index`.
+
+    Args:
+        path (str): The snapshot file.
+        mmap (bool): Whether to memory-map the embedding matrix instead of
+            reading it. Memory-mapped pages are loaded on demand and shared
+            between processes that open the same file.
+
+    Returns:
+        The index and the metadata stored with it.
+    """
+    with open(path, "rb") as f:
+        if f.read(len(_SNAPSHOT_MAGIC)) != _SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} is not a vector index snapshot.")
+        (header_size,) = struct.unpack("<Q", f.read(8))
+        header = json.loads(f.read(header_size))
+        if header["version"] != _SNAPSHOT_VERSION:
+            raise ValueError(
+                f"Unsupported snapshot version {header['version']} in {path}."
+            )
+        data_start = _align(len(_SNAPSHOT_MAGIC) + 8 + header_size)
+        arrays: Dict[str, np.ndarray] = {}
+        for name, section in header["sections"].items():
+            shape = tuple(section["shape"])
+            if mmap and name == "vectors" and shape[0]:
+                arrays[name] = np.memmap(
+                    path,
+                    dtype=section["dtype"],
+                    mode="r",
+                    offset=data_start + section["offset"],
+                    shape=shape,
+                )
+                continue
+            f.seek(data_start + section["offset"])
+            dtype = np.dtype(section["dtype"])
+            count = int(np.prod(shape))
+            arrays[name] = np.fromfile(f, dtype=dtype, count=count).reshape(shape)
+    arrays["ids"] = np.array([id.decode("utf-8") for id in arrays["ids"]], dtype=object)
+    index = _INDEX_TYPES[header["index_type"]]._from_state(header["params"], arrays)
+    return index, header["metadata"]
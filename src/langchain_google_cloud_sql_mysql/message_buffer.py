@@ -0,0 +1,248 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# TODO: Remove below import when minimum supported Python version is 3.10
+from __future__ import annotations
+
+import atexit
+import json
+import logging
+import threading
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple
+
+import sqlalchemy
+from langchain_core.messages import BaseMessage
+
+from .mysql_engine import MySQLEngine
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MESSAGES = 500
+DEFAULT_FLUSH_INTERVAL = 1.0
+
+
+def _message_rows(session_id: str, messages: Sequence[BaseMessage]) -> List[dict]:
+    return [
+        {
+            "session_id": session_id,
+            "data": json.dumps(message.dict()),
+            "type": message.type,
+        }
+        for message in messages
+    ]
+
+
+def _insert_messages(
+    conn: sqlalchemy.engine.Connection, table_name: str, rows: List[dict]
+) -> None:
+    """Insert chat message rows with one executemany statement."""
+    conn.execute(
+        sqlalchemy.text(
+            f"INSERT INTO `{table_name}` (session_id, data, type) "
+            "VALUES (:session_id, :data, :type)"
+        ),
+        rows,
+    )
+
+
+class MessageWriteBuffer:
+    """Write-behind buffer coalescing chat messages into batched inserts.
+
+    Messages added by any number of `MySQLChatMessageHistory` sessions that
+    share the buffer are inserted together, one multi-row INSERT per table
+    and a single commit per flush. A background thread flushes when
+    `max_messages` are pending or every `flush_interval` seconds, and `close`
+    flushes what is left. Histories flush the buffer before reading or
+    clearing a session with pending messages, so reads see their own writes.
+
+    With `wait_for_flush=False`, `add` returns immediately and messages added
+    since the last flush are lost if the process dies. With
+    `wait_for_flush=True`, `add` blocks until its messages are committed,
+    which still coalesces concurrent writers into one commit (group commit).
+
+    If a flush fails with `wait_for_flush=True`, its messages are dropped and
+    the `add` calls waiting for it raise the error, so callers can retry them.
+    With `wait_for_flush=False`, the messages stay pending and are retried by
+    the next flush. The error is raised by a failed `flush`, or once by the
+    next `add`, `flush` or `close` when the background thread flushed.
+    """
+
+    def __init__(
+        self,
+        engine: MySQLEngine,
+        max_messages: int = DEFAULT_MAX_MESSAGES,
+        flush_interval: float = DEFAULT_FLUSH_INTERVAL,
+        wait_for_flush: bool = False,
+    ) -> None:
+        """
+        Args:
+            engine (MySQLEngine): MySQLEngine object to connect to the MySQL database.
+            max_messages (int): Number of pending messages that triggers a
+                flush. Defaults to 500.
+            flush_interval (float): Maximum seconds a message stays pending.
+                Defaults to 1.0.
+            wait_for_flush (bool): Whether `add` waits until its messages are
+                committed. Defaults to False.
+        """
+        if max_messages < 1:
+            raise ValueError("'max_messages' must be a positive integer.")
+        if flush_interval <= 0:
+            raise ValueError("'flush_interval' must be positive.")
+        self.engine = engine
+        self.max_messages = max_messages
+        self.flush_interval = flush_interval
+        self.wait_for_flush = wait_for_flush
+        self._condition = threading.Condition()
+        # serializes flushes so batches are committed in order
+        self._flush_lock = threading.Lock()
+        self._pending: Dict[str, List[dict]] = {}
+        self._pending_sessions: Set[Tuple[str, str]] = set()
+        # sessions of the flush in progress, pending until it commits
+        self._flushing_sessions: Set[Tuple[str, str]] = set()
+        self._pending_count = 0
+        self._batch: Future = Future()
+        self._error: Optional[BaseException] = None
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._run, name="MessageWriteBuffer", daemon=True
+        )
+        self._thread.start()
+        atexit.register(self.close)
+
+    def add(
+        self, table_name: str, session_id: str, messages: Sequence[BaseMessage]
+    ) -> None:
+        """Queue messages of a session for insertion into `table_name`."""
+        if not messages:
+            return
+        rows = _message_rows(session_id, messages)
+        with self._condition:
+            if self._closed:
+                raise ValueError("Cannot add messages to a closed MessageWriteBuffer.")
+            self._raise_error()
+            self._pending.setdefault(table_name, []).extend(rows)
+            self._pending_sessions.add((table_name, session_id))
+            self._pending_count += len(rows)
+            batch = self._batch
+            if self._pending_count >= self.max_messages:
+                self._condition.notify()
+        if self.wait_for_flush:
+            batch.result()
+
+    def has_pending(self, table_name: str, session_id: str) -> bool:
+        """Whether messages of the session are not committed yet."""
+        key = (table_name, session_id)
+        with self._condition:
+            return key in self._pending_sessions or key in self._flushing_sessions
+
+    def flush(self) -> None:
+        """Insert all pending messages now."""
+        self._flush()
+        with self._condition:
+            self._raise_error()
+
+    def _flush(self) -> None:
+        with self._flush_lock:
+            with self._condition:
+                pending, batch = self._pending, self._batch
+                sessions = self._pending_sessions
+                self._pending = {}
+                self._pending_sessions = set()
+                self._flushing_sessions = sessions
+                self._pending_count = 0
+                self._batch = Future()
+            if not pending:
+                batch.set_result(None)
+                return
+            try:
+                with self.engine.connect("chat_history.flush") as conn:
+                    for table_name, rows in pending.items():
+                        _insert_messages(conn, table_name, rows)
+                    conn.commit()
+            except BaseException as error:
+                if not self.wait_for_flush:
+                    self._restore(pending, sessions)
+                with self._condition:
+                    self._flushing_sessions = set()
+                # the waiting add calls raise the error and own the retry
+                batch.set_exception(error)
+                raise
+            with self._condition:
+                self._flushing_sessions = set()
+            batch.set_result(None)
+            logger.debug(
+                "Flushed %d chat messages",
+                sum(len(rows) for rows in pending.values()),
+            )
+
+    def _restore(
+        self, pending: Dict[str, List[dict]], sessions: Set[Tuple[str, str]]
+    ) -> None:
+        # puts the rows of a failed flush back in front of newer ones
+        with self._condition:
+            for table_name, rows in self._pending.items():
+                pending.setdefault(table_name, []).extend(rows)
+            self._pending = pending
+            self._pending_sessions |= sessions
+            self._pending_count = sum(len(rows) for rows in pending.values())
+
+    def _raise_error(self) -> None:
+        # called with the condition held
+        if self._error is not None:
+            error, self._error = self._error, None
+            raise error
+
+    def _run(self) -> None:
+        failed = False
+        while True:
+            with self._condition:
+                if not self._closed and (
+                    failed or self._pending_count < self.max_messages
+                ):
+                    self._condition.wait(self.flush_interval)
+                closed = self._closed
+            try:
+                self._flush()
+                failed = False
+            except BaseException as error:
+                logger.exception("Failed to flush chat messages")
+                # back off before retrying restored rows
+                failed = not self.wait_for_flush
+                if not self.wait_for_flush:
+                    # nobody waited for this flush, so the next add, flush or
+                    # close raises the error, the rows are retried after the
+                    # next interval
+                    with self._condition:
+                        self._error = error
+            if closed:
+                return
+
+    def close(self) -> None:
+        """Flush pending messages and stop the background thread."""
+        with self._condition:
+            if self._closed:
+                return
+            self._closed = True
+            self._condition.notify()
+        self._thread.join()
+        atexit.unregister(self.close)
+        with self._condition:
+            self._raise_error()
+
+    def __enter__(self) -> MessageWriteBuffer:
+        return self
+
+    def __exit__(self, *args: Any) -> None:
+        self.close()
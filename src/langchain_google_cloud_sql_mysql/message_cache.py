@@ -0,0 +1,123 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# TODO: Remove below import when minimum supported Python version is 3.10
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import NamedTuple, Optional, Tuple
+
+from langchain_core.messages import BaseMessage
+
+DEFAULT_MAX_SESSIONS = 1000
+
+SessionKey = Tuple[str, str]
+
+
+class _CacheEntry(NamedTuple):
+    messages: Tuple[BaseMessage, ...]
+    # ids of the first and last cached message, 0 for an empty session
+    first_id: int
+    last_id: int
+    # approximate size of the serialized messages
+    size: int
+    # set when this process queued writes that are not in `messages`
+    stale: bool = False
+
+
+class MessageCache:
+    """Per-process LRU cache of deserialized chat histories.
+
+    Entries are keyed by (table_name, session_id) and hold the messages with
+    the ids of the first and last one. `MySQLChatMessageHistory` updates the
+    cache when it adds messages or clears a session. With `validate`, every
+    read first checks the session's MIN(id), MAX(id) and COUNT(*) on the
+    (session_id, id) index range. Messages appended by other processes are
+    then fetched incrementally. A session that was cleared or purged
+    elsewhere is reloaded, as is one with a message committed after a higher
+    id was cached. Without `validate`, reads are served from
+    memory, which is only safe when a single process writes each session.
+
+    Cached message objects are shared between reads and must not be mutated.
+    """
+
+    def __init__(
+        self,
+        max_sessions: int = DEFAULT_MAX_SESSIONS,
+        max_bytes: Optional[int] = None,
+        validate: bool = True,
+    ) -> None:
+        """
+        Args:
+            max_sessions (int): Maximum number of cached sessions.
+                Defaults to 1000.
+            max_bytes (int, optional): Maximum total size of the cached
+                messages, measured as their serialized JSON length.
+            validate (bool): Check each read against the database, see above.
+                Defaults to True.
+        """
+        if max_sessions < 1:
+            raise ValueError("'max_sessions' must be a positive integer.")
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self.validate = validate
+        self._lock = threading.Lock()
+        self._entries: OrderedDict[SessionKey, _CacheEntry] = OrderedDict()
+        self._size = 0
+
+    def get(self, key: SessionKey) -> Optional[_CacheEntry]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def put(self, key: SessionKey, entry: _CacheEntry) -> None:
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._size -= previous.size
+            if self.max_bytes is not None and entry.size > self.max_bytes:
+                return
+            self._entries[key] = entry
+            self._size += entry.size
+            while len(self._entries) > self.max_sessions or (
+                self.max_bytes is not None and self._size > self.max_bytes
+            ):
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= evicted.size
+
+    def mark_stale(self, key: SessionKey) -> None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries[key] = entry._replace(stale=True)
+
+    def invalidate(self, key: SessionKey) -> None:
+        """Drop the cached messages of a session."""
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._size -= entry.size
+
+    def clear(self) -> None:
+        """Drop all cached sessions."""
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._entries)
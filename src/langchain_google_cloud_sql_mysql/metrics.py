@@ -0,0 +1,178 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# TODO: Remove below import when minimum supported Python version is 3.10
+from __future__ import annotations
+
+import bisect
+import threading
+from typing import Any, Callable, Dict, List, NamedTuple, Sequence, Tuple
+
+# Metric names emitted by MySQLEngine.
+POOL_CHECKOUT_WAIT = "pool.checkout_wait"
+CONNECTIONS_OPENED = "pool.connections_opened"
+CONNECTIONS_CLOSED = "pool.connections_closed"
+STATEMENT_DURATION = "statement.duration"
+STATEMENT_ERRORS = "statement.errors"
+
+# Histogram metrics are durations in seconds, the others are counters.
+HISTOGRAMS = frozenset([POOL_CHECKOUT_WAIT, STATEMENT_DURATION])
+
+DEFAULT_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+
+
+class MetricEvent(NamedTuple):
+    """A single measurement emitted by MySQLEngine.
+
+    Attributes:
+        name (str): Metric name, e.g. "statement.duration".
+        value (float): Duration in seconds for histograms, increment for
+            counters.
+        attributes (Dict[str, str]): Labels such as the operation name.
+    """
+
+    name: str
+    value: float
+    attributes: Dict[str, str]
+
+
+MetricsSink = Callable[[MetricEvent], None]
+
+
+class _Histogram:
+    def __init__(self, buckets: Sequence[float]) -> None:
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def record(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+
+class InMemoryMetricsSink:
+    """Metrics sink that aggregates counters and latency histograms in memory.
+
+    Series are keyed by metric name and the "operation" attribute. Use
+    `snapshot` to export them, e.g. from a periodic reporter.
+    """
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(buckets)
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, str], float] = {}
+        self._histograms: Dict[Tuple[str, str], _Histogram] = {}
+
+    def __call__(self, event: MetricEvent) -> None:
+        key = (event.name, event.attributes.get("operation", ""))
+        with self._lock:
+            if event.name in HISTOGRAMS:
+                if key not in self._histograms:
+                    self._histograms[key] = _Histogram(self.buckets)
+                self._histograms[key].record(event.value)
+            else:
+                self._counters[key] = self._counters.get(key, 0) + event.value
+
+    def snapshot(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Return the current counters and histograms.
+
+        Returns:
+            A dict with "counters" and "histograms" lists. Histogram entries
+            contain the bucket upper bounds and the count of values per
+            bucket, the last bucket counting values above all bounds.
+        """
+        with self._lock:
+            return {
+                "counters": [
+                    {"name": name, "operation": operation, "value": value}
+                    for (name, operation), value in sorted(self._counters.items())
+                ],
+                "histograms": [
+                    {
+                        "name": name,
+                        "operation": operation,
+                        "count": histogram.count,
+                        "sum": histogram.sum,
+                        "buckets": list(histogram.buckets),
+                        "bucket_counts": list(histogram.counts),
+                    }
+                    for (name, operation), histogram in sorted(self._histograms.items())
+                ],
+            }
+
+    def reset(self) -> None:
+        """Drop all recorded values."""
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+
+class OpenTelemetryMetricsSink:
+    """Metrics sink that records into OpenTelemetry instruments.
+
+    Example:
+        .. code-block:: python
+
+            from opentelemetry import metrics
+
+            meter = metrics.get_meter("langchain-google-cloud-sql-mysql")
+            engine.set_metrics_sink(OpenTelemetryMetricsSink(meter))
+    """
+
+    def __init__(self, meter: Any, prefix: str = "mysql") -> None:
+        """
+        Args:
+            meter (opentelemetry.metrics.Meter): Meter used to create the
+                instruments.
+            prefix (str): Prefix of the instrument names.
+        """
+        self.meter = meter
+        self.prefix = prefix
+        self._lock = threading.Lock()
+        self._instruments: Dict[str, Any] = {}
+
+    def _instrument(self, name: str) -> Any:
+        with self._lock:
+            if name not in self._instruments:
+                full_name = f"{self.prefix}.{name}"
+                if name in HISTOGRAMS:
+                    self._instruments[name] = self.meter.create_histogram(
+                        full_name, unit="s"
+                    )
+                else:
+                    self._instruments[name] = self.meter.create_counter(full_name)
+            return self._instruments[name]
+
+    def __call__(self, event: MetricEvent) -> None:
+        instrument = self._instrument(event.name)
+        if event.name in HISTOGRAMS:
+            instrument.record(event.value, attributes=event.attributes)
+        else:
+            instrument.add(event.value, attributes=event.attributes)
@@ -12,14 +12,36 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import json
-from typing import List
+import sys
+import time
+from datetime import timedelta
+from typing import Any, Callable, List, Optional, Sequence, Tuple
 
 import sqlalchemy
 from langchain_core.chat_history import BaseChatMessageHistory
 from langchain_core.messages import BaseMessage, messages_from_dict
 
+from langchain_google_cloud_sql_mysql.message_buffer import (
+    MessageWriteBuffer,
+    _insert_messages,
+    _message_rows,
+)
+from langchain_google_cloud_sql_mysql.message_cache import MessageCache, _CacheEntry
 from langchain_google_cloud_sql_mysql.mysql_engine import MySQLEngine
 
+SESSION_ID_MAX_LENGTH = 255
+SESSION_INDEX_NAME = "session_id_idx"
+CREATED_AT_INDEX_NAME = "created_at_idx"
+DEFAULT_PURGE_CHUNK_SIZE = 1000
+# rows read per query when walking a session backwards for a token budget
+DEFAULT_WINDOW_PAGE_SIZE = 50
+
+
+def _messages_from_rows(rows: Sequence[Any]) -> List[BaseMessage]:
+    # load SQLAlchemy row objects (data, type) into dicts
+    items = [{"data": json.loads(row[0]), "type": row[1]} for row in rows]
+    return messages_from_dict(items)
+
 
 class MySQLChatMessageHistory(BaseChatMessageHistory):
     """Chat message history stored in a Cloud SQL MySQL database."""
@@ -29,56 +51,423 @@ class MySQLChatMessageHistory(BaseChatMessageHistory):
         engine: MySQLEngine,
         session_id: str,
         table_name: str = "message_store",
+        write_buffer: Optional[MessageWriteBuffer] = None,
+        cache: Optional[MessageCache] = None,
     ) -> None:
+        """
+        Args:
+          engine (MySQLEngine): MySQLEngine object to connect to the MySQL database.
+          session_id (str): Id of the conversation. Tables created or migrated by
+             this version store at most 255 characters.
+          table_name (str): The chat history table name. Defaults to "message_store".
+          write_buffer (MessageWriteBuffer): Buffer that batches inserts of many sessions
+             into periodic multi-row INSERTs. Messages are written immediately if not
+             given. Optional.
+          cache (MessageCache): Read-through cache of deserialized messages shared by
+             histories of this process. Optional.
+        """
         self.engine = engine
         self.session_id = session_id
         self.table_name = table_name
+        self.write_buffer = write_buffer
+        self.cache = cache
         self._create_table_if_not_exists()
 
     def _create_table_if_not_exists(self) -> None:
+        # (session_id, id) serves per-session reads in id order from the index
         create_table_query = f"""CREATE TABLE IF NOT EXISTS `{self.table_name}` (
           id INT AUTO_INCREMENT PRIMARY KEY,
-          session_id TEXT NOT NULL,
+          session_id VARCHAR({SESSION_ID_MAX_LENGTH}) NOT NULL,
           data JSON NOT NULL,
-          type TEXT NOT NULL
+          type TEXT NOT NULL,
+          created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+          INDEX {SESSION_INDEX_NAME} (session_id, id),
+          INDEX {CREATED_AT_INDEX_NAME} (created_at)
         );"""
 
-        with self.engine.connect() as conn:
+        with self.engine.connect("chat_history.create_table") as conn:
             conn.execute(sqlalchemy.text(create_table_query))
             conn.commit()
 
+    @staticmethod
+    def migrate_table(engine: MySQLEngine, table_name: str = "message_store") -> None:
+        """
+        Upgrade a table created by earlier versions, which stored session_id as
+        unindexed TEXT, to a VARCHAR session_id with a (session_id, id) index
+        and an indexed created_at column used by `purge_older_than`.
+
+        Changing the column type rebuilds the table and blocks writes while it
+        runs, so migrate large tables during a maintenance window. Raises a
+        ValueError if a stored session id is longer than 255 characters. Existing messages get
+        the time of the migration as created_at.
+
+        Args:
+            engine (MySQLEngine): MySQLEngine object to connect to the MySQL database.
+            table_name (str): The chat history table name. Defaults to "message_store".
+        """
+        with engine.connect("chat_history.migrate_table") as conn:
+            data_type = conn.execute(
+                sqlalchemy.text(
+                    "SELECT data_type FROM information_schema.columns "
+                    "WHERE table_schema = DATABASE() AND table_name = :table_name "
+                    "AND column_name = 'session_id'"
+                ),
+                {"table_name": table_name},
+            ).scalar()
+            if data_type is None:
+                raise ValueError(
+                    f"Table {table_name} does not exist or has no session_id column."
+                )
+            indexes = set(
+                conn.execute(
+                    sqlalchemy.text(
+                        "SELECT DISTINCT index_name FROM information_schema.statistics "
+                        "WHERE table_schema = DATABASE() AND table_name = :table_name"
+                    ),
+                    {"table_name": table_name},
+                ).scalars()
+            )
+            has_created_at = conn.execute(
+                sqlalchemy.text(
+                    "SELECT COUNT(*) FROM information_schema.columns "
+                    "WHERE table_schema = DATABASE() AND table_name = :table_name "
+                    "AND column_name = 'created_at'"
+                ),
+                {"table_name": table_name},
+            ).scalar()
+            alterations = []
+            if data_type.lower() != "varchar":
+                max_length = conn.execute(
+                    sqlalchemy.text(
+                        f"SELECT MAX(CHAR_LENGTH(session_id)) FROM `{table_name}`"
+                    )
+                ).scalar()
+                if max_length is not None and max_length > SESSION_ID_MAX_LENGTH:
+                    raise ValueError(
+                        f"Table {table_name} has session ids longer than "
+                        f"{SESSION_ID_MAX_LENGTH} characters."
+                    )
+                alterations.append(
+                    f"MODIFY session_id VARCHAR({SESSION_ID_MAX_LENGTH}) NOT NULL"
+                )
+            if SESSION_INDEX_NAME not in indexes:
+                alterations.append(f"ADD INDEX {SESSION_INDEX_NAME} (session_id, id)")
+            if not has_created_at:
+                alterations.append(
+                    "ADD COLUMN created_at TIMESTAMP NOT NULL "
+                    "DEFAULT CURRENT_TIMESTAMP"
+                )
+            if CREATED_AT_INDEX_NAME not in indexes:
+                alterations.append(f"ADD INDEX {CREATED_AT_INDEX_NAME} (created_at)")
+            if alterations:
+                conn.execute(
+                    sqlalchemy.text(
+                        f"ALTER TABLE `{table_name}` " + ", ".join(alterations)
+                    )
+                )
+                conn.commit()
+
+    @staticmethod
+    def purge_older_than(
+        engine: MySQLEngine,
+        age: timedelta,
+        table_name: str = "message_store",
+        chunk_size: int = DEFAULT_PURGE_CHUNK_SIZE,
+        sleep_seconds: float = 0.1,
+    ) -> int:
+        """
+        Delete the messages of all sessions created more than `age` ago.
+
+        Messages are deleted in primary key order in chunks of `chunk_size`,
+        each chunk in its own short transaction followed by a pause of
+        `sleep_seconds`, so a large purge neither holds locks for long nor
+        floods replicas. Messages written while the purge runs are kept.
+        Run it periodically, e.g. from a scheduled job.
+
+        Args:
+            engine (MySQLEngine): MySQLEngine object to connect to the MySQL database.
+            age (timedelta): Retention period of the messages.
+            table_name (str): The chat history table name. Defaults to "message_store".
+            chunk_size (int): Number of messages deleted per transaction.
+                Defaults to 1000.
+            sleep_seconds (float): Pause between chunks in seconds.
+                Defaults to 0.1.
+
+        Returns:
+            (int): The number of deleted messages.
+        """
+        if age < timedelta(0):
+            raise ValueError("'age' must not be negative.")
+        if chunk_size < 1:
+            raise ValueError("'chunk_size' must be a positive integer.")
+        # the ids come from the created_at index, which also holds the
+        # primary key, and are then deleted by primary key
+        select_query = (
+            f"SELECT id FROM `{table_name}` WHERE created_at < :cutoff "
+            "ORDER BY created_at, id LIMIT :chunk_size;"
+        )
+        deleted = 0
+        with engine.connect("chat_history.purge") as conn:
+            now = conn.execute(
+                sqlalchemy.text("SELECT CURRENT_TIMESTAMP;")
+            ).scalar_one()
+            cutoff = now - age
+            while True:
+                ids = (
+                    conn.execute(
+                        sqlalchemy.text(select_query),
+                        {"cutoff": cutoff, "chunk_size": chunk_size},
+                    )
+                    .scalars()
+                    .all()
+                )
+                if not ids:
+                    break
+                deleted += conn.execute(
+                    sqlalchemy.text(
+                        f"DELETE FROM `{table_name}` WHERE id IN :ids;"
+                    ).bindparams(sqlalchemy.bindparam("ids", expanding=True)),
+                    {"ids": sorted(ids)},
+                ).rowcount
+                conn.commit()
+                if len(ids) < chunk_size:
+                    break
+                time.sleep(sleep_seconds)
+        return deleted
+
     @property
     def messages(self) -> List[BaseMessage]:  # type: ignore
         """Retrieve the messages from Cloud SQL"""
-        query = f"SELECT data, type FROM `{self.table_name}` WHERE session_id = :session_id ORDER BY id;"
-        with self.engine.connect() as conn:
-            results = conn.execute(
-                sqlalchemy.text(query), {"session_id": self.session_id}
-            ).fetchall()
-        # load SQLAlchemy row objects into dicts
-        items = [
-            {"data": json.loads(result[0]), "type": result[1]} for result in results
-        ]
-        messages = messages_from_dict(items)
+        if self.cache is not None:
+            return self._cached_messages(self.cache)
+        messages, _ = self.get_messages_after(0)
         return messages
 
+    def _fetch_rows_after(self, last_id: int) -> Sequence[Any]:
+        self._flush_pending()
+        query = (
+            f"SELECT data, type, id FROM `{self.table_name}` "
+            "WHERE session_id = :session_id AND id > :last_id ORDER BY id;"
+        )
+        with self.engine.connect("chat_history.messages") as conn:
+            return conn.execute(
+                sqlalchemy.text(query),
+                {"session_id": self.session_id, "last_id": last_id},
+            ).fetchall()
+
+    def get_messages_after(self, last_id: int) -> Tuple[List[BaseMessage], int]:
+        """
+        Retrieve only the messages stored after the message with id `last_id`.
+
+        Pass the returned id to the next call to fetch each message once, so
+        the cost per call does not grow with the length of the conversation.
+
+        Args:
+            last_id (int): Id returned by the previous call, 0 for all messages.
+
+        Returns:
+            (Tuple[List[BaseMessage], int]): The new messages in order and the
+                id of the last one, or `last_id` if there are none.
+        """
+        results = self._fetch_rows_after(last_id)
+        if results:
+            last_id = results[-1][2]
+        return _messages_from_rows(results), last_id
+
+    def _cached_messages(self, cache: MessageCache) -> List[BaseMessage]:
+        key = (self.table_name, self.session_id)
+        entry = cache.get(key)
+        if entry is not None and (cache.validate or entry.stale):
+            self._flush_pending()
+            with self.engine.connect("chat_history.validate_cache") as conn:
+                first_id, last_id, count = conn.execute(
+                    sqlalchemy.text(
+                        f"SELECT MIN(id), MAX(id), COUNT(*) FROM `{self.table_name}` "
+                        "WHERE session_id = :session_id;"
+                    ),
+                    {"session_id": self.session_id},
+                ).one()
+            if first_id is None:
+                entry = _CacheEntry((), 0, 0, 0)
+            elif entry.first_id not in (0, first_id) or last_id < entry.last_id:
+                # messages were deleted by another process
+                entry = None
+            else:
+                if last_id > entry.last_id:
+                    entry = self._extended_entry(entry, last_id)
+                # ids become visible at commit, not in id order, so a message
+                # committed late below the cached last id only shows in the count
+                if len(entry.messages) != count:
+                    entry = None
+            if entry is not None:
+                cache.put(key, entry._replace(stale=False))
+        if entry is None:
+            entry = self._extended_entry(_CacheEntry((), 0, 0, 0))
+            cache.put(key, entry)
+        return list(entry.messages)
+
+    def _extended_entry(
+        self, entry: _CacheEntry, max_id: Optional[int] = None
+    ) -> _CacheEntry:
+        rows = self._fetch_rows_after(entry.last_id)
+        if max_id is not None:
+            rows = [row for row in rows if row[2] <= max_id]
+        if not rows:
+            return entry
+        return _CacheEntry(
+            entry.messages + tuple(_messages_from_rows(rows)),
+            entry.first_id or rows[0][2],
+            rows[-1][2],
+            entry.size + sum(len(row[0]) for row in rows),
+        )
+
+    def get_messages(
+        self,
+        last_n: Optional[int] = None,
+        max_tokens: Optional[int] = None,
+        token_counter: Optional[Callable[[BaseMessage], int]] = None,
+    ) -> List[BaseMessage]:
+        """
+        Retrieve the most recent messages of the session.
+
+        Rows are read newest first with `ORDER BY id DESC LIMIT`, and only the
+        rows that are returned are deserialized, so the cost depends on the size
+        of the window rather than the length of the conversation.
+
+        Args:
+            last_n (int, optional): Maximum number of messages to return.
+            max_tokens (int, optional): Token budget of the returned messages.
+                Messages are added newest first until the next one would exceed
+                the budget. Requires `token_counter`.
+            token_counter (Callable[[BaseMessage], int], optional): Counts the
+                tokens of a message, e.g. with the model's tokenizer.
+
+        Returns:
+            (List[BaseMessage]): The selected messages, oldest first.
+        """
+        if last_n is not None and last_n < 0:
+            raise ValueError("'last_n' must not be negative.")
+        if max_tokens is not None and token_counter is None:
+            raise ValueError("'max_tokens' requires a 'token_counter'.")
+        if last_n is None and max_tokens is None:
+            return self.messages
+        self._flush_pending()
+        # only a token budget bounds the window when last_n is not given
+        window: int = last_n if last_n is not None else sys.maxsize
+        page_size = window if max_tokens is None else DEFAULT_WINDOW_PAGE_SIZE
+        page_size = min(page_size, window)
+        query = sqlalchemy.text(
+            f"SELECT data, type, id FROM `{self.table_name}` "
+            "WHERE session_id = :session_id AND id < :before "
+            "ORDER BY id DESC LIMIT :limit;"
+        )
+        selected: List[BaseMessage] = []
+        tokens = 0
+        before = 2**63 - 1
+        with self.engine.connect("chat_history.get_messages") as conn:
+            while len(selected) < window:
+                limit = min(page_size, window - len(selected))
+                rows = conn.execute(
+                    query,
+                    {"session_id": self.session_id, "before": before, "limit": limit},
+                ).fetchall()
+                if not rows:
+                    break
+                before = rows[-1][2]
+                for row in rows:
+                    # deserialize row by row, the budget may end the window early
+                    message = _messages_from_rows([row])[0]
+                    if max_tokens is not None:
+                        tokens += token_counter(message)  # type: ignore[misc]
+                        if tokens > max_tokens:
+                            return selected[::-1]
+                    selected.append(message)
+                if len(rows) < limit:
+                    break
+        return selected[::-1]
+
+    def _flush_pending(self) -> None:
+        # make buffered messages of this session visible to reads and deletes
+        if self.write_buffer is not None and self.write_buffer.has_pending(
+            self.table_name, self.session_id
+        ):
+            self.write_buffer.flush()
+
     def add_message(self, message: BaseMessage) -> None:
         """Append the message to the record in Cloud SQL"""
-        query = f"INSERT INTO `{self.table_name}` (session_id, data, type) VALUES (:session_id, :data, :type);"
-        with self.engine.connect() as conn:
-            conn.execute(
-                sqlalchemy.text(query),
-                {
-                    "session_id": self.session_id,
-                    "data": json.dumps(message.dict()),
-                    "type": message.type,
-                },
-            )
+        self.add_messages([message])
+
+    def add_messages(self, messages: Sequence[BaseMessage]) -> None:
+        """
+        Append messages with a single multi-row INSERT and commit, or hand them to the
+        write buffer.
+
+        Args:
+            messages (Sequence[BaseMessage]): The messages to append, in order.
+        """
+        if not messages:
+            return
+        key = (self.table_name, self.session_id)
+        if self.write_buffer is not None:
+            self.write_buffer.add(self.table_name, self.session_id, messages)
+            if self.cache is not None:
+                # buffered rows have no ids yet, fetch them on the next read
+                self.cache.mark_stale(key)
+            return
+        entry = self.cache.get(key) if self.cache is not None else None
+        rows = _message_rows(self.session_id, messages)
+        with self.engine.connect("chat_history.add_message") as conn:
+            _insert_messages(conn, self.table_name, rows)
+            new_ids: List[int] = []
+            count = 0
+            if entry is not None:
+                # locking reads wait for uncommitted messages of other writers
+                # of the session, so messages committed out of id order are
+                # seen as well
+                count = conn.execute(
+                    sqlalchemy.text(
+                        f"SELECT COUNT(*) FROM `{self.table_name}` "
+                        "WHERE session_id = :session_id LOCK IN SHARE MODE;"
+                    ),
+                    {"session_id": self.session_id},
+                ).scalar_one()
+                new_ids = list(
+                    conn.execute(
+                        sqlalchemy.text(
+                            f"SELECT id FROM `{self.table_name}` WHERE session_id = "
+                            ":session_id AND id > :last_id ORDER BY id "
+                            "LOCK IN SHARE MODE;"
+                        ),
+                        {"session_id": self.session_id, "last_id": entry.last_id},
+                    ).scalars()
+                )
             conn.commit()
+        if self.cache is None or entry is None:
+            return
+        if len(new_ids) != len(messages) or count != len(entry.messages) + len(
+            messages
+        ):
+            # the cached messages are not directly followed by the new ones,
+            # reload on the next read
+            self.cache.invalidate(key)
+            return
+        self.cache.put(
+            key,
+            _CacheEntry(
+                entry.messages + tuple(messages),
+                entry.first_id or new_ids[0],
+                new_ids[-1],
+                entry.size + sum(len(row["data"]) for row in rows),
+                entry.stale,
+            ),
+        )
 
     def clear(self) -> None:
         """Clear session memory from Cloud SQL"""
+        self._flush_pending()
         query = f"DELETE FROM `{self.table_name}` WHERE session_id = :session_id;"
-        with self.engine.connect() as conn:
+        with self.engine.connect("chat_history.clear") as conn:
             conn.execute(sqlalchemy.text(query), {"session_id": self.session_id})
             conn.commit()
+        if self.cache is not None:
+            self.cache.put((self.table_name, self.session_id), _CacheEntry((), 0, 0, 0))
@@ -15,7 +15,25 @@
 # TODO: Remove below import when minimum supported Python version is 3.10
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Dict, Optional, List
+import asyncio
+import datetime
+import functools
+import logging
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+    Union,
+)
 
 import google.auth
 import google.auth.transport.requests
@@ -24,28 +42,56 @@ import sqlalchemy
 from google.cloud.sql.connector import Connector
 from sqlalchemy import Column, text
 
+from . import metrics
+from .metrics import MetricsSink
+from .vector_codec import EmbeddingCodec, EmbeddingDtype
+
 if TYPE_CHECKING:
     import google.auth.credentials
     import pymysql
 
+T = TypeVar("T")
 
-def _get_iam_principal_email(
-    credentials: google.auth.credentials.Credentials,
-) -> str:
-    """Get email address associated with current authenticated IAM principal.
+logger = logging.getLogger(__name__)
 
-    Email will be used for automatic IAM database authentication to Cloud SQL.
+# Worker threads of the async executor when the pool size is unknown, the
+# capacity of SQLAlchemy's default QueuePool.
+_DEFAULT_EXECUTOR_WORKERS = 15
 
-    Args:
-        credentials (google.auth.credentials.Credentials):
-            The credentials object to use in finding the associated IAM
-            principal email address.
+# Connection.info key holding start times of in-flight statements.
+_STATEMENT_START_KEY = "langchain_statement_start"
+
+_IAM_SCOPES = ["https://www.googleapis.com/auth/userinfo.email"]
+# Lifetime of a cached principal email for credentials without a token expiry.
+_PRINCIPAL_EMAIL_TTL = datetime.timedelta(hours=1)
+
+_credentials_lock = threading.Lock()
+_default_credentials: Optional[google.auth.credentials.Credentials] = None
+# weakly keyed, so entries go away with their credentials objects
+_principal_email_cache: weakref.WeakKeyDictionary[
+    google.auth.credentials.Credentials, Tuple[str, datetime.datetime]
+] = weakref.WeakKeyDictionary()
+
+
+def _get_default_credentials() -> google.auth.credentials.Credentials:
+    """Get the environment's Application Default Credentials.
+
+    Credentials are resolved once per process and shared by all engines, so
+    the same token is reused instead of being refreshed for every engine.
 
     Returns:
-        email (str):
-            The email address associated with the current authenticated IAM
-            principal.
+        (google.auth.credentials.Credentials): The shared ADC credentials.
     """
+    global _default_credentials
+    with _credentials_lock:
+        if _default_credentials is None:
+            _default_credentials, _ = google.auth.default(scopes=_IAM_SCOPES)
+        return _default_credentials
+
+
+def _fetch_iam_principal_email(
+    credentials: google.auth.credentials.Credentials,
+) -> str:
     # refresh credentials if they are not valid
     if not credentials.valid:
         request = google.auth.transport.requests.Request()
@@ -67,16 +113,84 @@ def _get_iam_principal_email(
     return email
 
 
+def _get_iam_principal_email(
+    credentials: google.auth.credentials.Credentials,
+) -> str:
+    """Get email address associated with current authenticated IAM principal.
+
+    Email will be used for automatic IAM database authentication to Cloud SQL.
+    Results are cached per credentials object until its token expires, so
+    engines sharing credentials skip the refresh and the tokeninfo call.
+
+    Args:
+        credentials (google.auth.credentials.Credentials):
+            The credentials object to use in finding the associated IAM
+            principal email address.
+
+    Returns:
+        email (str):
+            The email address associated with the current authenticated IAM
+            principal.
+    """
+    # google-auth expiry timestamps are naive UTC datetimes
+    now = datetime.datetime.utcnow()
+    with _credentials_lock:
+        cached = _principal_email_cache.get(credentials)
+    if cached is not None and now < cached[1]:
+        return cached[0]
+    email = _fetch_iam_principal_email(credentials)
+    expiry = getattr(credentials, "expiry", None) or now + _PRINCIPAL_EMAIL_TTL
+    with _credentials_lock:
+        _principal_email_cache[credentials] = (email, expiry)
+    return email
+
+
+def _close_connector(connector: Connector) -> None:
+    # close from a new thread, the finalizer may run on the connector's own
+    # event loop thread, which close() joins
+    threading.Thread(target=connector.close, daemon=True).start()
+
+
+class _CredentialsConnector:
+    """Connector of injected credentials, shared by the engines using them.
+
+    Engines hold a reference to it through their connection factory, and the
+    connector with its background thread is closed once no engine does.
+    """
+
+    def __init__(self, credentials: google.auth.credentials.Credentials) -> None:
+        self.connector = Connector(credentials=credentials)
+        finalizer = weakref.finalize(self, _close_connector, self.connector)
+        # daemon threads of the connector stop with the interpreter anyway
+        finalizer.atexit = False
+
+    def connect(self, *args: Any, **kwargs: Any) -> Any:
+        return self.connector.connect(*args, **kwargs)
+
+
 class MySQLEngine:
     """A class for managing connections to a Cloud SQL for MySQL database."""
 
     _connector: Optional[Connector] = None
+    # connectors for injected credentials, keyed by credentials identity. A
+    # connector keeps its credentials alive, so ids are not reused while an
+    # entry exists.
+    _credential_connectors: weakref.WeakValueDictionary[
+        int, _CredentialsConnector
+    ] = weakref.WeakValueDictionary()
 
     def __init__(
         self,
         engine: sqlalchemy.engine.Engine,
+        metrics_sink: Optional[MetricsSink] = None,
     ) -> None:
         self.engine = engine
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self._metrics_sink: Optional[MetricsSink] = None
+        self._metrics_listening = False
+        if metrics_sink is not None:
+            self.set_metrics_sink(metrics_sink)
 
     @classmethod
     def from_instance(
@@ -87,6 +201,14 @@ class MySQLEngine:
         database: str,
         user: Optional[str] = None,
         password: Optional[str] = None,
+        pool_size: int = 5,
+        max_overflow: int = 10,
+        pool_timeout: float = 30.0,
+        pool_recycle: int = -1,
+        pool_pre_ping: bool = False,
+        warmup_connections: int = 0,
+        metrics_sink: Optional[MetricsSink] = None,
+        credentials: Optional[google.auth.credentials.Credentials] = None,
     ) -> MySQLEngine:
         """Create an instance of MySQLEngine from Cloud SQL instance
         details.
@@ -110,6 +232,30 @@ class MySQLEngine:
                 authentication and login. Defaults to None.
             password (str, optional): Database password for 'user' to use for
                 basic database authentication and login. Defaults to None.
+            pool_size (int): Number of connections kept open in the pool.
+                Defaults to 5.
+            max_overflow (int): Number of connections that can be opened
+                beyond `pool_size` under load. Defaults to 10.
+            pool_timeout (float): Seconds to wait for a connection from the
+                pool before giving up. Defaults to 30.
+            pool_recycle (int): Seconds after which a connection is replaced,
+                -1 to never recycle. Set below the server's wait_timeout.
+                Defaults to -1.
+            pool_pre_ping (bool): Whether to test connections for liveness on
+                checkout. Defaults to False.
+            warmup_connections (int): Number of connections to open while
+                creating the engine, so the first requests do not pay the
+                TLS and authentication handshake. At most `pool_size`.
+                Defaults to 0.
+            metrics_sink (Callable[[MetricEvent], None], optional): Receives
+                pool and statement metrics, see `set_metrics_sink`.
+                Defaults to None.
+            credentials (google.auth.credentials.Credentials, optional):
+                Credentials used to connect and, for IAM database
+                authentication, to find the database user. Engines created
+                with the same credentials object share a connector and the
+                principal lookup. Defaults to the environment's ADC, which
+                are resolved once per process.
 
         Returns:
             (MySQLEngine): The engine configured to connect to a
@@ -122,13 +268,64 @@ class MySQLEngine:
                 "both should be specified to use basic user/password "
                 "authentication or neither for IAM DB authentication."
             )
+        if warmup_connections > pool_size:
+            raise ValueError(
+                f"'warmup_connections' ({warmup_connections}) can not exceed "
+                f"'pool_size' ({pool_size})."
+            )
         engine = cls._create_connector_engine(
             instance_connection_name=f"{project_id}:{region}:{instance}",
             database=database,
             user=user,
             password=password,
+            credentials=credentials,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=pool_timeout,
+            pool_recycle=pool_recycle,
+            pool_pre_ping=pool_pre_ping,
+        )
+        mysql_engine = cls(engine=engine, metrics_sink=metrics_sink)
+        if warmup_connections:
+            mysql_engine.warm_up(warmup_connections)
+        return mysql_engine
+
+    @classmethod
+    async def afrom_instance(
+        cls,
+        project_id: str,
+        region: str,
+        instance: str,
+        database: str,
+        user: Optional[str] = None,
+        password: Optional[str] = None,
+        **kwargs: Any,
+    ) -> MySQLEngine:
+        """Create an instance of MySQLEngine from Cloud SQL instance
+        details without blocking the event loop.
+
+        Credential refresh, IAM principal lookup, connector setup and pool
+        warm-up run in a worker thread. See `from_instance` for the arguments,
+        additional keyword arguments such as pool options are passed on.
+
+        Returns:
+            (MySQLEngine): The engine configured to connect to a
+                Cloud SQL instance database.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            None,
+            functools.partial(
+                cls.from_instance,
+                project_id=project_id,
+                region=region,
+                instance=instance,
+                database=database,
+                user=user,
+                password=password,
+                **kwargs,
+            ),
         )
-        return cls(engine=engine)
 
     @classmethod
     def _create_connector_engine(
@@ -137,6 +334,8 @@ class MySQLEngine:
         database: str,
         user: Optional[str],
         password: Optional[str],
+        credentials: Optional[google.auth.credentials.Credentials] = None,
+        **pool_options: Any,
     ) -> sqlalchemy.engine.Engine:
         """Create a SQLAlchemy engine using the Cloud SQL Python Connector.
 
@@ -156,6 +355,10 @@ class MySQLEngine:
                 authentication and login. Defaults to None.
             password (str, optional): Database password for 'user' to use for
                 basic database authentication and login. Defaults to None.
+            credentials (google.auth.credentials.Credentials, optional):
+                Credentials to use instead of the environment's ADC.
+            **pool_options: Connection pool arguments of
+                `sqlalchemy.create_engine`, e.g. pool_size.
 
         Returns:
             (sqlalchemy.engine.Engine): Engine configured using the Cloud SQL
@@ -167,19 +370,16 @@ class MySQLEngine:
             db_user = user
         # otherwise use automatic IAM database authentication
         else:
-            # get application default credentials
-            credentials, _ = google.auth.default(
-                scopes=["https://www.googleapis.com/auth/userinfo.email"]
+            db_user = _get_iam_principal_email(
+                credentials or _get_default_credentials()
             )
-            db_user = _get_iam_principal_email(credentials)
             enable_iam_auth = True
 
-        if cls._connector is None:
-            cls._connector = Connector()
+        connector = cls._get_connector(credentials)
 
         # anonymous function to be used for SQLAlchemy 'creator' argument
         def getconn() -> pymysql.Connection:
-            conn = cls._connector.connect(  # type: ignore
+            conn = connector.connect(
                 instance_connection_name,
                 "pymysql",
                 user=db_user,
@@ -192,17 +392,196 @@ class MySQLEngine:
         return sqlalchemy.create_engine(
             "mysql+pymysql://",
             creator=getconn,
+            **pool_options,
         )
 
-    def connect(self) -> sqlalchemy.engine.Connection:
+    @classmethod
+    def _get_connector(
+        cls, credentials: Optional[google.auth.credentials.Credentials] = None
+    ) -> Union[Connector, _CredentialsConnector]:
+        """Get the connector shared by engines using the same credentials."""
+        if credentials is None:
+            if cls._connector is None:
+                cls._connector = Connector()
+            return cls._connector
+        with _credentials_lock:
+            connector = cls._credential_connectors.get(id(credentials))
+            if connector is None:
+                connector = _CredentialsConnector(credentials)
+                cls._credential_connectors[id(credentials)] = connector
+            return connector
+
+    def connect(self, operation: Optional[str] = None) -> sqlalchemy.engine.Connection:
         """Create a connection from SQLAlchemy connection pool.
 
+        Args:
+            operation (str, optional): Name of the operation using the
+                connection, e.g. "vectorstore.add_embeddings". Attached to the
+                metrics of the checkout and of every statement executed on
+                the connection.
+
         Returns:
             (sqlalchemy.engine.Connection): a single DBAPI connection checked
                 out from the connection pool.
         """
-        return self.engine.connect()
+        if self._metrics_sink is None:
+            conn = self.engine.connect()
+        else:
+            start = time.perf_counter()
+            conn = self.engine.connect()
+            self._emit(
+                metrics.POOL_CHECKOUT_WAIT,
+                time.perf_counter() - start,
+                {"operation": operation or ""},
+            )
+        if operation:
+            conn.execution_options(operation=operation)
+        return conn
+
+    def set_metrics_sink(self, sink: Optional[MetricsSink]) -> None:
+        """Send connection pool and statement metrics to `sink`.
 
+        The sink is called with a `MetricEvent` for every pool checkout (wait
+        time), opened and closed connection, executed statement (latency) and
+        failed statement. Events carry the operation name passed to `connect`.
+        Errors raised by the sink are logged and otherwise ignored.
+
+        Args:
+            sink (Callable[[MetricEvent], None], optional): The sink, e.g. an
+                `InMemoryMetricsSink` or `OpenTelemetryMetricsSink`. None
+                stops reporting.
+        """
+        self._metrics_sink = sink
+        if sink is not None and not self._metrics_listening:
+            self._register_metrics_listeners()
+            self._metrics_listening = True
+
+    def _emit(self, name: str, value: float, attributes: Dict[str, str]) -> None:
+        sink = self._metrics_sink
+        if sink is None:
+            return
+        try:
+            sink(metrics.MetricEvent(name, value, attributes))
+        except Exception:
+            logger.warning("Metrics sink failed to record %s.", name, exc_info=True)
+
+    def _register_metrics_listeners(self) -> None:
+        def operation_of(
+            conn: sqlalchemy.engine.Connection, context: Any = None
+        ) -> str:
+            options = (
+                context.execution_options
+                if context is not None
+                else conn.get_execution_options()
+            )
+            return options.get("operation", "")
+
+        def before_cursor_execute(  # type: ignore
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            conn.info.setdefault(_STATEMENT_START_KEY, []).append(time.perf_counter())
+
+        def after_cursor_execute(  # type: ignore
+            conn, cursor, statement, parameters, context, executemany
+        ):
+            starts = conn.info.get(_STATEMENT_START_KEY)
+            if not starts:
+                return
+            self._emit(
+                metrics.STATEMENT_DURATION,
+                time.perf_counter() - starts.pop(),
+                {
+                    "operation": operation_of(conn, context),
+                    "statement": statement.split(None, 1)[0].upper(),
+                },
+            )
+
+        def handle_error(exception_context):  # type: ignore
+            conn = exception_context.connection
+            if conn is None:
+                return
+            starts = conn.info.get(_STATEMENT_START_KEY)
+            if starts:
+                starts.pop()
+            self._emit(
+                metrics.STATEMENT_ERRORS,
+                1,
+                {"operation": operation_of(conn, exception_context.execution_context)},
+            )
+
+        def on_connect(dbapi_connection, connection_record):  # type: ignore
+            self._emit(metrics.CONNECTIONS_OPENED, 1, {})
+
+        def on_close(dbapi_connection, connection_record):  # type: ignore
+            self._emit(metrics.CONNECTIONS_CLOSED, 1, {})
+
+        sqlalchemy.event.listen(
+            self.engine, "before_cursor_execute", before_cursor_execute
+        )
+        sqlalchemy.event.listen(
+            self.engine, "after_cursor_execute", after_cursor_execute
+        )
+        sqlalchemy.event.listen(self.engine, "handle_error", handle_error)
+        sqlalchemy.event.listen(self.engine, "connect", on_connect)
+        sqlalchemy.event.listen(self.engine, "close", on_close)
+
+    def warm_up(self, connections: int) -> None:
+        """Open connections ahead of time and return them to the pool.
+
+        Connections are opened concurrently so warm-up takes about as long as
+        a single handshake.
+
+        Args:
+            connections (int): Number of connections to open.
+        """
+        if connections < 1:
+            return
+        with ThreadPoolExecutor(max_workers=connections) as executor:
+            opened = list(
+                executor.map(lambda _: self.engine.connect(), range(connections))
+            )
+        for conn in opened:
+            conn.close()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        # one worker per connection the pool can hand out, so async callers
+        # queue here instead of holding threads blocked on pool checkout
+        with self._executor_lock:
+            if self._executor is None:
+                pool = self.engine.pool
+                size = getattr(pool, "size", None)
+                max_overflow = getattr(pool, "_max_overflow", 0)
+                if not callable(size):
+                    # the pool does not bound its connections
+                    max_workers = _DEFAULT_EXECUTOR_WORKERS
+                elif max_overflow < 0:
+                    # unbounded overflow
+                    max_workers = max(size(), _DEFAULT_EXECUTOR_WORKERS)
+                else:
+                    max_workers = size() + max_overflow
+                self._executor = ThreadPoolExecutor(
+                    max_workers=max(max_workers, 1),
+                    thread_name_prefix="MySQLEngine",
+                )
+            return self._executor
+
+    async def _run_in_executor(
+        self, func: Callable[..., T], *args: Any, **kwargs: Any
+    ) -> T:
+        """Run blocking database work on the engine's bounded thread pool.
+
+        Args:
+            func (Callable): The function to run.
+            *args: Positional arguments of `func`.
+            **kwargs: Keyword arguments of `func`.
+
+        Returns:
+            The return value of `func`.
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(), functools.partial(func, *args, **kwargs)
+        )
 
     def init_vectorstore_table(
         self,
@@ -214,6 +593,8 @@ class MySQLEngine:
         id_column: str = "langchain_id",
         overwrite_existing: bool = False,
         store_metadata: bool = True,
+        embedding_dtype: Union[str, EmbeddingDtype] = EmbeddingDtype.FLOAT32,
+        store_content_hash: bool = False,
     ) -> None:
         # await self._aexecute_update("CREATE EXTENSION IF NOT EXISTS vector")
         # with self.engine.connect() as conn:
@@ -224,7 +605,7 @@ class MySQLEngine:
         if overwrite_existing:
             # await self._aexecute_update(f"DROP TABLE {table_name}")
             with self.engine.connect() as conn:
-                conn.execute(text(f"DROP TABLE {table_name}"))
+                conn.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
                 conn.commit()
 
         # Currently it's varbinary({vector_size})
@@ -234,11 +615,12 @@ class MySQLEngine:
         #     {content_column} TEXT NOT NULL
         #     {embedding_column} varbinary({vector_size * 4}) NOT NULL"""
 
-        query = f"""CREATE TABLE IF NOT EXISTS {table_name} (
+        # embeddings are stored packed by EmbeddingCodec
+        embedding_bytes = EmbeddingCodec(embedding_dtype).byte_size(vector_size)
+        query = f"""CREATE TABLE IF NOT EXISTS `{table_name}` (
             {id_column} CHAR(36) PRIMARY KEY,
             {content_column} TEXT NOT NULL,
-            {embedding_column} VARBINARY({vector_size * 4}) NOT NULL"""
-
+            {embedding_column} VARBINARY({embedding_bytes}) NOT NULL"""
 
         for column in metadata_columns:
             query += f",\n{column.name} {column.type}" + (
@@ -246,6 +628,9 @@ class MySQLEngine:
             )
         if store_metadata:
             query += ",\nlangchain_metadata JSON"
+        # content hashes let CloudSQLVectorStore upserts skip unchanged texts
+        if store_content_hash:
+            query += ",\nlangchain_content_hash CHAR(64)"
         query += "\n);"
 
         with self.engine.connect() as conn:
@@ -254,11 +639,36 @@ class MySQLEngine:
 
         # await self._aexecute_update(query)
 
+    def init_embedding_cache_table(
+        self, table_name: str, overwrite_existing: bool = False
+    ) -> None:
+        """
+        Create a table for the MySQL tier of `CachedEmbeddings`.
+
+        Args:
+            table_name (str): The MySQL database table name.
+            overwrite_existing (bool): Whether to drop an existing table
+                (Default: False).
+        """
+        with self.engine.connect() as conn:
+            if overwrite_existing:
+                conn.execute(text(f"DROP TABLE IF EXISTS `{table_name}`"))
+            conn.execute(
+                text(
+                    f"""CREATE TABLE IF NOT EXISTS `{table_name}` (
+                    cache_key CHAR(64) PRIMARY KEY,
+                    embedding BLOB NOT NULL
+                    );"""
+                )
+            )
+            conn.commit()
+
     def init_document_table(
         self,
         table_name: str,
         metadata_columns: List[sqlalchemy.Column] = [],
         store_metadata: bool = True,
+        store_fingerprint: bool = False,
     ) -> None:
         """
         Create a table for saving of langchain documents.
@@ -269,6 +679,9 @@ class MySQLEngine:
                 to create for custom metadata. Optional.
             store_metadata (bool): Whether to store extra metadata in a metadata column
                 if not described in 'metadata' field list (Default: True).
+            store_fingerprint (bool): Whether to add an indexed 'langchain_fingerprint'
+                column holding a hash of each saved document, which lets
+                MySQLDocumentSaver delete documents in bulk (Default: False).
         """
         columns = [
             sqlalchemy.Column(
@@ -288,6 +701,16 @@ class MySQLEngine:
                     nullable=True,
                 )
             )
+        if store_fingerprint:
+            columns.append(
+                sqlalchemy.Column(
+                    "langchain_fingerprint",
+                    sqlalchemy.CHAR(64),
+                    primary_key=False,
+                    nullable=True,
+                    index=True,
+                )
+            )
         sqlalchemy.Table(table_name, sqlalchemy.MetaData(), *columns).create(
             self.engine
         )
@@ -305,4 +728,3 @@ class MySQLEngine:
         metadata = sqlalchemy.MetaData()
         sqlalchemy.MetaData.reflect(metadata, bind=self.engine, only=[table_name])
         return metadata.tables[table_name]
-
@@ -11,12 +11,25 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import datetime
+import decimal
+import hashlib
 import json
+import queue
+import threading
 from collections.abc import Iterable
-from typing import Any, Dict, Iterator, List, Optional, Sequence, cast
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple, cast
 
 import pymysql
 import sqlalchemy
+
+try:
+    import orjson
+
+    _json_loads: Callable[[Any], Any] = orjson.loads
+except ImportError:
+    _json_loads = json.loads
 from langchain_community.document_loaders.base import BaseLoader
 from langchain_core.documents import Document
 
@@ -24,6 +37,13 @@ from langchain_google_cloud_sql_mysql.mysql_engine import MySQLEngine
 
 DEFAULT_CONTENT_COL = "page_content"
 DEFAULT_METADATA_COL = "langchain_metadata"
+DEFAULT_FINGERPRINT_COL = "langchain_fingerprint"
+DEFAULT_BATCH_SIZE = 1000
+DEFAULT_NUM_WORKERS = 4
+# batches buffered per partition queue before workers block
+_PARTITION_QUEUE_SIZE = 4
+# marks the end of a partition in its queue
+_PARTITION_DONE = object()
 
 
 def _parse_doc_from_row(
@@ -44,6 +64,125 @@ def _parse_doc_from_row(
     return Document(page_content=page_content, metadata=metadata)
 
 
+def _compile_row_decoder(
+    description: Sequence[Any],
+    content_columns: Sequence[str],
+    metadata_columns: Sequence[str],
+) -> Callable[[Sequence[Any]], Document]:
+    """Build a function turning result rows into Documents.
+
+    Column positions, JSON columns and the content/metadata layout are resolved
+    once per query, so decoding a row only indexes into it. Produces the same
+    Documents as `_parse_doc_from_row`.
+
+    Args:
+        description (Sequence): The DB-API `cursor.description` of the result.
+        content_columns (Sequence[str]): Columns joined into `page_content`.
+        metadata_columns (Sequence[str]): Columns written into `metadata`.
+
+    Returns:
+        (Callable[[Sequence[Any]], Document]): The row decoder.
+    """
+    # cursor.description is a sequence of 7-item sequences.
+    # Each of these sequences contains information describing one result column:
+    # - name, type_code, display_size, internal_size, precision, scale, null_ok
+    # The first two items (name and type_code) are mandatory, the other five are optional
+    # and are set to None if no meaningful values can be provided.
+    # link: https://peps.python.org/pep-0249/#description
+    positions = {field[0]: i for i, field in enumerate(description)}
+    json_positions = {
+        i
+        for i, field in enumerate(description)
+        if field[1] == pymysql.constants.FIELD_TYPE.JSON
+    }
+    content_positions = [positions[c] for c in content_columns if c in positions]
+    metadata_positions = [
+        (c, positions[c])
+        for c in metadata_columns
+        if c in positions and c != DEFAULT_METADATA_COL
+    ]
+    langchain_metadata_position = (
+        positions.get(DEFAULT_METADATA_COL)
+        if DEFAULT_METADATA_COL in metadata_columns
+        else None
+    )
+    # only parse JSON columns that end up in the Document
+    used_json_positions = sorted(
+        json_positions.intersection(
+            content_positions
+            + [i for _, i in metadata_positions]
+            + [langchain_metadata_position]
+        )
+    )
+
+    def decode(row: Sequence[Any]) -> Document:
+        if used_json_positions:
+            row = list(row)
+            for i in used_json_positions:
+                if row[i] is not None:
+                    row[i] = _json_loads(row[i])
+        page_content = " ".join([str(row[i]) for i in content_positions])
+        metadata: Dict[str, Any] = {}
+        # unnest metadata from langchain_metadata column
+        if langchain_metadata_position is not None:
+            langchain_metadata = row[langchain_metadata_position]
+            if langchain_metadata:
+                metadata.update(langchain_metadata)
+        # load metadata from other columns
+        for column, i in metadata_positions:
+            metadata[column] = row[i]
+        # not Document.construct, which leaves the serialization kwargs unset
+        return Document(page_content=page_content, metadata=metadata)
+
+    return decode
+
+
+def _encode_checkpoint(key: Sequence[Any]) -> str:
+    return json.dumps(list(key), default=str)
+
+
+def _decode_checkpoint(token: str) -> List[Any]:
+    try:
+        key = json.loads(token)
+    except ValueError:
+        key = None
+    if not isinstance(key, list):
+        raise ValueError(f"Invalid checkpoint token: {token!r}.")
+    return key
+
+
+def _canonical_json_default(value: Any) -> Any:
+    # DECIMAL columns come back as Decimal for values saved as float
+    if isinstance(value, decimal.Decimal):
+        return float(value)
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    return str(value)
+
+
+def _row_fingerprint(column_names: Iterable[str], row: Dict[str, Any]) -> str:
+    """SHA-256 of the canonical JSON form of a document row.
+
+    Columns missing from `row` are stored as NULL and hash like None, so a
+    document hashes the same before saving and after loading it back.
+    """
+    canonical = {}
+    for column in column_names:
+        if column == DEFAULT_FINGERPRINT_COL:
+            continue
+        value = row.get(column)
+        # MySQL returns BOOLEAN columns as TINYINT
+        canonical[column] = int(value) if isinstance(value, bool) else value
+    payload = json.dumps(
+        canonical,
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+        default=_canonical_json_default,
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
 def _parse_row_from_doc(column_names: Iterable[str], doc: Document) -> Dict:
     doc_metadata = doc.metadata.copy()
     row: Dict[str, Any] = {DEFAULT_CONTENT_COL: doc.page_content}
@@ -67,6 +206,10 @@ class MySQLLoader(BaseLoader):
         query: str = "",
         content_columns: Optional[List[str]] = None,
         metadata_columns: Optional[List[str]] = None,
+        stream_results: bool = True,
+        batch_size: int = DEFAULT_BATCH_SIZE,
+        page_size: Optional[int] = None,
+        resume_from: Optional[str] = None,
     ):
         """
         Document page content defaults to the first column present in the query or table and
@@ -85,12 +228,39 @@ class MySQLLoader(BaseLoader):
              of the document. Optional.
           metadata_columns (List[str]): The columns to write into the `metadata` of the document.
              Optional.
+          stream_results (bool): Read rows with an unbuffered server-side cursor so memory
+             use stays flat regardless of the result size. Disable to download the whole
+             result set before the first document is yielded. Defaults to True.
+          batch_size (int): Number of rows fetched from the cursor at a time.
+             Defaults to 1000.
+          page_size (int): Load `table_name` in pages of this many rows, walking the table
+             by primary key (`WHERE pk > :last ORDER BY pk LIMIT page_size`). Each page is
+             read in its own short transaction and the connection is returned to the pool
+             before its documents are yielded. Optional.
+          resume_from (str): A `checkpoint` token of an earlier paginated load. Loading
+             resumes after the last document consumed by that load. Optional.
         """
         self.engine = engine
         self.table_name = table_name
         self.query = query
         self.content_columns = content_columns
         self.metadata_columns = metadata_columns
+        self.stream_results = stream_results
+        self.batch_size = batch_size
+        self.page_size = page_size
+        self.resume_from = resume_from
+        # token of the last document consumed from a paginated load
+        self.checkpoint: Optional[str] = resume_from
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be a positive integer.")
+        if page_size is not None and page_size < 1:
+            raise ValueError("'page_size' must be a positive integer.")
+        if page_size is None and resume_from is not None:
+            raise ValueError("'resume_from' requires 'page_size' to be specified.")
+        if page_size is not None and query:
+            raise ValueError("'page_size' can only be used with 'table_name'.")
+        if resume_from is not None:
+            _decode_checkpoint(resume_from)
         if not self.table_name and not self.query:
             raise ValueError("One of 'table_name' or 'query' must be specified.")
         if self.table_name and self.query:
@@ -114,44 +284,282 @@ class MySQLLoader(BaseLoader):
         Lazy Load langchain documents from a Cloud SQL MySQL database. Use lazy load to avoid
         caching all documents in memory at once.
 
+        With `page_size`, `checkpoint` is updated as documents are consumed. Pass it as
+        `resume_from` to a new loader to continue an interrupted load.
+
         Returns:
             (Iterator[langchain_core.documents.Document]): a list of Documents with metadata from
                 specific columns.
         """
+        if self.page_size:
+            yield from self._lazy_load_pages()
+            return
         if self.query:
             stmt = sqlalchemy.text(self.query)
         else:
             stmt = sqlalchemy.text(f"select * from `{self.table_name}`;")
-        with self.engine.connect() as connection:
+        with self.engine.connect("loader.lazy_load") as connection:
+            if self.stream_results:
+                # unbuffered pymysql SSCursor, rows are read as they are fetched
+                connection = connection.execution_options(
+                    stream_results=True, max_row_buffer=self.batch_size
+                )
             result_proxy = connection.execute(stmt)
-            # Get field type information.
-            # cursor.description is a sequence of 7-item sequences.
-            # Each of these sequences contains information describing one result column:
-            # - name, type_code, display_size, internal_size, precision, scale, null_ok
-            # The first two items (name and type_code) are mandatory, the other five are optional
-            # and are set to None if no meaningful values can be provided.
-            # link: https://peps.python.org/pep-0249/#description
-            column_types = [
-                cast(tuple, field)[0:2] for field in result_proxy.cursor.description
+            decode = self._row_decoder(result_proxy)
+            try:
+                while True:
+                    rows = result_proxy.fetchmany(self.batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        yield decode(row)
+            except GeneratorExit:
+                # Closing an unbuffered cursor reads the rest of the result set
+                # from the server. Discard the connection instead when the
+                # caller stops iterating early.
+                if self.stream_results:
+                    connection.invalidate()
+                raise
+
+    def _row_decoder(
+        self, result: sqlalchemy.engine.CursorResult
+    ) -> Callable[[Sequence[Any]], Document]:
+        column_names = list(result.keys())
+        content_columns = self.content_columns or [column_names[0]]
+        metadata_columns = self.metadata_columns or [
+            col
+            for col in column_names
+            if col not in content_columns and col != DEFAULT_FINGERPRINT_COL
+        ]
+        return _compile_row_decoder(
+            result.cursor.description, content_columns, metadata_columns
+        )
+
+    def _primary_key(self) -> List[str]:
+        key_columns = sqlalchemy.inspect(self.engine.engine).get_pk_constraint(
+            self.table_name
+        )["constrained_columns"]
+        if not key_columns:
+            raise ValueError(
+                f"Table '{self.table_name}' has no primary key, which is required for "
+                "paginated loading."
+            )
+        return key_columns
+
+    def _page_stmt(
+        self, key_columns: List[str], last_key: Optional[Sequence[Any]]
+    ) -> Tuple[sqlalchemy.TextClause, Dict[str, Any]]:
+        columns = ", ".join(f"`{column}`" for column in key_columns)
+        params: Dict[str, Any] = {"page_size": self.page_size}
+        where = ""
+        if last_key is not None:
+            if len(last_key) != len(key_columns):
+                raise ValueError(
+                    f"Checkpoint has {len(last_key)} key values but the primary key of "
+                    f"'{self.table_name}' has {len(key_columns)} columns."
+                )
+            values = ", ".join(f":k{i}" for i in range(len(key_columns)))
+            # row value comparison covers composite keys with one index range scan
+            where = f"WHERE ({columns}) > ({values}) "
+            params.update({f"k{i}": value for i, value in enumerate(last_key)})
+        stmt = sqlalchemy.text(
+            f"SELECT * FROM `{self.table_name}` {where}"
+            f"ORDER BY {columns} LIMIT :page_size"
+        )
+        return stmt, params
+
+    def _lazy_load_pages(self) -> Iterator[Document]:
+        key_columns = self._primary_key()
+        last_key = (
+            _decode_checkpoint(self.resume_from)
+            if self.resume_from is not None
+            else None
+        )
+        self.checkpoint = self.resume_from
+        while True:
+            stmt, params = self._page_stmt(key_columns, last_key)
+            with self.engine.connect("loader.page") as connection:
+                result_proxy = connection.execute(stmt, params)
+                decode = self._row_decoder(result_proxy)
+                rows = result_proxy.fetchall()
+                # end the read transaction before handing out documents
+                connection.rollback()
+            if not rows:
+                return
+            for row in rows:
+                yield decode(row)
+                # the caller asked for the next document, so this one is done
+                self.checkpoint = _encode_checkpoint(
+                    [getattr(row, column) for column in key_columns]
+                )
+            if len(rows) < cast(int, self.page_size):
+                return
+            last_key = [getattr(rows[-1], column) for column in key_columns]
+
+    def lazy_load_parallel(
+        self,
+        num_workers: int = DEFAULT_NUM_WORKERS,
+        num_partitions: Optional[int] = None,
+        partition_by: str = "range",
+        ordered: bool = False,
+    ) -> Iterator[Document]:
+        """
+        Load documents from `table_name` with several connections at once.
+
+        The table is split on its integer primary key, either into contiguous key ranges
+        (`partition_by="range"`) or into `MOD(pk, num_partitions)` shards
+        (`partition_by="mod"`). Partitions are streamed concurrently by `num_workers`
+        threads, each using its own pooled connection. Workers hand documents over through
+        bounded queues, so memory stays flat when the caller is slower than the database.
+
+        Args:
+          num_workers (int): Number of partitions read concurrently. Keep this within the
+             engine's pool size. Defaults to 4.
+          num_partitions (int): Number of partitions. Defaults to `num_workers`.
+          partition_by (str): "range" or "mod". Defaults to "range".
+          ordered (bool): Yield partitions one after another in partition order. With range
+             partitioning the documents are then in primary key order. Otherwise documents
+             are yielded as soon as any worker has read them. Defaults to False.
+
+        Returns:
+            (Iterator[langchain_core.documents.Document]): The documents of the table.
+        """
+        if not self.table_name:
+            raise ValueError("Parallel loading requires 'table_name'.")
+        if num_workers < 1:
+            raise ValueError("'num_workers' must be a positive integer.")
+        num_partitions = num_partitions or num_workers
+        if num_partitions < 1:
+            raise ValueError("'num_partitions' must be a positive integer.")
+        if partition_by not in ("range", "mod"):
+            raise ValueError("'partition_by' must be one of 'range' or 'mod'.")
+        key_columns = self._primary_key()
+        if len(key_columns) != 1:
+            raise ValueError(
+                "Parallel loading requires a single column integer primary key."
+            )
+        key_column = key_columns[0]
+        if partition_by == "range":
+            partitions = self._key_ranges(key_column, num_partitions)
+        else:
+            partitions = [
+                (f"MOD(`{key_column}`, :n) = :shard", {"n": num_partitions, "shard": i})
+                for i in range(num_partitions)
             ]
-            column_names = list(result_proxy.keys())
-            content_columns = self.content_columns or [column_names[0]]
-            metadata_columns = self.metadata_columns or [
-                col for col in column_names if col not in content_columns
+        return self._load_partitions(partitions, key_column, num_workers, ordered)
+
+    def _load_partitions(
+        self,
+        partitions: List[Tuple[str, Dict[str, Any]]],
+        key_column: str,
+        num_workers: int,
+        ordered: bool,
+    ) -> Iterator[Document]:
+        if not partitions:
+            return
+        stop = threading.Event()
+        # one queue per partition keeps partition order available to ordered loads
+        queues: List[queue.Queue] = [
+            queue.Queue(maxsize=_PARTITION_QUEUE_SIZE) for _ in partitions
+        ]
+        shared_queue: queue.Queue = queue.Queue(
+            maxsize=_PARTITION_QUEUE_SIZE * num_workers
+        )
+
+        def put(partition_queue: queue.Queue, item: Any) -> bool:
+            while not stop.is_set():
+                try:
+                    partition_queue.put(item, timeout=0.1)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def load_partition(index: int, where: str, params: Dict[str, Any]) -> None:
+            partition_queue = queues[index] if ordered else shared_queue
+            if stop.is_set():
+                return
+            try:
+                stmt = sqlalchemy.text(
+                    f"SELECT * FROM `{self.table_name}` WHERE {where} "
+                    f"ORDER BY `{key_column}`"
+                )
+                with self.engine.connect("loader.lazy_load_parallel") as connection:
+                    connection = connection.execution_options(
+                        stream_results=True, max_row_buffer=self.batch_size
+                    )
+                    result_proxy = connection.execute(stmt, params)
+                    decode = self._row_decoder(result_proxy)
+                    while True:
+                        rows = result_proxy.fetchmany(self.batch_size)
+                        if not rows:
+                            break
+                        docs = [decode(row) for row in rows]
+                        if not put(partition_queue, docs):
+                            # don't drain the unbuffered cursor on close
+                            connection.invalidate()
+                            return
+            except BaseException as error:
+                put(partition_queue, error)
+                return
+            put(partition_queue, _PARTITION_DONE)
+
+        executor = ThreadPoolExecutor(
+            max_workers=min(num_workers, len(partitions)),
+            thread_name_prefix="MySQLLoader",
+        )
+        futures: List[Future] = []
+        try:
+            # partitions start in submission order, so the lowest unfinished
+            # partition is always running and ordered loads cannot deadlock
+            futures = [
+                executor.submit(load_partition, index, where, params)
+                for index, (where, params) in enumerate(partitions)
             ]
-            while True:
-                row = result_proxy.fetchone()
-                if not row:
-                    break
-                # Handle JSON fields
-                row_data = {}
-                for column, field_type in column_types:
-                    value = getattr(row, column)
-                    if field_type == pymysql.constants.FIELD_TYPE.JSON:
-                        row_data[column] = json.loads(value)
-                    else:
-                        row_data[column] = value
-                yield _parse_doc_from_row(content_columns, metadata_columns, row_data)
+            pending = len(partitions)
+            index = 0
+            while pending:
+                item = (queues[index] if ordered else shared_queue).get()
+                if item is _PARTITION_DONE:
+                    pending -= 1
+                    index += 1
+                elif isinstance(item, BaseException):
+                    raise item
+                else:
+                    yield from item
+        finally:
+            stop.set()
+            # the partitions that have not started yet are not needed anymore
+            for future in futures:
+                future.cancel()
+            executor.shutdown(wait=True)
+
+    def _key_ranges(
+        self, key_column: str, num_partitions: int
+    ) -> List[Tuple[str, Dict[str, Any]]]:
+        with self.engine.connect("loader.lazy_load_parallel") as connection:
+            low, high = connection.execute(
+                sqlalchemy.text(
+                    f"SELECT MIN(`{key_column}`), MAX(`{key_column}`) "
+                    f"FROM `{self.table_name}`"
+                )
+            ).one()
+        if low is None:
+            return []
+        if not isinstance(low, int) or not isinstance(high, int):
+            raise ValueError(
+                "Range partitioning requires an integer primary key, use "
+                "partition_by='mod' or 'page_size' instead."
+            )
+        step = max((high - low + 1) // num_partitions, 1)
+        bounds = list(range(low, high + 1, step))[:num_partitions] + [high + 1]
+        return [
+            (
+                f"`{key_column}` >= :low AND `{key_column}` < :high",
+                {"low": bounds[i], "high": bounds[i + 1]},
+            )
+            for i in range(len(bounds) - 1)
+        ]
 
 
 class MySQLDocumentSaver:
@@ -168,6 +576,10 @@ class MySQLDocumentSaver:
             - page_content (type: text)
             - langchain_metadata (type: JSON)
 
+        Tables created with `init_document_table(..., store_fingerprint=True)` also keep an
+        indexed `langchain_fingerprint` column, a hash of the saved row, which `delete` uses
+        to remove documents in bulk.
+
         Args:
           engine: MySQLEngine object to connect to the MySQL database.
           table_name: The name of table for saving documents.
@@ -179,32 +591,88 @@ class MySQLDocumentSaver:
             raise ValueError(
                 f"Missing '{DEFAULT_CONTENT_COL}' field in table {table_name}."
             )
+        self._fingerprint = DEFAULT_FINGERPRINT_COL in self._table.columns.keys()
 
-    def add_documents(self, docs: List[Document]) -> None:
+    def add_documents(
+        self, docs: List[Document], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> None:
         """
         Save documents in the DocumentSaver table. Document’s metadata is added to columns if found or
         stored in langchain_metadata JSON column.
 
+        Documents filling the same set of columns are inserted together with one batched
+        statement. Each batch of `batch_size` rows is committed on its own, so a failure
+        leaves earlier batches saved, and rows of different column sets may be inserted
+        out of order.
+
         Args:
             docs (List[langchain_core.documents.Document]): a list of documents to be saved.
+            batch_size (int): Number of rows inserted and committed at a time.
+                Defaults to 1000.
         """
-        with self.engine.connect() as conn:
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be a positive integer.")
+        column_names = self._table.columns.keys()
+        # executemany needs the same keys in every row of a batch
+        groups: Dict[Tuple[str, ...], List[Dict[str, Any]]] = {}
+        with self.engine.connect("document_saver.add_documents") as conn:
             for doc in docs:
-                row = _parse_row_from_doc(self._table.columns.keys(), doc)
-                conn.execute(sqlalchemy.insert(self._table).values(row))
+                row = _parse_row_from_doc(column_names, doc)
+                if self._fingerprint:
+                    row[DEFAULT_FINGERPRINT_COL] = _row_fingerprint(column_names, row)
+                # metadata key order must not split rows into separate groups
+                key = tuple(sorted(row))
+                group = groups.setdefault(key, [])
+                group.append({column: row[column] for column in key})
+                if len(group) >= batch_size:
+                    conn.execute(sqlalchemy.insert(self._table), group)
+                    conn.commit()
+                    groups[key] = []
+            for group in groups.values():
+                if group:
+                    conn.execute(sqlalchemy.insert(self._table), group)
             conn.commit()
 
-    def delete(self, docs: List[Document]) -> None:
+    def delete(
+        self, docs: List[Document], batch_size: int = DEFAULT_BATCH_SIZE
+    ) -> None:
         """
         Delete all instances of a document from the DocumentSaver table by matching the entire Document
         object.
 
+        If the table has a `langchain_fingerprint` column, documents are matched by their
+        fingerprint with one indexed `DELETE ... WHERE langchain_fingerprint IN (...)` per
+        `batch_size` documents. Otherwise each document is deleted by comparing every column.
+
         Args:
             docs (List[langchain_core.documents.Document]): a list of documents to be deleted.
+            batch_size (int): Number of documents deleted per statement when matching by
+                fingerprint. Defaults to 1000.
         """
-        with self.engine.connect() as conn:
+        if batch_size < 1:
+            raise ValueError("'batch_size' must be a positive integer.")
+        column_names = self._table.columns.keys()
+        with self.engine.connect("document_saver.delete") as conn:
+            if self._fingerprint:
+                fingerprints = list(
+                    dict.fromkeys(
+                        _row_fingerprint(
+                            column_names, _parse_row_from_doc(column_names, doc)
+                        )
+                        for doc in docs
+                    )
+                )
+                fingerprint_col = self._table.columns[DEFAULT_FINGERPRINT_COL]
+                for i in range(0, len(fingerprints), batch_size):
+                    conn.execute(
+                        sqlalchemy.delete(self._table).where(
+                            fingerprint_col.in_(fingerprints[i : i + batch_size])
+                        )
+                    )
+                conn.commit()
+                return
             for doc in docs:
-                row = _parse_row_from_doc(self._table.columns.keys(), doc)
+                row = _parse_row_from_doc(column_names, doc)
                 # delete by matching all fields of document
                 where_conditions = []
                 for col in self._table.columns:
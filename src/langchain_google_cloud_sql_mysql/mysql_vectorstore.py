@@ -16,22 +16,269 @@
 from __future__ import annotations
 
 import asyncio
+import collections
+import hashlib
 import json
+import logging
+import queue
+import threading
+import time
 import uuid
-from typing import Any, Callable, Iterable, List, Optional, Tuple, Type, Union
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+    Union,
+)
 
-import nest_asyncio  # type: ignore
 import numpy as np
 from langchain_community.vectorstores.utils import maximal_marginal_relevance
 from langchain_core.documents import Document
 from langchain_core.embeddings import Embeddings
 from langchain_core.vectorstores import VectorStore
-from sqlalchemy import text
+from sqlalchemy import TextClause, bindparam, text
 
+from .indexes import (
+    DEFAULT_DISTANCE_STRATEGY,
+    BaseIndex,
+    DistanceStrategy,
+    FlatIndex,
+    _distances,
+    _prepare_query,
+    _similarities,
+    _TopK,
+    load_index,
+    save_index,
+)
 from .mysql_engine import MySQLEngine
+from .vector_codec import EmbeddingCodec, EmbeddingDtype
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_K = 4
+DEFAULT_FETCH_K = 20
+DEFAULT_LAMBDA_MULT = 0.5
+DEFAULT_SCAN_BATCH_SIZE = 10000
+DEFAULT_INSERT_BATCH_SIZE = 500
+DEFAULT_EMBEDDING_BATCH_SIZE = 100
+DEFAULT_EMBEDDING_CONCURRENCY = 4
+# Stay well below MySQL's default max_allowed_packet (4MB on 5.7, 64MB on 8.0).
+DEFAULT_MAX_BATCH_BYTES = 4 * 1024 * 1024
+# Rough per-row allowance for quoting, separators and parentheses.
+_ROW_OVERHEAD_BYTES = 16
+
+
+# Namespace of ids derived from content hashes by upserts without ids.
+_CONTENT_ID_NAMESPACE = uuid.uuid5(
+    uuid.NAMESPACE_URL, "langchain-google-cloud-sql-mysql/content-hash"
+)
+
+
+def _content_hash(content: str, metadata: Optional[dict] = None) -> str:
+    """SHA-256 of a text and, if given, the canonical JSON of its metadata."""
+    if metadata is None:
+        payload = content
+    else:
+        payload = json.dumps(
+            [content, metadata],
+            sort_keys=True,
+            separators=(",", ":"),
+            ensure_ascii=False,
+            default=str,
+        )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+_COMPARISON_OPERATORS = {
+    "$eq": "=",
+    "$ne": "!=",
+    "$lt": "<",
+    "$lte": "<=",
+    "$gt": ">",
+    "$gte": ">=",
+}
+
+
+def _json_path(field: str) -> str:
+    """JSON path of a dotted metadata key, e.g. 'a.b' -> '$."a"."b"'."""
+    keys = field.split(".")
+    return "$" + "".join('."' + key.replace('"', '\\"') + '"' for key in keys)
+
+
+class _FilterCompiler:
+    """Compiles a metadata filter into a parameterized MySQL WHERE condition.
+
+    Fields stored in metadata columns are compared directly, other fields
+    are read from the JSON metadata column with JSON_EXTRACT.
+    """
+
+    def __init__(
+        self, metadata_columns: Sequence[str], metadata_json_column: Optional[str]
+    ) -> None:
+        self.metadata_columns = set(metadata_columns)
+        self.metadata_json_column = metadata_json_column
+        self.params: Dict[str, Any] = {}
+
+    def _param(self, value: Any) -> str:
+        name = f"filter_{len(self.params)}"
+        self.params[name] = value
+        return f":{name}"
+
+    def _field(self, field: str) -> Tuple[str, bool]:
+        if field in self.metadata_columns:
+            return f"`{field}`", False
+        if self.metadata_json_column is None:
+            raise ValueError(
+                f"Cannot filter on '{field}', it is not a metadata column and "
+                "the table has no metadata JSON column."
+            )
+        path = self._param(_json_path(field))
+        return f"JSON_EXTRACT(`{self.metadata_json_column}`, {path})", True
+
+    def _value(self, value: Any, is_json: bool) -> str:
+        if is_json and isinstance(value, bool):
+            # JSON true/false only equal JSON booleans, not 1/0
+            return f"CAST({self._param('true' if value else 'false')} AS JSON)"
+        return self._param(value)
+
+    def _comparison(self, field: str, operator: str, value: Any) -> str:
+        column, is_json = self._field(field)
+        if operator in ("$in", "$nin"):
+            if not isinstance(value, (list, tuple)):
+                raise ValueError(f"'{operator}' on '{field}' expects a list.")
+            if not value:
+                return "FALSE" if operator == "$in" else "TRUE"
+            if is_json:
+                # MySQL does not support IN() on JSON values
+                condition = " OR ".join(
+                    f"{column} = {self._value(item, True)}" for item in value
+                )
+            else:
+                condition = f"{column} IN {self._param(list(value))}"
+            if operator == "$in":
+                return f"({condition})"
+            # missing keys and NULL columns match, as in memory
+            return f"({column} IS NULL OR NOT ({condition}))"
+        if operator == "$exists":
+            return f"{column} IS {'NOT ' if value else ''}NULL"
+        if operator not in _COMPARISON_OPERATORS:
+            raise ValueError(f"Unsupported filter operator '{operator}'.")
+        if isinstance(value, (list, tuple, dict)):
+            raise ValueError(
+                f"'{operator}' on '{field}' expects a scalar value, use '$in' "
+                "to match one of several values."
+            )
+        if value is None and operator in ("$eq", "$ne"):
+            if is_json:
+                # matches missing keys and JSON null values
+                column = f"COALESCE(JSON_TYPE({column}), 'NULL')"
+                return f"{column} {_COMPARISON_OPERATORS[operator]} 'NULL'"
+            return f"{column} IS {'NOT ' if operator == '$ne' else ''}NULL"
+        condition = (
+            f"{column} {_COMPARISON_OPERATORS[operator]} {self._value(value, is_json)}"
+        )
+        if operator == "$ne":
+            # missing keys and NULL columns compare as NULL, but match $ne
+            # in memory
+            return f"({column} IS NULL OR {condition})"
+        return condition
+
+    def compile(self, filter: Dict[str, Any]) -> str:
+        if not isinstance(filter, dict) or not filter:
+            raise ValueError(f"Invalid filter {filter!r}, expected a non-empty dict.")
+        conditions = []
+        for key, value in filter.items():
+            if key in ("$and", "$or"):
+                if not isinstance(value, (list, tuple)) or not value:
+                    raise ValueError(f"'{key}' expects a non-empty list of filters.")
+                joiner = " AND " if key == "$and" else " OR "
+                conditions.append(
+                    "(" + joiner.join(self.compile(item) for item in value) + ")"
+                )
+            elif key.startswith("$"):
+                raise ValueError(f"Unsupported filter operator '{key}'.")
+            elif isinstance(value, dict):
+                conditions += [
+                    self._comparison(key, operator, operand)
+                    for operator, operand in value.items()
+                ]
+            else:
+                conditions.append(self._comparison(key, "$eq", value))
+        if len(conditions) == 1:
+            return conditions[0]
+        return "(" + " AND ".join(conditions) + ")"
+
+
+def _compile_filter(
+    filter: Dict[str, Any],
+    metadata_columns: Sequence[str],
+    metadata_json_column: Optional[str],
+) -> Tuple[str, Dict[str, Any]]:
+    """Compile a metadata filter into a WHERE clause and its bind parameters.
+
+    Args:
+        filter (dict): Field conditions such as `{"tenant": "acme"}` or
+            `{"year": {"$gte": 2020}}`, combined with `$and`/`$or` lists.
+            Operators: $eq, $ne, $lt, $lte, $gt, $gte, $in, $nin, $exists.
+            Missing JSON fields and NULL columns match $ne and $nin.
+        metadata_columns (Sequence[str]): Fields stored in their own columns.
+        metadata_json_column (str, optional): JSON column holding the other
+            fields. Dotted keys address nested values.
+
+    Returns:
+        The WHERE clause and its bind parameters.
+    """
+    compiler = _FilterCompiler(metadata_columns, metadata_json_column)
+    return f"WHERE {compiler.compile(filter)}", compiler.params
+
+
+def _estimate_row_bytes(row: Dict[str, Any]) -> int:
+    size = _ROW_OVERHEAD_BYTES
+    for value in row.values():
+        if value is None:
+            size += 4
+        elif isinstance(value, (bytes, bytearray)):
+            # binary values are sent hex-escaped in the worst case
+            size += 2 * len(value) + 3
+        else:
+            size += len(str(value).encode("utf-8")) + 2
+    return size
+
+
+def _batch_rows(
+    rows: Iterable[Dict[str, Any]], batch_size: int, max_batch_bytes: int
+) -> Iterator[List[Dict[str, Any]]]:
+    """Group rows into batches bounded by row count and estimated byte size.
+
+    A single row larger than `max_batch_bytes` is emitted in a batch of its own.
+    """
+    if batch_size < 1:
+        raise ValueError("batch_size must be a positive integer.")
+    batch: List[Dict[str, Any]] = []
+    batch_bytes = 0
+    for row in rows:
+        row_bytes = _estimate_row_bytes(row)
+        if batch and (
+            len(batch) >= batch_size or batch_bytes + row_bytes > max_batch_bytes
+        ):
+            yield batch
+            batch, batch_bytes = [], 0
+        batch.append(row)
+        batch_bytes += row_bytes
+    if batch:
+        yield batch
+
 
 class CloudSQLVectorStore(VectorStore):
-    """Google Cloud SQL for PostgreSQL Vector Store class"""
+    """Google Cloud SQL for MySQL Vector Store class"""
 
     def __init__(
         self,
@@ -44,29 +291,54 @@ class CloudSQLVectorStore(VectorStore):
         ignore_metadata_columns: Optional[List[str]] = None,
         id_column: str = "langchain_id",
         metadata_json_column: str = "langchain_metadata",
+        content_hash_column: str = "langchain_content_hash",
+        hash_metadata: bool = False,
         # index_query_options: Optional[
         #     HNSWIndex.QueryOptions | IVFFlatIndex.QueryOptions
         # ] = None,
-        # distance_strategy: DistanceStrategy = DEFAULT_DISTANCE_STRATEGY,
+        distance_strategy: DistanceStrategy = DEFAULT_DISTANCE_STRATEGY,
         overwrite_existing: bool = False,
-        # k: Optional[int] = None,
+        embedding_dtype: Union[str, EmbeddingDtype] = EmbeddingDtype.FLOAT32,
+        k: int = DEFAULT_K,
+        scan_batch_size: int = DEFAULT_SCAN_BATCH_SIZE,
         # score_threshold: Optional[float] = None,
-        # fetch_k: Optional[int] = None,
-        # lambda_mult: Optional[float] = None,
+        fetch_k: int = DEFAULT_FETCH_K,
+        lambda_mult: float = DEFAULT_LAMBDA_MULT,
     ):
-        """_summary_
-        Args:
-            engine (PostgreSQLEngine): _description_
-            embedding_service (Embeddings): _description_
-            table_name (str): _description_
-            content_column (str): _description_
-            embedding_column (str): _description_
-            metadata_columns (List[str]): _description_
-            ignore_metadata_columns (List[str]): _description_
-            id_column (str): _description_
-            metadata_json_column (str): _description_
-            index_query_options (_type_): _description_
-            distance_strategy (DistanceStrategy, optional): _description_. Defaults to DEFAULT_DISTANCE_STRATEGY.
+        """
+        Args:
+            engine (MySQLEngine): MySQLEngine object to connect to the MySQL database.
+            embedding_service (Embeddings): Text embedding model to use.
+            table_name (str): Name of an existing table, see
+                `MySQLEngine.init_vectorstore_table`.
+            content_column (str): Column that stores the document content.
+            embedding_column (str): Column that stores the packed embedding.
+            metadata_columns (List[str]): Columns that store metadata fields.
+            ignore_metadata_columns (List[str]): Columns to exclude from
+                metadata. All other columns are used as metadata columns.
+            id_column (str): Primary key column.
+            metadata_json_column (str): JSON column that stores metadata not
+                covered by `metadata_columns`.
+            content_hash_column (str): Column that stores the content hash used
+                by `add_texts(..., upsert=True)`, see
+                `MySQLEngine.init_vectorstore_table`. Optional.
+            hash_metadata (bool): Whether the content hash also covers the
+                metadata, so metadata changes are re-written by upserts.
+                Defaults to False.
+            distance_strategy (DistanceStrategy, optional): Distance function
+                used to rank results. Defaults to DEFAULT_DISTANCE_STRATEGY.
+            overwrite_existing (bool): Whether to truncate the table.
+            embedding_dtype (EmbeddingDtype): Binary encoding of the embedding
+                column. Must match the one used in `init_vectorstore_table`.
+                Defaults to float32.
+            k (int): Default number of documents to return from searches.
+            scan_batch_size (int): Number of embeddings fetched and scored at
+                a time by searches that scan the table.
+            fetch_k (int): Default number of candidates considered by maximal
+                marginal relevance searches.
+            lambda_mult (float): Default diversity of maximal marginal
+                relevance searches, between 0 (maximum diversity) and 1
+                (minimum diversity).
         """
         self.engine = engine
         self.embedding_service = embedding_service
@@ -77,38 +349,42 @@ class CloudSQLVectorStore(VectorStore):
         self.ignore_metadata_columns = ignore_metadata_columns
         self.id_column = id_column
         self.metadata_json_column = metadata_json_column
+        self.store_metadata = False
+        self.content_hash_column = content_hash_column
+        self.hash_metadata = hash_metadata
+        self.store_content_hash = False
         # self.index_query_options = index_query_options
-        # self.distance_strategy = distance_strategy
+        self.distance_strategy = DistanceStrategy(distance_strategy)
         self.overwrite_existing = overwrite_existing
-        # self.store_metadata = False  # Set true later
-        # self.k = k
+        self.codec = EmbeddingCodec(embedding_dtype)
+        self.k = k
+        self.scan_batch_size = scan_batch_size
+        self.index: Optional[BaseIndex] = None
         # self.score_threshold = score_threshold
-        # self.fetch_k = fetch_k
-        # self.lambda_mult = lambda_mult
+        self.fetch_k = fetch_k
+        self.lambda_mult = lambda_mult
         if metadata_columns and ignore_metadata_columns:
             raise ValueError(
                 "Can not use both metadata_columns and ignore_metadata_columns."
             )
         self.__post_init__()
 
-
-
-
     def __post_init__(self) -> None:
         # Truncate the table if overwrite_existing
         if self.overwrite_existing:
-            with self.engine.connect() as conn:
-                conn.execute(text(f"TRUNCATE TABLE {self.table_name}"))
+            with self.engine.connect("vectorstore.init") as conn:
+                conn.execute(text(f"TRUNCATE TABLE `{self.table_name}`"))
                 conn.commit()
 
         stmt = text(
-            f"SELECT column_name, data_type FROM information_schema.columns WHERE table_name = '{self.table_name}'"
+            "SELECT column_name, data_type FROM information_schema.columns "
+            "WHERE table_schema = DATABASE() AND table_name = :table_name"
         )
 
         # async with self.engine.connect() as conn:
         # results = await self.engine._aexecute_fetch(stmt)
-        with self.engine.connect() as conn:
-            results = conn.execute(stmt)
+        with self.engine.connect("vectorstore.init") as conn:
+            results = conn.execute(stmt, {"table_name": self.table_name})
 
         # Get field type information
         columns = {}
@@ -123,9 +399,9 @@ class CloudSQLVectorStore(VectorStore):
             raise ValueError(
                 f"Embedding column, {self.embedding_column}, does not exist."
             )
-        if columns[self.embedding_column] != "USER-DEFINED":
+        if columns[self.embedding_column].lower() not in ("varbinary", "blob"):
             raise ValueError(
-                f"Embedding column, {self.embedding_column}, is not type Vector."
+                f"Embedding column, {self.embedding_column}, is not type VARBINARY."
             )
         for column in self.metadata_columns:
             if column not in columns:
@@ -134,68 +410,999 @@ class CloudSQLVectorStore(VectorStore):
         #     raise ValueError(f"Content column, {content_column}, does not exist.")
         if self.metadata_json_column in columns:
             self.store_metadata = True
+        if self.content_hash_column in columns:
+            self.store_content_hash = True
 
-        all_columns = columns  # .keys()
         if self.ignore_metadata_columns:
-            for column in self.ignore_metadata_columns:
-                del all_columns[column]
-
-            del all_columns[self.id_column]
-            del all_columns[self.content_column]
-            del all_columns[self.embedding_column]
-            self.metadata_columns = [k for k, v in all_columns.keys()]
+            reserved = self.ignore_metadata_columns + [
+                self.id_column,
+                self.content_column,
+                self.embedding_column,
+                self.metadata_json_column,
+                self.content_hash_column,
+            ]
+            self.metadata_columns = [
+                column for column in columns if column not in reserved
+            ]
 
     @property
     def embeddings(self) -> Embeddings:
         return self.embedding_service
-    
+
+    def _insert_columns(self) -> List[str]:
+        columns = [self.id_column, self.content_column, self.embedding_column]
+        columns += self.metadata_columns
+        if self.store_metadata:
+            columns.append(self.metadata_json_column)
+        if self.store_content_hash:
+            columns.append(self.content_hash_column)
+        return columns
+
+    def _insert_stmt(self, upsert: bool = False) -> TextClause:
+        columns = self._insert_columns()
+        column_names = ", ".join(f"`{column}`" for column in columns)
+        # bind by position as column names are not valid bind parameter names
+        values = ", ".join(f":p{i}" for i in range(len(columns)))
+        stmt = f"INSERT INTO `{self.table_name}` ({column_names}) VALUES ({values})"
+        if upsert:
+            # VALUES() rather than a row alias to support MySQL 5.7
+            updates = ", ".join(
+                f"`{column}` = VALUES(`{column}`)"
+                for column in columns
+                if column != self.id_column
+            )
+            stmt += f" ON DUPLICATE KEY UPDATE {updates}"
+        return text(stmt)
+
+    def _content_hash(self, content: str, metadata: dict) -> str:
+        return _content_hash(content, metadata if self.hash_metadata else None)
+
+    def _row_from_embedding(
+        self, id: str, content: str, embedding: List[float], metadata: dict
+    ) -> Dict[str, Any]:
+        values: List[Any] = [id, content, self.codec.encode(embedding)]
+        extra = dict(metadata)
+        for column in self.metadata_columns:
+            values.append(extra.pop(column, None))
+        if self.store_metadata:
+            values.append(json.dumps(extra))
+        if self.store_content_hash:
+            values.append(self._content_hash(content, metadata))
+        return {f"p{i}": value for i, value in enumerate(values)}
+
     def add_embeddings(
         self,
         texts: Iterable[str],
         embeddings: List[List[float]],
         metadatas: Optional[List[dict]] = None,
         ids: Optional[List[str]] = None,
+        batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+        max_batch_bytes: int = DEFAULT_MAX_BATCH_BYTES,
+        upsert: bool = False,
         **kwargs: Any,
     ) -> List[str]:
+        """Insert pre-computed embeddings in batches.
+
+        Rows are grouped into batches of at most `batch_size` rows and roughly
+        `max_batch_bytes` bytes. Each batch is sent as a single multi-row
+        INSERT and committed in its own transaction on one connection.
+
+        Args:
+            texts (Iterable[str]): Texts to store as content.
+            embeddings (List[List[float]]): Embeddings of the texts.
+            metadatas (List[dict], optional): Metadata of the texts.
+            ids (List[str], optional): Ids of the rows. Generated if not given.
+            batch_size (int): Maximum number of rows per INSERT statement.
+            max_batch_bytes (int): Approximate upper bound on the size of one
+                INSERT statement. Keep below the server's max_allowed_packet.
+            upsert (bool): Overwrite rows with existing ids using
+                INSERT ... ON DUPLICATE KEY UPDATE. Defaults to False.
+
+        Returns:
+            (List[str]): The ids of the inserted rows.
+        """
+        texts = list(texts)
         if not ids:
             ids = [str(uuid.uuid4()) for _ in texts]
         if not metadatas:
             metadatas = [{} for _ in texts]
-        for id, content, embedding, metadata in zip(ids, texts, embeddings, metadatas):
-            metadata_col_names = (
-                ", " + ", ".join(self.metadata_columns)
-                if len(self.metadata_columns) > 0
-                else ""
-            )
-            insert_stmt = f"INSERT INTO {self.table_name}({self.id_column}, {self.content_column}, {self.embedding_column}{metadata_col_names}"
-            values_stmt = f" VALUES ('{id}','{content}','{embedding}'"
-            extra = metadata
-            for metadata_column in self.metadata_columns:
-                values_stmt += f",'{metadata[metadata_column]}'"
-                del extra[metadata_column]
-
-            insert_stmt += (
-                f", {self.metadata_json_column})" if self.store_metadata else ")"
+        rows = (
+            self._row_from_embedding(id, content, embedding, metadata)
+            for id, content, embedding, metadata in zip(
+                ids, texts, embeddings, metadatas
             )
-            values_stmt += f",'{extra}')" if self.store_metadata else ")"
-            query = insert_stmt + values_stmt
-            # await self.engine._aexecute_update(query)
-            with self.engine.connect() as conn:
-                conn.execute(text(query))
+        )
+        stmt = self._insert_stmt(upsert)
+        with self.engine.connect("vectorstore.add_embeddings") as conn:
+            for batch in _batch_rows(rows, batch_size, max_batch_bytes):
+                start = time.monotonic()
+                conn.execute(stmt, batch)
                 conn.commit()
+                elapsed = time.monotonic() - start
+                logger.debug(
+                    "Inserted batch of %d rows into %s in %.3fs (%.1f rows/s)",
+                    len(batch),
+                    self.table_name,
+                    elapsed,
+                    len(batch) / elapsed if elapsed > 0 else float("inf"),
+                )
+        if self.index is not None:
+            self.index.add(ids, np.asarray(embeddings, dtype=np.float32))
         return ids
 
     def add_texts(
         self,
         texts: Iterable[str],
-        metadatas: List[dict] = None,
+        metadatas: Optional[List[dict]] = None,
         ids: Optional[List[str]] = None,
+        upsert: bool = False,
         **kwargs: Any,
     ) -> List[str]:
-        # if ids is None:
-        #     ids = [str(uuid.uuid1()) for _ in texts]
-        embeddings = self.embedding_service.embed_documents(list(texts))
-        ids = self.add_embeddings(
-            texts, embeddings, metadatas=metadatas, ids=ids, **kwargs
+        """Embed texts and insert them.
+
+        With `upsert`, the content hashes of the texts are compared with the
+        stored ones in batched lookups and only new or changed texts are
+        embedded and written, with INSERT ... ON DUPLICATE KEY UPDATE. Without
+        ids, ids are derived from the content hash, so re-adding the same text
+        is a no-op. Upserts require the content hash column.
+
+        Args:
+            texts (Iterable[str]): Texts to embed and store.
+            metadatas (List[dict], optional): Metadata of the texts.
+            ids (List[str], optional): Ids of the rows.
+            upsert (bool): Skip unchanged texts and overwrite changed ones.
+                Defaults to False.
+            **kwargs: Batching options of `add_embeddings`.
+
+        Returns:
+            (List[str]): The ids of all given texts.
+        """
+        texts = list(texts)
+        if not upsert:
+            embeddings = self.embedding_service.embed_documents(texts)
+            return self.add_embeddings(
+                texts, embeddings, metadatas=metadatas, ids=ids, **kwargs
+            )
+        ids, changed = self._plan_upsert(
+            texts, metadatas, ids, kwargs.get("batch_size", DEFAULT_INSERT_BATCH_SIZE)
+        )
+        if changed:
+            changed_texts = [texts[i] for i in changed]
+            self.add_embeddings(
+                changed_texts,
+                self.embedding_service.embed_documents(changed_texts),
+                metadatas=[metadatas[i] for i in changed] if metadatas else None,
+                ids=[ids[i] for i in changed],
+                upsert=True,
+                **kwargs,
+            )
+        return ids
+
+    def ingest(
+        self,
+        items: Iterable[Union[str, Document]],
+        embedding_batch_size: int = DEFAULT_EMBEDDING_BATCH_SIZE,
+        max_concurrency: int = DEFAULT_EMBEDDING_CONCURRENCY,
+        upsert: bool = False,
+        **kwargs: Any,
+    ) -> int:
+        """Embed and insert a stream of texts or Documents in constant memory.
+
+        Items are read lazily and grouped into batches of
+        `embedding_batch_size`. Up to `max_concurrency` batches are embedded
+        at once on a thread pool while a writer thread inserts finished
+        batches in input order. Finished batches wait in a bounded queue, so
+        reading pauses when the database falls behind, and only about
+        2 * `max_concurrency` batches are held in memory at any time.
+
+        Args:
+            items (Iterable[Union[str, Document]]): Texts or Documents to store.
+            embedding_batch_size (int): Number of texts per call to
+                `embed_documents`. Defaults to 100.
+            max_concurrency (int): Maximum number of concurrent embedding
+                calls. Defaults to 4.
+            upsert (bool): Skip unchanged texts and overwrite changed ones,
+                see `add_texts`. Defaults to False.
+            **kwargs: Batching options of `add_embeddings`.
+
+        Returns:
+            (int): The number of rows written.
+        """
+        if embedding_batch_size < 1:
+            raise ValueError("'embedding_batch_size' must be a positive integer.")
+        if max_concurrency < 1:
+            raise ValueError("'max_concurrency' must be a positive integer.")
+
+        def batches() -> Iterator[Tuple[List[str], List[dict]]]:
+            texts: List[str] = []
+            metadatas: List[dict] = []
+            for item in items:
+                if isinstance(item, Document):
+                    texts.append(item.page_content)
+                    metadatas.append(item.metadata)
+                else:
+                    texts.append(item)
+                    metadatas.append({})
+                if len(texts) == embedding_batch_size:
+                    yield texts, metadatas
+                    texts, metadatas = [], []
+            if texts:
+                yield texts, metadatas
+
+        def embed(
+            texts: List[str], metadatas: List[dict], ids: List[str]
+        ) -> Tuple[List[str], List[List[float]], List[dict], List[str]]:
+            return texts, self.embedding_service.embed_documents(texts), metadatas, ids
+
+        # finished batches waiting for the writer, None ends the stream
+        pending: queue.Queue = queue.Queue(maxsize=max_concurrency)
+        written = 0
+        write_error: List[BaseException] = []
+
+        def write() -> None:
+            nonlocal written
+            while True:
+                batch = pending.get()
+                if batch is None:
+                    return
+                if write_error:
+                    # keep draining so the producer never blocks on put
+                    continue
+                texts, embeddings, metadatas, ids = batch
+                try:
+                    self.add_embeddings(
+                        texts,
+                        embeddings,
+                        metadatas=metadatas,
+                        ids=ids,
+                        upsert=upsert,
+                        **kwargs,
+                    )
+                    written += len(texts)
+                except BaseException as error:
+                    write_error.append(error)
+
+        writer = threading.Thread(target=write, name="CloudSQLVectorStore-writer")
+        writer.start()
+        in_flight: collections.deque[Future] = collections.deque()
+        try:
+            with ThreadPoolExecutor(
+                max_workers=max_concurrency, thread_name_prefix="CloudSQLVectorStore"
+            ) as executor:
+                for texts, metadatas in batches():
+                    if write_error:
+                        break
+                    if upsert:
+                        ids, changed = self._plan_upsert(
+                            texts,
+                            metadatas,
+                            None,
+                            kwargs.get("batch_size", DEFAULT_INSERT_BATCH_SIZE),
+                        )
+                        if not changed:
+                            continue
+                        texts = [texts[i] for i in changed]
+                        metadatas = [metadatas[i] for i in changed]
+                        ids = [ids[i] for i in changed]
+                    else:
+                        ids = [str(uuid.uuid4()) for _ in texts]
+                    in_flight.append(executor.submit(embed, texts, metadatas, ids))
+                    if len(in_flight) >= max_concurrency:
+                        pending.put(in_flight.popleft().result())
+                while in_flight and not write_error:
+                    pending.put(in_flight.popleft().result())
+        finally:
+            for future in in_flight:
+                future.cancel()
+            pending.put(None)
+            writer.join()
+        if write_error:
+            raise write_error[0]
+        logger.debug("Ingested %d rows into %s", written, self.table_name)
+        return written
+
+    def _plan_upsert(
+        self,
+        texts: List[str],
+        metadatas: Optional[List[dict]],
+        ids: Optional[List[str]],
+        batch_size: int,
+    ) -> Tuple[List[str], List[int]]:
+        """Return the ids of the texts and the positions that need writing."""
+        if not self.store_content_hash:
+            raise ValueError(
+                f"Content hash column, {self.content_hash_column}, does not exist. "
+                "Create the table with `init_vectorstore_table(..., "
+                "store_content_hash=True)` to use upserts."
+            )
+        hashes = [
+            self._content_hash(content, metadata)
+            for content, metadata in zip(texts, metadatas or [{} for _ in texts])
+        ]
+        if not ids:
+            ids = [str(uuid.uuid5(_CONTENT_ID_NAMESPACE, hash)) for hash in hashes]
+        stored: Dict[str, str] = {}
+        stmt = text(
+            f"SELECT `{self.id_column}`, `{self.content_hash_column}` "
+            f"FROM `{self.table_name}` WHERE `{self.id_column}` IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        unique_ids = list(dict.fromkeys(ids))
+        with self.engine.connect("vectorstore.upsert_lookup") as conn:
+            for start in range(0, len(unique_ids), batch_size):
+                result = conn.execute(
+                    stmt, {"ids": unique_ids[start : start + batch_size]}
+                )
+                stored.update((row[0], row[1]) for row in result)
+        # the last text with a given id wins, as it would when written
+        latest = {id: i for i, id in enumerate(ids)}
+        changed = sorted(i for id, i in latest.items() if stored.get(id) != hashes[i])
+        logger.debug(
+            "Upserting %d of %d texts into %s, %d unchanged",
+            len(changed),
+            len(texts),
+            self.table_name,
+            len(latest) - len(changed),
+        )
+        return ids, changed
+
+    def delete(
+        self,
+        ids: Optional[List[str]] = None,
+        batch_size: int = DEFAULT_INSERT_BATCH_SIZE,
+        **kwargs: Any,
+    ) -> Optional[bool]:
+        """Delete rows by id.
+
+        Args:
+            ids (List[str], optional): Ids of the rows to delete.
+            batch_size (int): Maximum number of ids per DELETE statement.
+
+        Returns:
+            (bool): True if the delete statements were executed.
+        """
+        if not ids:
+            return False
+        stmt = text(
+            f"DELETE FROM `{self.table_name}` WHERE `{self.id_column}` IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        with self.engine.connect("vectorstore.delete") as conn:
+            for start in range(0, len(ids), batch_size):
+                conn.execute(stmt, {"ids": ids[start : start + batch_size]})
+            conn.commit()
+        if self.index is not None:
+            self.index.remove(ids)
+        return True
+
+    def apply_vector_index(self, index: BaseIndex) -> None:
+        """Build an in-process vector index from the table and search with it.
+
+        Embeddings are streamed from the table and the index is built with the
+        vector store's distance strategy. While an index is applied,
+        similarity searches are answered from the index and only the content
+        and metadata of the results are read from MySQL. Rows added or deleted
+        through this vector store keep the index up to date; rows changed by
+        other clients are not reflected until the index is rebuilt.
+
+        Args:
+            index (BaseIndex): The index to build, e.g. `IVFFlatIndex()`.
+        """
+        ids: List[np.ndarray] = []
+        matrices: List[np.ndarray] = []
+        for chunk_ids, matrix in self._stream_embeddings():
+            ids.append(chunk_ids)
+            # copy out of the row buffer before the next chunk is fetched
+            matrices.append(np.array(matrix, dtype=np.float32))
+        if matrices:
+            vectors = np.concatenate(matrices)
+        else:
+            vectors = np.empty((0, 0), dtype=np.float32)
+        index.build(
+            list(np.concatenate(ids)) if ids else [], vectors, self.distance_strategy
+        )
+        self.index = index
+
+    def drop_vector_index(self) -> None:
+        """Detach the in-process vector index and go back to full scans."""
+        self.index = None
+
+    def _row_count(self) -> int:
+        with self.engine.connect("vectorstore.row_count") as conn:
+            return conn.execute(
+                text(f"SELECT COUNT(*) FROM `{self.table_name}`")
+            ).scalar_one()
+
+    def save_index_snapshot(
+        self, path: str, watermark_column: Optional[str] = None
+    ) -> None:
+        """Save the vector index to a file that can be memory-mapped on startup.
+
+        If no index is applied, an exact `FlatIndex` is built from the table
+        first. The snapshot records the table's row count and, if given, the
+        maximum value of `watermark_column` so `load_index_snapshot` can tell
+        whether the table changed since.
+
+        Args:
+            path (str): Destination file.
+            watermark_column (str, optional): A column that increases whenever
+                a row is inserted or updated, e.g. an AUTO_INCREMENT id or an
+                `ON UPDATE CURRENT_TIMESTAMP` column.
+        """
+        # read the watermark before the index so catch-up errs on the side of
+        # re-reading rows
+        metadata: Dict[str, Any] = {
+            "table_name": self.table_name,
+            "row_count": self._row_count(),
+        }
+        if watermark_column:
+            with self.engine.connect("vectorstore.save_index_snapshot") as conn:
+                watermark = conn.execute(
+                    text(f"SELECT MAX(`{watermark_column}`) FROM `{self.table_name}`")
+                ).scalar_one()
+            metadata["watermark_column"] = watermark_column
+            metadata["watermark"] = None if watermark is None else str(watermark)
+        if self.index is None:
+            self.apply_vector_index(FlatIndex())
+        save_index(self.index, path, metadata)  # type: ignore[arg-type]
+
+    def load_index_snapshot(
+        self, path: str, catch_up: bool = True, mmap: bool = True
+    ) -> None:
+        """Apply a vector index saved by `save_index_snapshot`.
+
+        The embedding matrix is memory-mapped by default, so loading is fast
+        and worker processes on one host share the pages of the file. Adding
+        embeddings to the index, including during catch-up, moves the matrix
+        into process memory.
+
+        Args:
+            path (str): The snapshot file.
+            catch_up (bool): Whether to bring the index up to date with rows
+                inserted, updated or deleted since the snapshot was taken.
+            mmap (bool): Whether to memory-map the embedding matrix.
+        """
+        index, metadata = load_index(path, mmap=mmap)
+        if metadata.get("table_name") != self.table_name:
+            raise ValueError(
+                f"Snapshot {path} was taken from table {metadata.get('table_name')}, "
+                f"not {self.table_name}."
+            )
+        if index.distance_strategy != self.distance_strategy:
+            raise ValueError(
+                f"Snapshot {path} uses {index.distance_strategy.value}, "
+                f"not {self.distance_strategy.value}."
+            )
+        self.index = index
+        if catch_up:
+            self._catch_up_index(metadata)
+
+    def _catch_up_index(self, metadata: Dict[str, Any]) -> None:
+        """Apply table changes made after a snapshot to the loaded index.
+
+        Rows past the snapshot's watermark are re-read. If the row count still
+        differs from the index, the table's ids are compared with the index to
+        find deleted rows and rows inserted without advancing the watermark.
+        """
+        index = self.index
+        assert index is not None
+        watermark_column = metadata.get("watermark_column")
+        if watermark_column and metadata.get("watermark") is not None:
+            for ids, matrix in self._stream_embeddings(
+                f"WHERE `{watermark_column}` > :watermark",
+                {"watermark": metadata["watermark"]},
+            ):
+                index.add(list(ids), matrix)
+        if self._row_count() == len(index):
+            return
+
+        stmt = text(f"SELECT `{self.id_column}` FROM `{self.table_name}`")
+        with self.engine.connect("vectorstore.load_index_snapshot") as conn:
+            result = conn.execution_options(stream_results=True).execute(stmt)
+            table_ids = {row[0] for row in result}
+        index_ids = set(index.ids())
+        index.remove(index_ids - table_ids)
+        missing = list(table_ids - index_ids)
+        for start in range(0, len(missing), self.scan_batch_size):
+            for ids, matrix in self._stream_embeddings(
+                f"WHERE `{self.id_column}` IN :ids",
+                {"ids": missing[start : start + self.scan_batch_size]},
+            ):
+                index.add(list(ids), matrix)
+
+    def _select_relevance_score_fn(self) -> Callable[[float], float]:
+        if self.distance_strategy == DistanceStrategy.COSINE_DISTANCE:
+            return self._cosine_relevance_score_fn
+        if self.distance_strategy == DistanceStrategy.EUCLIDEAN:
+            return self._euclidean_relevance_score_fn
+        return self._max_inner_product_relevance_score_fn
+
+    def _scan_top_k(
+        self,
+        embedding: List[float],
+        k: int,
+        keep_vectors: bool = False,
+        filter: Optional[dict] = None,
+    ) -> Tuple[List[str], np.ndarray, Optional[np.ndarray]]:
+        """Score every stored embedding and keep the k most similar.
+
+        Embeddings are streamed from the server in chunks of
+        `scan_batch_size` rows. Each chunk is decoded into a matrix,
+        scored with a single matrix-vector product and merged into a running
+        top-k, so client memory does not grow with the table size. A metadata
+        `filter` is evaluated by the server, so only matching rows are
+        streamed and scored.
+
+        Returns:
+            Ids, similarities (higher is better) and, if `keep_vectors` is
+            set, the embeddings of the best rows ordered best first.
+        """
+        query = _prepare_query(np.asarray(embedding), self.distance_strategy)
+        top_k = _TopK(k, keep_vectors=keep_vectors)
+        where, params = self._filter_clause(filter)
+        for ids, matrix in self._stream_embeddings(where, params):
+            similarities = _similarities(matrix, query, self.distance_strategy)
+            top_k.push(ids, similarities, matrix if keep_vectors else None)
+        return top_k.results()
+
+    def _filter_clause(
+        self, filter: Optional[dict]
+    ) -> Tuple[str, Optional[Dict[str, Any]]]:
+        if not filter:
+            return "", None
+        return _compile_filter(
+            filter,
+            self.metadata_columns,
+            self.metadata_json_column if self.store_metadata else None,
+        )
+
+    def _search_candidates(
+        self,
+        embedding: List[float],
+        k: int,
+        keep_vectors: bool = False,
+        filter: Optional[dict] = None,
+    ) -> Tuple[List[str], np.ndarray, Optional[np.ndarray]]:
+        """Find the k most similar rows with the vector index or a table scan.
+
+        Filtered searches always scan the table, as the vector index does not
+        hold metadata.
+
+        Returns:
+            Ids, similarities (higher is better) and, if `keep_vectors` is
+            set, the embeddings of the best rows ordered best first.
+        """
+        if self.index is None or filter:
+            return self._scan_top_k(
+                embedding, k, keep_vectors=keep_vectors, filter=filter
+            )
+        ids, similarities = self.index.search(np.asarray(embedding), k)
+        vectors = self.index.get_vectors(ids) if keep_vectors else None
+        return ids, similarities, vectors
+
+    def _stream_embeddings(
+        self, where: str = "", params: Optional[Dict[str, Any]] = None
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray]]:
+        """Yield (ids, embedding matrix) chunks of `scan_batch_size` rows.
+
+        Rows are read through an unbuffered server-side cursor so only one
+        chunk is held in client memory at a time.
+
+        Args:
+            where (str): Optional WHERE clause restricting the rows.
+            params (dict, optional): Bind parameters of the WHERE clause.
+        """
+        stmt = text(
+            f"SELECT `{self.id_column}`, `{self.embedding_column}` "
+            f"FROM `{self.table_name}` {where}"
+        )
+        for name, value in (params or {}).items():
+            if isinstance(value, (list, tuple)):
+                stmt = stmt.bindparams(bindparam(name, expanding=True))
+        with self.engine.connect("vectorstore.scan_embeddings") as conn:
+            result = conn.execution_options(
+                stream_results=True, max_row_buffer=self.scan_batch_size
+            ).execute(stmt, params or {})
+            for chunk in result.partitions(self.scan_batch_size):
+                ids = np.array([row[0] for row in chunk], dtype=object)
+                yield ids, self.codec.decode_many([row[1] for row in chunk])
+
+    def _get_documents_by_ids(self, ids: List[str]) -> Dict[str, Document]:
+        """Fetch content and metadata of the given rows in a single query."""
+        if not ids:
+            return {}
+        columns = [self.id_column, self.content_column] + self.metadata_columns
+        if self.store_metadata:
+            columns.append(self.metadata_json_column)
+        column_names = ", ".join(f"`{column}`" for column in columns)
+        stmt = text(
+            f"SELECT {column_names} FROM `{self.table_name}` "
+            f"WHERE `{self.id_column}` IN :ids"
+        ).bindparams(bindparam("ids", expanding=True))
+        with self.engine.connect("vectorstore.get_documents") as conn:
+            results = conn.execute(stmt, {"ids": list(ids)}).fetchall()
+
+        documents = {}
+        for row in results:
+            metadata: Dict[str, Any] = {}
+            if self.store_metadata and row[-1]:
+                extra = row[-1]
+                metadata.update(json.loads(extra) if isinstance(extra, str) else extra)
+            for i, column in enumerate(self.metadata_columns, start=2):
+                metadata[column] = row[i]
+            documents[row[0]] = Document(page_content=row[1], metadata=metadata)
+        return documents
+
+    def similarity_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs most similar to query.
+
+        Args:
+            query (str): Text to look up documents similar to.
+            k (int, optional): Number of documents to return.
+            filter (dict, optional): Metadata filter evaluated in SQL, e.g.
+                `{"tenant": "acme", "year": {"$gte": 2020}}`. Supports $eq,
+                $ne, $lt, $lte, $gt, $gte, $in, $nin and $exists, combined
+                with $and/$or lists.
+
+        Returns:
+            List of Documents most similar to the query.
+        """
+        embedding = self.embedding_service.embed_query(query)
+        return self.similarity_search_by_vector(embedding, k=k, filter=filter, **kwargs)
+
+    def similarity_search_with_score(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Return docs most similar to query and their distances.
+
+        Args:
+            query (str): Text to look up documents similar to.
+            k (int, optional): Number of documents to return.
+            filter (dict, optional): Metadata filter evaluated in SQL, see
+                `similarity_search`.
+
+        Returns:
+            List of Documents most similar to the query and their distance,
+            lower is more similar.
+        """
+        embedding = self.embedding_service.embed_query(query)
+        return self.similarity_search_with_score_by_vector(
+            embedding, k=k, filter=filter, **kwargs
+        )
+
+    def similarity_search_by_vector(
+        self,
+        embedding: List[float],
+        k: Optional[int] = None,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs most similar to embedding vector.
+
+        Args:
+            embedding (List[float]): Embedding to look up documents similar to.
+            k (int, optional): Number of documents to return.
+            filter (dict, optional): Metadata filter evaluated in SQL, see
+                `similarity_search`.
+
+        Returns:
+            List of Documents most similar to the embedding.
+        """
+        docs_and_scores = self.similarity_search_with_score_by_vector(
+            embedding, k=k, filter=filter, **kwargs
+        )
+        return [doc for doc, _ in docs_and_scores]
+
+    def similarity_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: Optional[int] = None,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Return docs most similar to embedding vector and their distances.
+
+        Args:
+            embedding (List[float]): Embedding to look up documents similar to.
+            k (int, optional): Number of documents to return.
+            filter (dict, optional): Metadata filter evaluated in SQL, see
+                `similarity_search`.
+
+        Returns:
+            List of Documents most similar to the embedding and their
+            distance, lower is more similar.
+        """
+        ids, similarities, _ = self._search_candidates(
+            embedding, k or self.k, filter=filter
+        )
+        distances = _distances(similarities, self.distance_strategy)
+        documents = self._get_documents_by_ids(ids)
+        return [
+            (documents[id], float(distance))
+            for id, distance in zip(ids, distances)
+            if id in documents
+        ]
+
+    @classmethod
+    def from_texts(  # type: ignore[override]
+        cls: Type[CloudSQLVectorStore],
+        texts: List[str],
+        embedding: Embeddings,
+        engine: MySQLEngine,
+        table_name: str,
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> CloudSQLVectorStore:
+        """Create a CloudSQLVectorStore from texts on an existing table.
+
+        Args:
+            texts (List[str]): Texts to add to the vector store.
+            embedding (Embeddings): Text embedding model to use.
+            engine (MySQLEngine): MySQLEngine object to connect to the MySQL database.
+            table_name (str): Name of an existing table, see
+                `MySQLEngine.init_vectorstore_table`.
+            metadatas (List[dict], optional): Metadata of the texts.
+            ids (List[str], optional): Ids of the texts.
+            **kwargs: Keyword arguments passed to the CloudSQLVectorStore
+                constructor.
+
+        Returns:
+            (CloudSQLVectorStore): The vector store.
+        """
+        vs = cls(
+            engine=engine,
+            embedding_service=embedding,
+            table_name=table_name,
+            **kwargs,
+        )
+        vs.add_texts(texts, metadatas=metadatas, ids=ids)
+        return vs
+
+    def max_marginal_relevance_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs selected using maximal marginal relevance.
+
+        Args:
+            query (str): Text to look up documents similar to.
+            k (int, optional): Number of documents to return.
+            fetch_k (int, optional): Number of candidates to pass to the MMR
+                algorithm.
+            lambda_mult (float, optional): Diversity of the results, between
+                0 (maximum diversity) and 1 (minimum diversity).
+            filter (dict, optional): Metadata filter evaluated in SQL, see
+                `similarity_search`.
+
+        Returns:
+            List of Documents selected by maximal marginal relevance.
+        """
+        embedding = self.embedding_service.embed_query(query)
+        return self.max_marginal_relevance_search_by_vector(
+            embedding,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            filter=filter,
+            **kwargs,
+        )
+
+    def max_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: Optional[int] = None,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs selected using maximal marginal relevance.
+
+        Args:
+            embedding (List[float]): Embedding to look up documents similar to.
+            k (int, optional): Number of documents to return.
+            fetch_k (int, optional): Number of candidates to pass to the MMR
+                algorithm.
+            lambda_mult (float, optional): Diversity of the results, between
+                0 (maximum diversity) and 1 (minimum diversity).
+            filter (dict, optional): Metadata filter evaluated in SQL, see
+                `similarity_search`.
+
+        Returns:
+            List of Documents selected by maximal marginal relevance.
+        """
+        docs_and_scores = self.max_marginal_relevance_search_with_score_by_vector(
+            embedding,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            filter=filter,
+            **kwargs,
+        )
+        return [doc for doc, _ in docs_and_scores]
+
+    def max_marginal_relevance_search_with_score_by_vector(
+        self,
+        embedding: List[float],
+        k: Optional[int] = None,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        filter: Optional[dict] = None,
+        **kwargs: Any,
+    ) -> List[Tuple[Document, float]]:
+        """Return docs and distances selected using maximal marginal relevance.
+
+        Only the embeddings of the `fetch_k` best candidates are kept from the
+        scoring stage. MMR runs on those as one matrix, and content and
+        metadata are read for the `k` selected rows only.
+
+        Args:
+            embedding (List[float]): Embedding to look up documents similar to.
+            k (int, optional): Number of documents to return.
+            fetch_k (int, optional): Number of candidates to pass to the MMR
+                algorithm.
+            lambda_mult (float, optional): Diversity of the results, between
+                0 (maximum diversity) and 1 (minimum diversity).
+            filter (dict, optional): Metadata filter evaluated in SQL, see
+                `similarity_search`.
+
+        Returns:
+            List of Documents selected by maximal marginal relevance and their
+            distance, lower is more similar.
+        """
+        k = k or self.k
+        fetch_k = fetch_k or self.fetch_k
+        lambda_mult = self.lambda_mult if lambda_mult is None else lambda_mult
+        ids, similarities, vectors = self._search_candidates(
+            embedding, fetch_k, keep_vectors=True, filter=filter
+        )
+        if not ids:
+            return []
+        assert vectors is not None  # requested with keep_vectors
+        selected = maximal_marginal_relevance(
+            np.asarray(embedding, dtype=np.float32),
+            list(vectors),
+            lambda_mult=lambda_mult,
+            k=k,
+        )
+        distances = _distances(similarities[selected], self.distance_strategy)
+        selected_ids = [ids[i] for i in selected]
+        documents = self._get_documents_by_ids(selected_ids)
+        return [
+            (documents[id], float(distance))
+            for id, distance in zip(selected_ids, distances)
+            if id in documents
+        ]
+
+    async def aadd_embeddings(
+        self,
+        texts: Iterable[str],
+        embeddings: List[List[float]],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Insert pre-computed embeddings in batches, see `add_embeddings`."""
+        return await self.engine._run_in_executor(
+            self.add_embeddings,
+            list(texts),
+            embeddings,
+            metadatas=metadatas,
+            ids=ids,
+            **kwargs,
+        )
+
+    async def aadd_texts(
+        self,
+        texts: Iterable[str],
+        metadatas: Optional[List[dict]] = None,
+        ids: Optional[List[str]] = None,
+        upsert: bool = False,
+        **kwargs: Any,
+    ) -> List[str]:
+        """Embed texts with the async embedding API and insert them, see
+        `add_texts`."""
+        texts = list(texts)
+        if not upsert:
+            embeddings = await self.embedding_service.aembed_documents(texts)
+            return await self.aadd_embeddings(
+                texts, embeddings, metadatas=metadatas, ids=ids, **kwargs
+            )
+        planned_ids, changed = await self.engine._run_in_executor(
+            self._plan_upsert,
+            texts,
+            metadatas,
+            ids,
+            kwargs.get("batch_size", DEFAULT_INSERT_BATCH_SIZE),
+        )
+        if changed:
+            changed_texts = [texts[i] for i in changed]
+            await self.aadd_embeddings(
+                changed_texts,
+                await self.embedding_service.aembed_documents(changed_texts),
+                metadatas=[metadatas[i] for i in changed] if metadatas else None,
+                ids=[planned_ids[i] for i in changed],
+                upsert=True,
+                **kwargs,
+            )
+        return planned_ids
+
+    async def adelete(
+        self, ids: Optional[List[str]] = None, **kwargs: Any
+    ) -> Optional[bool]:
+        """Delete rows by id, see `delete`."""
+        return await self.engine._run_in_executor(self.delete, ids, **kwargs)
+
+    async def asimilarity_search(
+        self, query: str, k: Optional[int] = None, **kwargs: Any
+    ) -> List[Document]:
+        """Return docs most similar to query, see `similarity_search`."""
+        embedding = await self.embedding_service.aembed_query(query)
+        return await self.asimilarity_search_by_vector(embedding, k=k, **kwargs)
+
+    async def asimilarity_search_with_score(
+        self, query: str, k: Optional[int] = None, **kwargs: Any
+    ) -> List[Tuple[Document, float]]:
+        """Return docs and distances most similar to query, see
+        `similarity_search_with_score`."""
+        embedding = await self.embedding_service.aembed_query(query)
+        return await self.engine._run_in_executor(
+            self.similarity_search_with_score_by_vector, embedding, k=k, **kwargs
+        )
+
+    async def asimilarity_search_by_vector(
+        self, embedding: List[float], k: Optional[int] = None, **kwargs: Any
+    ) -> List[Document]:
+        """Return docs most similar to embedding vector, see
+        `similarity_search_by_vector`."""
+        return await self.engine._run_in_executor(
+            self.similarity_search_by_vector, embedding, k=k, **kwargs
+        )
+
+    async def amax_marginal_relevance_search(
+        self,
+        query: str,
+        k: Optional[int] = None,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs selected using maximal marginal relevance, see
+        `max_marginal_relevance_search`."""
+        embedding = await self.embedding_service.aembed_query(query)
+        return await self.amax_marginal_relevance_search_by_vector(
+            embedding, k=k, fetch_k=fetch_k, lambda_mult=lambda_mult, **kwargs
+        )
+
+    async def amax_marginal_relevance_search_by_vector(
+        self,
+        embedding: List[float],
+        k: Optional[int] = None,
+        fetch_k: Optional[int] = None,
+        lambda_mult: Optional[float] = None,
+        **kwargs: Any,
+    ) -> List[Document]:
+        """Return docs selected using maximal marginal relevance, see
+        `max_marginal_relevance_search_by_vector`."""
+        return await self.engine._run_in_executor(
+            self.max_marginal_relevance_search_by_vector,
+            embedding,
+            k=k,
+            fetch_k=fetch_k,
+            lambda_mult=lambda_mult,
+            **kwargs,
         )
-        return ids
\ No newline at end of file
@@ -0,0 +1,106 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+# TODO: Remove below import when minimum supported Python version is 3.10
+from __future__ import annotations
+
+from enum import Enum
+from typing import Dict, Sequence, Union
+
+import numpy as np
+
+# int8 embeddings are prefixed with their float32 scale factor.
+_INT8_SCALE_BYTES = 4
+
+
+class EmbeddingDtype(str, Enum):
+    """Binary encodings for embeddings stored in a VARBINARY column."""
+
+    FLOAT32 = "float32"
+    FLOAT16 = "float16"
+    INT8 = "int8"
+
+
+_NUMPY_DTYPES: Dict[EmbeddingDtype, np.dtype] = {
+    EmbeddingDtype.FLOAT32: np.dtype("<f4"),
+    EmbeddingDtype.FLOAT16: np.dtype("<f2"),
+    EmbeddingDtype.INT8: np.dtype("i1"),
+}
+
+
+class EmbeddingCodec:
+    """Packs embeddings into little-endian bytes and unpacks them with NumPy.
+
+    float32 and float16 embeddings are stored as raw little-endian arrays.
+    int8 embeddings are symmetrically quantized and stored as a float32 scale
+    followed by one signed byte per dimension.
+    """
+
+    def __init__(
+        self, dtype: Union[str, EmbeddingDtype] = EmbeddingDtype.FLOAT32
+    ) -> None:
+        self.dtype = EmbeddingDtype(dtype)
+        self._np_dtype = _NUMPY_DTYPES[self.dtype]
+
+    def byte_size(self, vector_size: int) -> int:
+        """Number of bytes needed to store an embedding of `vector_size`."""
+        size = vector_size * self._np_dtype.itemsize
+        if self.dtype == EmbeddingDtype.INT8:
+            size += _INT8_SCALE_BYTES
+        return size
+
+    def encode(self, embedding: Union[Sequence[float], np.ndarray]) -> bytes:
+        """Pack a single embedding into bytes."""
+        array = np.asarray(embedding, dtype=np.float32)
+        if self.dtype != EmbeddingDtype.INT8:
+            return array.astype(self._np_dtype, copy=False).tobytes()
+        max_abs = float(np.abs(array).max()) if array.size else 0.0
+        scale = max_abs / 127.0 if max_abs > 0 else 1.0
+        quantized = np.clip(np.rint(array / scale), -127, 127).astype(self._np_dtype)
+        return np.float32(scale).astype("<f4").tobytes() + quantized.tobytes()
+
+    def decode(self, value: bytes) -> np.ndarray:
+        """Unpack a single embedding.
+
+        float32 values are returned as a read-only view over `value` without
+        copying. Other encodings are converted to float32.
+        """
+        if self.dtype == EmbeddingDtype.INT8:
+            scale = np.frombuffer(value, dtype="<f4", count=1)[0]
+            quantized = np.frombuffer(value, dtype=self._np_dtype, offset=4)
+            return quantized.astype(np.float32) * scale
+        array = np.frombuffer(value, dtype=self._np_dtype)
+        if self.dtype == EmbeddingDtype.FLOAT32:
+            return array
+        return array.astype(np.float32)
+
+    def decode_many(self, values: Sequence[bytes]) -> np.ndarray:
+        """Unpack equally sized embeddings into a 2D float32 matrix.
+
+        The values are joined into one buffer so the whole matrix is decoded
+        with a single `np.frombuffer` call.
+        """
+        if not values:
+            return np.empty((0, 0), dtype=np.float32)
+        buffer = b"".join(values)
+        if self.dtype == EmbeddingDtype.INT8:
+            row_bytes = len(values[0])
+            raw = np.frombuffer(buffer, dtype=np.uint8).reshape(len(values), row_bytes)
+            scales = raw[:, :_INT8_SCALE_BYTES].copy().view("<f4")
+            quantized = raw[:, _INT8_SCALE_BYTES:].view(self._np_dtype)
+            return quantized.astype(np.float32) * scales
+        matrix = np.frombuffer(buffer, dtype=self._np_dtype).reshape(len(values), -1)
+        if self.dtype == EmbeddingDtype.FLOAT32:
+            return matrix
+        return matrix.astype(np.float32)
@@ -11,7 +11,9 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import json
 import os
+from datetime import timedelta
 from typing import Generator
 
 import pytest
@@ -19,7 +21,12 @@ import sqlalchemy
 from langchain_core.messages.ai import AIMessage
 from langchain_core.messages.human import HumanMessage
 
-from langchain_google_cloud_sql_mysql import MySQLChatMessageHistory, MySQLEngine
+from langchain_google_cloud_sql_mysql import (
+    MessageCache,
+    MessageWriteBuffer,
+    MySQLChatMessageHistory,
+    MySQLEngine,
+)
 
 project_id = os.environ["PROJECT_ID"]
 region = os.environ["REGION"]
@@ -76,3 +83,175 @@ def test_chat_message_history_custom_table_name(memory_engine: MySQLEngine) -> N
     # verify clear() clears message history
     history.clear()
     assert len(history.messages) == 0
+
+
+def test_chat_message_history_incremental(memory_engine: MySQLEngine) -> None:
+    history = MySQLChatMessageHistory(engine=memory_engine, session_id="test")
+    other = MySQLChatMessageHistory(engine=memory_engine, session_id="other")
+    history.add_user_message("hi!")
+    other.add_user_message("hello")
+    messages, last_id = history.get_messages_after(0)
+    assert [message.content for message in messages] == ["hi!"]
+
+    history.add_ai_message("whats up?")
+    messages, last_id = history.get_messages_after(last_id)
+    assert [message.content for message in messages] == ["whats up?"]
+    assert history.get_messages_after(last_id) == ([], last_id)
+
+
+def test_chat_message_history_migrate_table(memory_engine: MySQLEngine) -> None:
+    with memory_engine.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                """CREATE TABLE `message_store` (
+                  id INT AUTO_INCREMENT PRIMARY KEY,
+                  session_id TEXT NOT NULL,
+                  data JSON NOT NULL,
+                  type TEXT NOT NULL
+                );"""
+            )
+        )
+        conn.commit()
+    # unmigrated tables keep accepting long session ids
+    long_history = MySQLChatMessageHistory(engine=memory_engine, session_id="x" * 300)
+    long_history.add_user_message("hi!")
+    with pytest.raises(ValueError):
+        MySQLChatMessageHistory.migrate_table(memory_engine)
+    long_history.clear()
+
+    history = MySQLChatMessageHistory(engine=memory_engine, session_id="test")
+    history.add_user_message("hi!")
+
+    MySQLChatMessageHistory.migrate_table(memory_engine)
+    # migrating twice is a no-op
+    MySQLChatMessageHistory.migrate_table(memory_engine)
+    indexes = sqlalchemy.inspect(memory_engine.engine).get_indexes("message_store")
+    assert sorted(index["column_names"] for index in indexes) == [
+        ["created_at"],
+        ["session_id", "id"],
+    ]
+    assert history.messages[0].content == "hi!"
+
+
+def test_chat_message_history_window(memory_engine: MySQLEngine) -> None:
+    history = MySQLChatMessageHistory(engine=memory_engine, session_id="test")
+    for i in range(8):
+        history.add_user_message("x" * (i + 1))
+
+    def contents(messages):
+        return [len(message.content) for message in messages]
+
+    assert contents(history.get_messages(last_n=3)) == [6, 7, 8]
+    assert contents(history.get_messages(last_n=0)) == []
+    assert contents(history.get_messages(last_n=20)) == list(range(1, 9))
+    # 8 + 7 fit a budget of 20 tokens, adding 6 would exceed it
+    token_counter = lambda message: len(message.content)  # noqa: E731
+    assert contents(
+        history.get_messages(max_tokens=20, token_counter=token_counter)
+    ) == [7, 8]
+    assert contents(
+        history.get_messages(last_n=1, max_tokens=20, token_counter=token_counter)
+    ) == [8]
+    with pytest.raises(ValueError):
+        history.get_messages(max_tokens=20)
+
+
+def test_chat_message_history_add_messages(memory_engine: MySQLEngine) -> None:
+    history = MySQLChatMessageHistory(engine=memory_engine, session_id="test")
+    history.add_messages([HumanMessage(content="hi!"), AIMessage(content="yo")])
+    assert [message.content for message in history.messages] == ["hi!", "yo"]
+
+
+def test_chat_message_history_write_buffer(memory_engine: MySQLEngine) -> None:
+    with MessageWriteBuffer(memory_engine, flush_interval=60) as buffer:
+        history = MySQLChatMessageHistory(
+            engine=memory_engine, session_id="test", write_buffer=buffer
+        )
+        other = MySQLChatMessageHistory(
+            engine=memory_engine, session_id="other", write_buffer=buffer
+        )
+        history.add_user_message("hi!")
+        other.add_user_message("hello")
+        # reads flush the session's pending messages first
+        assert [message.content for message in history.messages] == ["hi!"]
+        other.add_ai_message("whats up?")
+    unbuffered = MySQLChatMessageHistory(engine=memory_engine, session_id="other")
+    assert len(unbuffered.messages) == 2
+
+
+def test_chat_message_history_cache(memory_engine: MySQLEngine) -> None:
+    cache = MessageCache()
+    history = MySQLChatMessageHistory(
+        engine=memory_engine, session_id="test", cache=cache
+    )
+    history.add_user_message("hi!")
+    assert [message.content for message in history.messages] == ["hi!"]
+    # written through to the cached entry
+    history.add_ai_message("whats up?")
+    assert len(cache) == 1
+    assert [message.content for message in history.messages] == ["hi!", "whats up?"]
+
+    # messages of another process are fetched incrementally
+    other = MySQLChatMessageHistory(engine=memory_engine, session_id="test")
+    other.add_user_message("still there?")
+    assert len(history.messages) == 3
+
+    # a session cleared elsewhere is reloaded
+    other.clear()
+    other.add_user_message("new")
+    assert [message.content for message in history.messages] == ["new"]
+
+    history.clear()
+    assert history.messages == []
+
+
+def test_chat_message_history_purge_older_than(memory_engine: MySQLEngine) -> None:
+    history = MySQLChatMessageHistory(engine=memory_engine, session_id="test")
+    other = MySQLChatMessageHistory(engine=memory_engine, session_id="other")
+    history.add_messages([HumanMessage(content=str(i)) for i in range(5)])
+    other.add_user_message("old")
+    with memory_engine.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                "UPDATE `message_store` SET created_at = created_at - INTERVAL 2 DAY"
+            )
+        )
+        conn.commit()
+    history.add_user_message("new")
+
+    deleted = MySQLChatMessageHistory.purge_older_than(
+        memory_engine, timedelta(days=1), chunk_size=2, sleep_seconds=0
+    )
+    assert deleted == 6
+    assert [message.content for message in history.messages] == ["new"]
+    assert other.messages == []
+    with pytest.raises(ValueError):
+        MySQLChatMessageHistory.purge_older_than(
+            memory_engine, timedelta(days=1), chunk_size=0
+        )
+
+
+def test_chat_message_history_cache_late_commit(memory_engine: MySQLEngine) -> None:
+    history = MySQLChatMessageHistory(
+        engine=memory_engine, session_id="test", cache=MessageCache()
+    )
+    history.add_user_message("first")
+    assert len(history.messages) == 1
+    insert = sqlalchemy.text(
+        "INSERT INTO `message_store` (session_id, data, type) "
+        "VALUES ('test', :data, 'human')"
+    )
+    late = memory_engine.connect()
+    late.execute(insert, {"data": json.dumps(HumanMessage(content="late").dict())})
+    # a higher id commits first and is cached
+    other = MySQLChatMessageHistory(engine=memory_engine, session_id="test")
+    other.add_user_message("early")
+    assert [message.content for message in history.messages] == ["first", "early"]
+    late.commit()
+    late.close()
+    # MAX(id) is unchanged, the count reveals the late message
+    assert [message.content for message in history.messages] == [
+        "first",
+        "late",
+        "early",
+    ]
@@ -0,0 +1,66 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import os
+from typing import Generator, List
+
+import numpy as np
+import pytest
+import sqlalchemy
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from langchain_google_cloud_sql_mysql import CachedEmbeddings, MySQLEngine
+
+project_id = os.environ["PROJECT_ID"]
+region = os.environ["REGION"]
+instance_id = os.environ["INSTANCE_ID"]
+table_name = os.environ["TABLE_NAME"]
+db_name = os.environ["DB_NAME"]
+
+
+class _CountingEmbedding(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+@pytest.fixture(name="engine")
+def setup() -> Generator:
+    engine = MySQLEngine.from_instance(
+        project_id=project_id, region=region, instance=instance_id, database=db_name
+    )
+    engine.init_embedding_cache_table(table_name, overwrite_existing=True)
+    yield engine
+
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS `{table_name}`"))
+        conn.commit()
+
+
+def test_mysql_cache_tier(engine):
+    service = _CountingEmbedding(size=8)
+    texts = [f"text {i}" for i in range(7)]
+    first = CachedEmbeddings(
+        service, max_size=0, engine=engine, table_name=table_name, batch_size=3
+    )
+    expected = first.embed_documents(texts)
+    assert service.calls == len(texts)
+
+    # a fresh process-local cache is served from the table
+    second = CachedEmbeddings(service, engine=engine, table_name=table_name)
+    np.testing.assert_allclose(
+        second.embed_documents(texts + ["new"])[:-1], expected, rtol=1e-6
+    )
+    assert service.calls == len(texts) + 1
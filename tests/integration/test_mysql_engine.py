@@ -44,3 +44,27 @@ def test_mysql_engine_with_basic_auth() -> None:
         assert res[0] == 1  # type: ignore
     # reset MySQLEngine._connector to allow a new Connector to be initiated
     MySQLEngine._connector = None
+
+
+def test_mysql_engine_pool_options() -> None:
+    """Test MySQLEngine applies pool options and warms up connections."""
+    engine = MySQLEngine.from_instance(
+        project_id=project_id,
+        region=region,
+        instance=instance_id,
+        database=db_name,
+        user=db_user,
+        password=db_password,
+        pool_size=3,
+        max_overflow=0,
+        pool_recycle=1800,
+        pool_pre_ping=True,
+        warmup_connections=2,
+    )
+    pool = engine.engine.pool
+    assert isinstance(pool, sqlalchemy.pool.QueuePool)
+    assert pool.size() == 3
+    assert pool.checkedin() == 2
+    with engine.connect() as conn:
+        res = conn.execute(sqlalchemy.text("SELECT 1")).fetchone()
+        assert res[0] == 1  # type: ignore
@@ -525,3 +525,117 @@ def test_load_and_spilt(engine):
     docs = loader.load_and_split(text_splitter=text_splitter)
 
     assert len(docs) == 4
+
+
+@pytest.mark.parametrize("stream_results", [True, False])
+def test_lazy_load_in_batches(default_setup, stream_results):
+    with default_setup.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                f"""
+                INSERT INTO `{table_name}` (fruit_name, variety, quantity_in_stock, price_per_unit, organic)
+                VALUES (:name, 'Granny Smith', 150, 1, 1)
+                """
+            ),
+            [{"name": f"Apple {i}"} for i in range(25)],
+        )
+        conn.commit()
+    loader = MySQLLoader(
+        engine=default_setup,
+        query=f"SELECT * FROM `{table_name}` ORDER BY fruit_id;",
+        content_columns=["fruit_name"],
+        metadata_columns=["fruit_id"],
+        stream_results=stream_results,
+        batch_size=10,
+    )
+
+    documents = list(loader.lazy_load())
+    assert [doc.page_content for doc in documents] == [f"Apple {i}" for i in range(25)]
+
+    # stopping early releases the connection without reading the rest
+    iterator = loader.lazy_load()
+    assert next(iterator).page_content == "Apple 0"
+    iterator.close()
+    assert len(loader.load()) == 25
+
+
+def test_lazy_load_pages_resume(default_setup):
+    with default_setup.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                f"""
+                INSERT INTO `{table_name}` (fruit_name, variety, quantity_in_stock, price_per_unit, organic)
+                VALUES (:name, 'Granny Smith', 150, 1, 1)
+                """
+            ),
+            [{"name": f"Apple {i}"} for i in range(25)],
+        )
+        conn.commit()
+    loader = MySQLLoader(
+        engine=default_setup,
+        table_name=table_name,
+        content_columns=["fruit_name"],
+        page_size=10,
+    )
+    iterator = loader.lazy_load()
+    for _ in range(12):
+        next(iterator)
+    iterator.close()
+
+    resumed = MySQLLoader(
+        engine=default_setup,
+        table_name=table_name,
+        content_columns=["fruit_name"],
+        page_size=10,
+        resume_from=loader.checkpoint,
+    )
+    assert [doc.page_content for doc in resumed.load()] == [
+        f"Apple {i}" for i in range(11, 25)
+    ]
+
+
+@pytest.mark.parametrize("partition_by", ["range", "mod"])
+def test_lazy_load_parallel(default_setup, partition_by):
+    with default_setup.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                f"""
+                INSERT INTO `{table_name}` (fruit_name, variety, quantity_in_stock, price_per_unit, organic)
+                VALUES (:name, 'Granny Smith', 150, 1, 1)
+                """
+            ),
+            [{"name": f"Apple {i}"} for i in range(25)],
+        )
+        conn.commit()
+    loader = MySQLLoader(
+        engine=default_setup,
+        table_name=table_name,
+        content_columns=["fruit_name"],
+        batch_size=5,
+    )
+    documents = list(
+        loader.lazy_load_parallel(
+            num_workers=2, num_partitions=3, partition_by=partition_by, ordered=True
+        )
+    )
+    names = [doc.page_content for doc in documents]
+    assert sorted(names) == sorted(f"Apple {i}" for i in range(25))
+    if partition_by == "range":
+        assert names == [f"Apple {i}" for i in range(25)]
+
+
+def test_delete_doc_by_fingerprint(engine):
+    engine.init_document_table(table_name, store_fingerprint=True)
+    test_docs = [
+        Document(
+            page_content=f"Apple {i}",
+            metadata={"fruit_id": i, "organic": i % 2 == 0},
+        )
+        for i in range(10)
+    ]
+    saver = MySQLDocumentSaver(engine=engine, table_name=table_name)
+    loader = MySQLLoader(engine=engine, table_name=table_name)
+    saver.add_documents(test_docs)
+
+    saver.delete(test_docs[:7], batch_size=3)
+    assert loader.load() == test_docs[7:]
@@ -0,0 +1,255 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import asyncio
+import os
+import uuid
+from typing import Generator
+
+import pytest
+import sqlalchemy
+from langchain_community.embeddings import DeterministicFakeEmbedding
+from langchain_core.documents import Document
+
+from langchain_google_cloud_sql_mysql import (
+    CloudSQLVectorStore,
+    DistanceStrategy,
+    IVFFlatIndex,
+    MySQLEngine,
+)
+
+project_id = os.environ["PROJECT_ID"]
+region = os.environ["REGION"]
+instance_id = os.environ["INSTANCE_ID"]
+table_name = os.environ["TABLE_NAME"]
+db_name = os.environ["DB_NAME"]
+
+VECTOR_SIZE = 8
+embeddings_service = DeterministicFakeEmbedding(size=VECTOR_SIZE)
+texts = ["foo", "bar", "baz", "qux", "quux"]
+metadatas = [{"page": str(i), "source": "test"} for i in range(len(texts))]
+ids = [str(uuid.uuid4()) for _ in texts]
+
+
+@pytest.fixture(name="engine")
+def setup() -> Generator:
+    engine = MySQLEngine.from_instance(
+        project_id=project_id, region=region, instance=instance_id, database=db_name
+    )
+    engine.init_vectorstore_table(table_name, VECTOR_SIZE, overwrite_existing=True)
+    yield engine
+
+    with engine.connect() as conn:
+        conn.execute(sqlalchemy.text(f"DROP TABLE IF EXISTS `{table_name}`"))
+        conn.commit()
+
+
+@pytest.fixture
+def vs(engine) -> Generator:
+    vs = CloudSQLVectorStore(
+        engine=engine, embedding_service=embeddings_service, table_name=table_name
+    )
+    vs.add_texts(texts, metadatas=metadatas, ids=ids)
+    yield vs
+
+
+def test_add_texts_in_batches(engine):
+    vs = CloudSQLVectorStore(
+        engine=engine, embedding_service=embeddings_service, table_name=table_name
+    )
+    vs.add_texts(texts, metadatas=metadatas, ids=ids, batch_size=2)
+    with engine.connect() as conn:
+        rows = conn.execute(
+            sqlalchemy.text(f"SELECT langchain_id, embedding FROM `{table_name}`")
+        ).fetchall()
+    assert sorted(row[0] for row in rows) == sorted(ids)
+    # embeddings are stored as packed float32
+    assert all(len(row[1]) == VECTOR_SIZE * 4 for row in rows)
+
+
+def test_similarity_search(vs):
+    results = vs.similarity_search("foo", k=1)
+    assert len(results) == 1
+    assert results[0].page_content == "foo"
+    assert results[0].metadata == {"page": "0", "source": "test"}
+
+
+def test_similarity_search_with_score(vs):
+    results = vs.similarity_search_with_score("foo", k=2)
+    assert len(results) == 2
+    assert results[0][0].page_content == "foo"
+    assert results[0][1] == pytest.approx(0.0, abs=1e-5)
+    assert results[0][1] <= results[1][1]
+
+
+def test_similarity_search_by_vector_small_scan_batches(engine):
+    vs = CloudSQLVectorStore(
+        engine=engine,
+        embedding_service=embeddings_service,
+        table_name=table_name,
+        distance_strategy=DistanceStrategy.EUCLIDEAN,
+        scan_batch_size=2,
+    )
+    vs.add_texts(texts, metadatas=metadatas, ids=ids)
+    embedding = embeddings_service.embed_query("baz")
+    results = vs.similarity_search_by_vector(embedding, k=3)
+    assert len(results) == 3
+    assert results[0].page_content == "baz"
+
+
+def test_vector_index(vs):
+    vs.apply_vector_index(IVFFlatIndex(lists=2, probes=2))
+    assert len(vs.index) == len(texts)
+    results = vs.similarity_search("bar", k=1)
+    assert results[0].page_content == "bar"
+    assert results[0].metadata == {"page": "1", "source": "test"}
+
+    # index is kept up to date by add_texts and delete
+    [new_id] = vs.add_texts(["corge"])
+    assert vs.similarity_search("corge", k=1)[0].page_content == "corge"
+    vs.delete([new_id, ids[1]])
+    assert len(vs.index) == len(texts) - 1
+    assert vs.similarity_search("bar", k=1)[0].page_content != "bar"
+
+
+def test_delete(vs, engine):
+    vs.delete(ids[:2])
+    with engine.connect() as conn:
+        count = conn.execute(
+            sqlalchemy.text(f"SELECT COUNT(*) FROM `{table_name}`")
+        ).scalar()
+    assert count == len(texts) - 2
+
+
+def test_index_snapshot_catch_up(vs, engine, tmp_path):
+    path = str(tmp_path / "index.snapshot")
+    vs.save_index_snapshot(path)
+
+    # change the table behind the snapshot's back
+    other = CloudSQLVectorStore(
+        engine=engine, embedding_service=embeddings_service, table_name=table_name
+    )
+    other.delete([ids[0]])
+    [new_id] = other.add_texts(["corge"])
+
+    vs.drop_vector_index()
+    vs.load_index_snapshot(path)
+    assert sorted(vs.index.ids()) == sorted(ids[1:] + [new_id])
+    assert vs.similarity_search("corge", k=1)[0].page_content == "corge"
+
+
+def test_max_marginal_relevance_search(vs):
+    results = vs.max_marginal_relevance_search("foo", k=2, fetch_k=4)
+    assert len(results) == 2
+    assert results[0].page_content == "foo"
+    assert results[1].page_content != "foo"
+
+
+def test_max_marginal_relevance_search_with_index(vs):
+    vs.apply_vector_index(IVFFlatIndex(lists=1, probes=1))
+    embedding = embeddings_service.embed_query("bar")
+    results = vs.max_marginal_relevance_search_with_score_by_vector(
+        embedding, k=2, fetch_k=5, lambda_mult=1.0
+    )
+    assert [doc.page_content for doc, _ in results][0] == "bar"
+    assert results[0][1] <= results[1][1]
+
+
+@pytest.mark.asyncio
+async def test_async_api(engine):
+    vs = CloudSQLVectorStore(
+        engine=engine, embedding_service=embeddings_service, table_name=table_name
+    )
+    added = await vs.aadd_texts(texts, metadatas=metadatas, ids=ids)
+    assert added == ids
+    results = await asyncio.gather(
+        *(vs.asimilarity_search(text, k=1) for text in texts)
+    )
+    assert [docs[0].page_content for docs in results] == texts
+    scored = await vs.asimilarity_search_with_score("foo", k=1)
+    assert scored[0][0].page_content == "foo"
+    mmr = await vs.amax_marginal_relevance_search("foo", k=2, fetch_k=4)
+    assert len(mmr) == 2
+    await vs.adelete(ids)
+    assert await vs.asimilarity_search("foo") == []
+
+
+class _CountingEmbedding(DeterministicFakeEmbedding):
+    calls: int = 0
+
+    def embed_documents(self, texts):
+        self.calls += len(texts)
+        return super().embed_documents(texts)
+
+
+def test_upsert_skips_unchanged_texts(engine):
+    engine.init_vectorstore_table(
+        table_name, VECTOR_SIZE, overwrite_existing=True, store_content_hash=True
+    )
+    embedding = _CountingEmbedding(size=VECTOR_SIZE)
+    vs = CloudSQLVectorStore(
+        engine=engine,
+        embedding_service=embedding,
+        table_name=table_name,
+        hash_metadata=True,
+    )
+    first = vs.add_texts(texts, metadatas=metadatas, upsert=True)
+    assert embedding.calls == len(texts)
+
+    # re-adding the same texts embeds nothing and keeps the derived ids
+    assert vs.add_texts(texts, metadatas=metadatas, upsert=True) == first
+    assert embedding.calls == len(texts)
+
+    # a changed text and a changed metadata value are re-written
+    changed_texts = ["changed"] + texts[1:]
+    changed_metadatas = [dict(m) for m in metadatas]
+    changed_metadatas[1]["source"] = "changed"
+    vs.add_texts(changed_texts, metadatas=changed_metadatas, ids=first, upsert=True)
+    assert embedding.calls == len(texts) + 2
+    docs = vs.similarity_search("changed", k=1)
+    assert docs[0].page_content == "changed"
+    with engine.connect() as conn:
+        count = conn.execute(
+            sqlalchemy.text(f"SELECT COUNT(*) FROM `{table_name}`")
+        ).scalar()
+    assert count == len(texts)
+
+
+def test_ingest_stream(engine):
+    vs = CloudSQLVectorStore(
+        engine=engine, embedding_service=embeddings_service, table_name=table_name
+    )
+    docs = (
+        Document(page_content=f"text {i}", metadata={"page": str(i)}) for i in range(23)
+    )
+    assert vs.ingest(docs, embedding_batch_size=5, max_concurrency=2) == 23
+    result = vs.similarity_search("text 7", k=1)
+    assert result[0].page_content == "text 7"
+    assert result[0].metadata["page"] == "7"
+
+
+def test_similarity_search_with_filter(vs):
+    results = vs.similarity_search("foo", k=5, filter={"page": {"$in": ["1", "3"]}})
+    assert sorted(doc.metadata["page"] for doc in results) == ["1", "3"]
+
+    results = vs.similarity_search(
+        "foo", k=5, filter={"$or": [{"page": "0"}, {"source": {"$ne": "test"}}]}
+    )
+    assert [doc.page_content for doc in results] == ["foo"]
+
+    # filtered searches bypass the vector index
+    vs.apply_vector_index(IVFFlatIndex(lists=2, probes=2))
+    results = vs.max_marginal_relevance_search(
+        "foo", k=2, fetch_k=5, filter={"page": {"$gte": "3"}}
+    )
+    assert sorted(doc.metadata["page"] for doc in results) == ["3", "4"]
@@ -11,13 +11,22 @@
 # WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
 # See the License for the specific language governing permissions and
 # limitations under the License.
+import decimal
+import json
+
+import pymysql
+import pytest
 from langchain_core.documents import Document
+from langchain_core.load import dumpd, load
 
 from langchain_google_cloud_sql_mysql.mysql_loader import (
     DEFAULT_CONTENT_COL,
+    DEFAULT_FINGERPRINT_COL,
     DEFAULT_METADATA_COL,
+    _compile_row_decoder,
     _parse_doc_from_row,
     _parse_row_from_doc,
+    _row_fingerprint,
 )
 
 test_doc = Document(
@@ -139,3 +148,84 @@ def test_doc2row2doc_customized_metadata():
             metadata + [DEFAULT_METADATA_COL],
             _parse_row_from_doc(metadata + [DEFAULT_METADATA_COL], test_doc),
         )
+
+
+@pytest.mark.parametrize(
+    "content_columns, metadata_columns",
+    [
+        (["variety", "quantity_in_stock", "price_per_unit"], ["langchain_metadata"]),
+        (["quantity_in_stock", "price_per_unit"], ["variety", "langchain_metadata"]),
+        (["variety"], ["fruit-id"]),
+        (["langchain_metadata"], ["variety"]),
+    ],
+)
+def test_compiled_row_decoder(content_columns, metadata_columns):
+    json_type = pymysql.constants.FIELD_TYPE.JSON
+    description = [
+        ("variety", pymysql.constants.FIELD_TYPE.VAR_STRING),
+        ("quantity_in_stock", pymysql.constants.FIELD_TYPE.LONG),
+        ("price_per_unit", pymysql.constants.FIELD_TYPE.NEWDECIMAL),
+        ("langchain_metadata", json_type),
+    ]
+    raw_row = (
+        "Granny Smith",
+        150,
+        0.99,
+        json.dumps(row_customized_nested["langchain_metadata"]),
+    )
+    decode = _compile_row_decoder(description, content_columns, metadata_columns)
+    assert decode(raw_row) == _parse_doc_from_row(
+        content_columns, metadata_columns, row_customized_nested
+    )
+
+
+def test_compiled_row_decoder_null_json():
+    decode = _compile_row_decoder(
+        [
+            ("page_content", pymysql.constants.FIELD_TYPE.BLOB),
+            ("langchain_metadata", pymysql.constants.FIELD_TYPE.JSON),
+        ],
+        [DEFAULT_CONTENT_COL],
+        [DEFAULT_METADATA_COL],
+    )
+    assert decode(("text", None)) == Document(page_content="text")
+
+
+def test_compiled_row_decoder_serializable():
+    decode = _compile_row_decoder(
+        [
+            ("page_content", pymysql.constants.FIELD_TYPE.BLOB),
+            ("fruit_name", pymysql.constants.FIELD_TYPE.VAR_STRING),
+        ],
+        [DEFAULT_CONTENT_COL],
+        ["fruit_name"],
+    )
+    document = decode(("text", "Apple"))
+    assert load(dumpd(document)) == Document(
+        page_content="text", metadata={"fruit_name": "Apple"}
+    )
+
+
+def test_row_fingerprint_canonical():
+    columns = ["page_content", "organic", "price", "langchain_metadata"]
+    saved = {
+        "page_content": "Apple",
+        "organic": True,
+        "price": 0.99,
+        "langchain_metadata": {"b": 1, "a": [1, 2]},
+    }
+    loaded = {
+        "langchain_metadata": {"a": [1, 2], "b": 1},
+        "price": decimal.Decimal("0.99"),
+        "organic": 1,
+        "page_content": "Apple",
+        DEFAULT_FINGERPRINT_COL: "ignored",
+    }
+    assert _row_fingerprint(columns, saved) == _row_fingerprint(columns, loaded)
+    # missing columns are stored as NULL
+    assert _row_fingerprint(columns, {"page_content": "Apple"}) == _row_fingerprint(
+        columns, {"page_content": "Apple", "organic": None}
+    )
+    assert _row_fingerprint(columns, saved) != _row_fingerprint(
+        columns, {**saved, "page_content": "Pear"}
+    )
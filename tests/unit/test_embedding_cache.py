@@ -0,0 +1,98 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from typing import List
+
+import pytest
+from langchain_community.embeddings import DeterministicFakeEmbedding
+
+from langchain_google_cloud_sql_mysql import CachedEmbeddings
+
+
+class _RecordingEmbedding(DeterministicFakeEmbedding):
+    documents: List[str] = []
+    queries: List[str] = []
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self.documents.extend(texts)
+        return super().embed_documents(texts)
+
+    def embed_query(self, text: str) -> List[float]:
+        self.queries.append(text)
+        return super().embed_query(text)
+
+
+@pytest.fixture(name="service")
+def setup() -> _RecordingEmbedding:
+    return _RecordingEmbedding(size=4, documents=[], queries=[])
+
+
+def test_embed_documents_only_misses(service: _RecordingEmbedding) -> None:
+    cached = CachedEmbeddings(service, batch_size=2)
+    expected = service.embed_documents(["a", "b", "a", "c"])
+    service.documents.clear()
+
+    assert cached.embed_documents(["a", "b", "a"]) == expected[:3]
+    # duplicates within a call are embedded once
+    assert service.documents == ["a", "b"]
+    assert cached.embed_documents(["c", "b", "a"]) == [
+        expected[3],
+        expected[1],
+        expected[0],
+    ]
+    assert service.documents == ["a", "b", "c"]
+    assert (cached.hits, cached.misses) == (2, 4)
+
+
+def test_embed_query_cached_separately(service: _RecordingEmbedding) -> None:
+    cached = CachedEmbeddings(service)
+    cached.embed_documents(["a"])
+    assert cached.embed_query("a") == service.embed_query("a")
+    assert cached.embed_query("a") == service.embed_query("a")
+    assert service.queries == ["a", "a", "a"]
+
+
+def test_lru_eviction(service: _RecordingEmbedding) -> None:
+    cached = CachedEmbeddings(service, max_size=2)
+    cached.embed_documents(["a", "b"])
+    cached.embed_documents(["a"])
+    # "b" is the least recently used entry
+    cached.embed_documents(["c"])
+    service.documents.clear()
+    cached.embed_documents(["a", "b", "c"])
+    assert service.documents == ["b"]
+
+
+def test_cache_key_includes_model(service: _RecordingEmbedding) -> None:
+    first = CachedEmbeddings(service, model="first")
+    second = CachedEmbeddings(service, model="second")
+    assert first._key("document", "a") != second._key("document", "a")
+    assert first._key("document", "a") != first._key("query", "a")
+
+
+@pytest.mark.asyncio
+async def test_async_embed(service: _RecordingEmbedding) -> None:
+    cached = CachedEmbeddings(service)
+    assert await cached.aembed_documents(["a", "a"]) == service.embed_documents(
+        ["a", "a"]
+    )
+    assert await cached.aembed_query("q") == await cached.aembed_query("q")
+    assert service.queries == ["q"]
+
+
+def test_invalid_args(service: _RecordingEmbedding) -> None:
+    with pytest.raises(ValueError):
+        CachedEmbeddings(service, table_name="cache")
+    with pytest.raises(ValueError):
+        CachedEmbeddings(service, batch_size=0)
@@ -12,9 +12,19 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 
+import datetime
+import gc
+import threading
+import time
+import weakref
+from typing import Any, Optional
+
+import google.auth.credentials
+import google.oauth2.credentials
 import pytest
+import sqlalchemy
 
-from langchain_google_cloud_sql_mysql import MySQLEngine
+from langchain_google_cloud_sql_mysql import MySQLEngine, mysql_engine
 
 
 def test_mysql_engine_with_invalid_arg_pattern() -> None:
@@ -47,3 +57,138 @@ def test_mysql_engine_with_invalid_arg_pattern() -> None:
         )
         # assert custom error is present
         assert exc_info.value.args[0] == expected_error_msg
+
+
+@pytest.mark.asyncio
+async def test_mysql_engine_run_in_executor() -> None:
+    """Test blocking work runs on a thread pool sized to the connection pool."""
+    engine = MySQLEngine(
+        sqlalchemy.create_engine(
+            "sqlite://",
+            poolclass=sqlalchemy.pool.QueuePool,
+            pool_size=2,
+            max_overflow=1,
+        )
+    )
+    assert await engine._run_in_executor(lambda x, y=0: x + y, 1, y=2) == 3
+    assert engine._get_executor()._max_workers == 3
+
+
+@pytest.mark.asyncio
+async def test_mysql_engine_run_in_executor_unbounded_pool() -> None:
+    """Test unbounded pools get at least a default number of workers."""
+    engine = MySQLEngine(
+        sqlalchemy.create_engine("sqlite://", poolclass=sqlalchemy.pool.NullPool)
+    )
+    assert await engine._run_in_executor(lambda: 1) == 1
+    assert engine._get_executor()._max_workers == mysql_engine._DEFAULT_EXECUTOR_WORKERS
+
+    for pool_size in (5, 20):
+        engine = MySQLEngine(
+            sqlalchemy.create_engine(
+                "sqlite://",
+                poolclass=sqlalchemy.pool.QueuePool,
+                pool_size=pool_size,
+                max_overflow=-1,
+            )
+        )
+        assert engine._get_executor()._max_workers == max(
+            pool_size, mysql_engine._DEFAULT_EXECUTOR_WORKERS
+        )
+
+
+def test_mysql_engine_warm_up() -> None:
+    """Test warm_up leaves the requested number of connections in the pool."""
+    engine = MySQLEngine(
+        sqlalchemy.create_engine(
+            "sqlite://", poolclass=sqlalchemy.pool.QueuePool, pool_size=3
+        )
+    )
+    engine.warm_up(3)
+    pool = engine.engine.pool
+    assert isinstance(pool, sqlalchemy.pool.QueuePool)
+    assert pool.checkedin() == 3
+
+
+def test_mysql_engine_warmup_exceeds_pool_size() -> None:
+    """Test MySQLEngine errors when warming up more connections than pooled."""
+    with pytest.raises(ValueError):
+        MySQLEngine.from_instance(
+            project_id="my-project",
+            region="my-region",
+            instance="my-instance",
+            database="my-db",
+            user="my-user",
+            password="my-pass",
+            pool_size=2,
+            warmup_connections=3,
+        )
+
+
+class _FakeCredentials(google.auth.credentials.Credentials):
+    def __init__(self, expiry: Optional[datetime.datetime] = None) -> None:
+        super().__init__()
+        self.token = "token"
+        self.expiry = expiry
+
+    def refresh(self, request: Any) -> None:
+        pass
+
+
+def test_iam_principal_email_is_cached(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Test the tokeninfo lookup runs once per credentials until expiry."""
+    calls = []
+
+    def fetch(credentials: Any) -> str:
+        calls.append(credentials)
+        return "user@example.com"
+
+    monkeypatch.setattr(mysql_engine, "_fetch_iam_principal_email", fetch)
+    monkeypatch.setattr(
+        mysql_engine, "_principal_email_cache", weakref.WeakKeyDictionary()
+    )
+
+    credentials = _FakeCredentials()
+    assert mysql_engine._get_iam_principal_email(credentials) == "user@example.com"
+    assert mysql_engine._get_iam_principal_email(credentials) == "user@example.com"
+    assert len(calls) == 1
+
+    # other credentials are looked up separately
+    mysql_engine._get_iam_principal_email(_FakeCredentials())
+    assert len(calls) == 2
+
+    # expired tokens are looked up again
+    expired = _FakeCredentials(datetime.datetime.utcnow() - datetime.timedelta(1))
+    mysql_engine._get_iam_principal_email(expired)
+    mysql_engine._get_iam_principal_email(expired)
+    assert len(calls) == 4
+
+
+def test_credential_connectors_are_released() -> None:
+    """Test connectors of injected credentials close with their engines."""
+    threads = threading.active_count()
+    shared = google.oauth2.credentials.Credentials("token")
+    engines = [
+        MySQLEngine.from_instance(
+            project_id="my-project",
+            region="my-region",
+            instance="my-instance",
+            database="my-db",
+            user="my-user",
+            password="my-pass",
+            credentials=credentials,
+        )
+        for credentials in [shared, shared]
+        + [google.oauth2.credentials.Credentials("token") for _ in range(20)]
+    ]
+    assert len(MySQLEngine._credential_connectors) == 21
+    assert MySQLEngine._get_connector(shared) is MySQLEngine._get_connector(shared)
+
+    del engines, shared
+    gc.collect()
+    assert len(MySQLEngine._credential_connectors) == 0
+    # the connectors' event loop threads are stopped
+    deadline = time.monotonic() + 10
+    while threading.active_count() > threads and time.monotonic() < deadline:
+        time.sleep(0.05)
+    assert threading.active_count() <= threads
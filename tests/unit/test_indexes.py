@@ -0,0 +1,174 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import numpy as np
+import pytest
+
+from langchain_google_cloud_sql_mysql.indexes import (
+    DistanceStrategy,
+    FlatIndex,
+    IVFFlatIndex,
+    _distances,
+    _prepare_query,
+    _similarities,
+    _TopK,
+    load_index,
+    save_index,
+)
+
+rng = np.random.default_rng(42)
+matrix = rng.normal(size=(200, 16)).astype(np.float32)
+ids = np.array([f"id-{i}" for i in range(len(matrix))], dtype=object)
+query = rng.normal(size=16).astype(np.float32)
+
+
+def expected_distances(strategy):
+    if strategy == DistanceStrategy.COSINE_DISTANCE:
+        return 1 - (matrix @ query) / (
+            np.linalg.norm(matrix, axis=1) * np.linalg.norm(query)
+        )
+    if strategy == DistanceStrategy.EUCLIDEAN:
+        return np.linalg.norm(matrix - query, axis=1)
+    return -(matrix @ query)
+
+
+@pytest.mark.parametrize("strategy", list(DistanceStrategy))
+def test_distances(strategy):
+    similarities = _similarities(matrix, _prepare_query(query, strategy), strategy)
+    np.testing.assert_allclose(
+        _distances(similarities, strategy), expected_distances(strategy), atol=1e-4
+    )
+
+
+@pytest.mark.parametrize("strategy", list(DistanceStrategy))
+def test_top_k_over_chunks(strategy):
+    prepared = _prepare_query(query, strategy)
+    top_k = _TopK(5, keep_vectors=True)
+    for start in range(0, len(matrix), 32):
+        chunk = matrix[start : start + 32]
+        top_k.push(
+            ids[start : start + 32], _similarities(chunk, prepared, strategy), chunk
+        )
+    result_ids, _, vectors = top_k.results()
+    expected = np.argsort(expected_distances(strategy))[:5]
+    assert result_ids == [f"id-{i}" for i in expected]
+    np.testing.assert_array_equal(vectors, matrix[expected])
+
+
+def test_top_k_fewer_rows_than_k():
+    top_k = _TopK(10)
+    top_k.push(ids[:3], np.array([0.1, 0.3, 0.2], dtype=np.float32))
+    result_ids, scores, vectors = top_k.results()
+    assert result_ids == ["id-1", "id-2", "id-0"]
+    assert scores.tolist() == pytest.approx([0.3, 0.2, 0.1])
+    assert vectors is None
+
+
+@pytest.mark.parametrize("strategy", list(DistanceStrategy))
+def test_ivfflat_all_probes_is_exact(strategy):
+    index = IVFFlatIndex(lists=8, probes=8, seed=0)
+    index.build(list(ids), matrix, strategy)
+    result_ids, similarities = index.search(query, 5)
+    expected = np.argsort(expected_distances(strategy))[:5]
+    assert result_ids == [f"id-{i}" for i in expected]
+    np.testing.assert_allclose(
+        _distances(similarities, strategy),
+        expected_distances(strategy)[expected],
+        atol=1e-4,
+    )
+
+
+def test_ivfflat_recall():
+    data = rng.normal(size=(2000, 16)).astype(np.float32)
+    data_ids = [str(i) for i in range(len(data))]
+    index = IVFFlatIndex(lists=20, probes=5, seed=0)
+    index.build(data_ids, data, DistanceStrategy.EUCLIDEAN)
+    hits = 0
+    for query_vector in data[:20] + 0.01:
+        result_ids, _ = index.search(query_vector, 10)
+        expected = np.argsort(np.linalg.norm(data - query_vector, axis=1))[:10]
+        hits += len(set(result_ids) & {str(i) for i in expected})
+    assert hits / 200 > 0.8
+
+
+def test_ivfflat_add_and_remove():
+    index = IVFFlatIndex(lists=4, probes=4, seed=0)
+    index.build([], np.empty((0, 16), dtype=np.float32))
+    index.add(list(ids[:100]), matrix[:100])
+    assert len(index) == 100
+    index.add(["new"], query[None, :])
+    assert index.search(query, 1)[0] == ["new"]
+    index.remove(["new"] + list(ids[:60]))
+    assert len(index) == 40
+    result_ids, _ = index.search(query, 100)
+    assert sorted(result_ids) == sorted(ids[60:100])
+    # re-adding an id replaces its embedding
+    index.add(["id-99"], query[None, :])
+    assert len(index) == 40
+    assert index.search(query, 1)[0] == ["id-99"]
+
+
+@pytest.mark.parametrize("index_cls", [FlatIndex, IVFFlatIndex])
+def test_snapshot_roundtrip(tmp_path, index_cls):
+    index = index_cls()
+    index.build(list(ids), matrix, DistanceStrategy.EUCLIDEAN)
+    index.remove(["id-0"])
+    path = str(tmp_path / "index.snapshot")
+    save_index(index, path, {"row_count": 199})
+
+    loaded, metadata = load_index(path)
+    assert metadata == {"row_count": 199}
+    assert type(loaded) is index_cls
+    assert loaded.distance_strategy == DistanceStrategy.EUCLIDEAN
+    assert isinstance(loaded._vectors, np.memmap)
+    assert sorted(loaded.ids()) == sorted(index.ids())
+    loaded_ids, loaded_similarities = loaded.search(query, 5)
+    expected_ids, expected_similarities = index.search(query, 5)
+    assert loaded_ids == expected_ids
+    np.testing.assert_array_equal(loaded_similarities, expected_similarities)
+
+    # the memory-mapped matrix is copied into memory on the first write
+    loaded.add(["new"], query[None, :])
+    assert not isinstance(loaded._vectors, np.memmap)
+    assert loaded.search(query, 1)[0] == ["new"]
+
+
+def test_flat_index_is_exact():
+    index = FlatIndex()
+    index.build(list(ids), matrix)
+    result_ids, _ = index.search(query, 5)
+    expected = np.argsort(expected_distances(DistanceStrategy.COSINE_DISTANCE))[:5]
+    assert result_ids == [f"id-{i}" for i in expected]
+
+
+def test_load_index_invalid_file(tmp_path):
+    path = tmp_path / "not-a-snapshot"
+    path.write_bytes(b"hello world")
+    with pytest.raises(ValueError):
+        load_index(str(path))
+
+
+def test_get_vectors():
+    index = FlatIndex()
+    index.build(list(ids), matrix)
+    np.testing.assert_array_equal(index.get_vectors(["id-3", "id-1"]), matrix[[3, 1]])
+
+
+def test_flat_index_skips_removed_rows():
+    index = FlatIndex()
+    index.build(list(ids[:10]), matrix[:10])
+    best = index.search(query, 1)[0]
+    index.remove(best)
+    result_ids, similarities = index.search(query, 20)
+    assert sorted(result_ids) == sorted(set(ids[:10]) - set(best))
+    assert np.isfinite(similarities).all()
@@ -0,0 +1,254 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pathlib
+import types
+
+import pytest
+import sqlalchemy
+from langchain_core.documents import Document
+
+from langchain_google_cloud_sql_mysql import (
+    InMemoryMetricsSink,
+    MySQLDocumentSaver,
+    MySQLEngine,
+    MySQLLoader,
+)
+
+
+@pytest.fixture(name="engine")
+def setup(tmp_path: pathlib.Path) -> MySQLEngine:
+    # a database file, so that parallel loads can open several connections
+    engine = MySQLEngine(
+        sqlalchemy.create_engine(
+            f"sqlite:///{tmp_path / 'loader.db'}", poolclass=sqlalchemy.pool.QueuePool
+        )
+    )
+    with engine.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                "CREATE TABLE fruits (fruit_id INTEGER PRIMARY KEY, fruit_name TEXT)"
+            )
+        )
+        conn.execute(
+            sqlalchemy.text("INSERT INTO fruits (fruit_name) VALUES (:name)"),
+            [{"name": f"Apple {i}"} for i in range(25)],
+        )
+        conn.commit()
+    return engine
+
+
+@pytest.mark.parametrize("stream_results", [True, False])
+def test_lazy_load_in_batches(engine: MySQLEngine, stream_results: bool) -> None:
+    loader = MySQLLoader(
+        engine=engine,
+        table_name="fruits",
+        content_columns=["fruit_name"],
+        stream_results=stream_results,
+        batch_size=10,
+    )
+    documents = loader.load()
+    assert [doc.page_content for doc in documents] == [f"Apple {i}" for i in range(25)]
+    assert documents[3].metadata == {"fruit_id": 4}
+
+
+def test_lazy_load_invalid_batch_size(engine: MySQLEngine) -> None:
+    with pytest.raises(ValueError):
+        MySQLLoader(engine=engine, table_name="fruits", batch_size=0)
+
+
+def test_lazy_load_pages_resume(engine: MySQLEngine) -> None:
+    loader = MySQLLoader(
+        engine=engine, table_name="fruits", content_columns=["fruit_name"], page_size=10
+    )
+    assert len(loader.load()) == 25
+
+    iterator = loader.lazy_load()
+    assert isinstance(iterator, types.GeneratorType)
+    consumed = [next(iterator) for _ in range(12)]
+    assert consumed[-1].page_content == "Apple 11"
+    # the 13th document is still in flight, so it is loaded again on resume
+    next(iterator)
+    iterator.close()
+    assert loader.checkpoint == "[12]"
+
+    resumed = MySQLLoader(
+        engine=engine,
+        table_name="fruits",
+        content_columns=["fruit_name"],
+        page_size=10,
+        resume_from=loader.checkpoint,
+    )
+    documents = resumed.load()
+    assert [doc.metadata["fruit_id"] for doc in documents] == list(range(13, 26))
+    assert resumed.checkpoint == "[25]"
+
+
+def test_lazy_load_pages_composite_key(engine: MySQLEngine) -> None:
+    with engine.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                "CREATE TABLE pairs (a INTEGER, b TEXT, v TEXT, PRIMARY KEY (a, b))"
+            )
+        )
+        conn.execute(
+            sqlalchemy.text("INSERT INTO pairs VALUES (:a, :b, :v)"),
+            [
+                {"a": a, "b": b, "v": f"{a}{b}"}
+                for a in range(3, 0, -1)
+                for b in ("y", "x")
+            ],
+        )
+        conn.commit()
+    loader = MySQLLoader(
+        engine=engine,
+        table_name="pairs",
+        content_columns=["v"],
+        page_size=4,
+        resume_from='[1, "x"]',
+    )
+    assert [doc.page_content for doc in loader.load()] == ["1y", "2x", "2y", "3x", "3y"]
+
+
+def test_lazy_load_pages_invalid_args(engine: MySQLEngine) -> None:
+    with pytest.raises(ValueError):
+        MySQLLoader(engine=engine, table_name="fruits", resume_from="[1]")
+    with pytest.raises(ValueError):
+        MySQLLoader(engine=engine, query="SELECT 1", page_size=10)
+    with pytest.raises(ValueError):
+        MySQLLoader(engine=engine, table_name="fruits", page_size=10, resume_from="x")
+
+
+@pytest.mark.parametrize("partition_by", ["range", "mod"])
+@pytest.mark.parametrize("ordered", [True, False])
+def test_lazy_load_parallel(
+    engine: MySQLEngine, partition_by: str, ordered: bool
+) -> None:
+    loader = MySQLLoader(
+        engine=engine, table_name="fruits", content_columns=["fruit_name"], batch_size=3
+    )
+    documents = list(
+        loader.lazy_load_parallel(
+            num_workers=2, num_partitions=4, partition_by=partition_by, ordered=ordered
+        )
+    )
+    ids = [doc.metadata["fruit_id"] for doc in documents]
+    assert sorted(ids) == list(range(1, 26))
+    if ordered and partition_by == "range":
+        assert ids == list(range(1, 26))
+
+
+def test_lazy_load_parallel_stops_early(engine: MySQLEngine) -> None:
+    with engine.connect() as conn:
+        # partitions larger than their queues, so running workers block
+        conn.execute(
+            sqlalchemy.text("INSERT INTO fruits (fruit_name) VALUES (:name)"),
+            [{"name": f"Banana {i}"} for i in range(375)],
+        )
+        conn.commit()
+    engine.set_metrics_sink(InMemoryMetricsSink())
+    loader = MySQLLoader(engine=engine, table_name="fruits", batch_size=1)
+    iterator = loader.lazy_load_parallel(num_workers=2, num_partitions=20, ordered=True)
+    assert isinstance(iterator, types.GeneratorType)
+    assert next(iterator).page_content == "1"
+    iterator.close()
+    # the key range query and the two running partitions, partitions that
+    # had not started when the load stopped are not queried
+    queries = sum(
+        histogram["count"]
+        for histogram in engine._metrics_sink.snapshot()["histograms"]  # type: ignore[union-attr]
+        if histogram["name"] == "statement.duration"
+        and histogram["operation"] == "loader.lazy_load_parallel"
+    )
+    assert queries == 3
+
+
+def test_lazy_load_parallel_invalid_args(engine: MySQLEngine) -> None:
+    with pytest.raises(ValueError):
+        MySQLLoader(engine=engine, query="SELECT 1").lazy_load_parallel()
+    with pytest.raises(ValueError):
+        MySQLLoader(engine=engine, table_name="fruits").lazy_load_parallel(
+            partition_by="hash"
+        )
+
+
+@pytest.mark.parametrize("batch_size", [1, 2, 1000])
+def test_save_documents_in_batches(engine: MySQLEngine, batch_size: int) -> None:
+    engine.init_document_table(
+        "docs",
+        metadata_columns=[sqlalchemy.Column("fruit_name", sqlalchemy.UnicodeText)],
+        store_metadata=False,
+    )
+    docs = [
+        Document(page_content=f"doc {i}", metadata={"fruit_name": f"Apple {i}"})
+        for i in range(3)
+    ] + [
+        Document(page_content="plain", metadata={"fruit_name": None}),
+    ]
+    saver = MySQLDocumentSaver(engine=engine, table_name="docs")
+    # the last document only fills page_content and is inserted separately
+    saver.add_documents(docs[:-1] + [Document(page_content="plain")], batch_size)
+
+    loader = MySQLLoader(engine=engine, table_name="docs")
+    loaded = loader.load()
+    assert sorted(loaded, key=lambda doc: doc.page_content) == sorted(
+        docs, key=lambda doc: doc.page_content
+    )
+
+
+def test_save_documents_groups_metadata_in_any_order(engine: MySQLEngine) -> None:
+    engine.init_document_table(
+        "docs",
+        metadata_columns=[
+            sqlalchemy.Column("fruit_name", sqlalchemy.UnicodeText),
+            sqlalchemy.Column("organic", sqlalchemy.Integer),
+        ],
+        store_metadata=False,
+    )
+    docs = [
+        Document(page_content="a", metadata={"fruit_name": "Apple", "organic": 1}),
+        Document(page_content="b", metadata={"organic": 0, "fruit_name": "Banana"}),
+    ]
+    engine.set_metrics_sink(InMemoryMetricsSink())
+    MySQLDocumentSaver(engine=engine, table_name="docs").add_documents(docs)
+    inserts = sum(
+        histogram["count"]
+        for histogram in engine._metrics_sink.snapshot()["histograms"]  # type: ignore[union-attr]
+        if histogram["name"] == "statement.duration"
+        and histogram["operation"] == "document_saver.add_documents"
+    )
+    assert inserts == 1
+    loaded = MySQLLoader(engine=engine, table_name="docs").load()
+    assert sorted(loaded, key=lambda doc: doc.page_content) == docs
+
+
+def test_delete_documents_by_fingerprint(engine: MySQLEngine) -> None:
+    engine.init_document_table(
+        "docs",
+        metadata_columns=[sqlalchemy.Column("fruit_name", sqlalchemy.UnicodeText)],
+        store_metadata=False,
+        store_fingerprint=True,
+    )
+    docs = [
+        Document(page_content=f"doc {i}", metadata={"fruit_name": f"Apple {i}"})
+        for i in range(5)
+    ]
+    saver = MySQLDocumentSaver(engine=engine, table_name="docs")
+    saver.add_documents(docs + docs[:1])
+    loader = MySQLLoader(engine=engine, table_name="docs")
+    # the fingerprint column is not part of the loaded metadata
+    assert loader.load()[0] == docs[0]
+
+    saver.delete(loader.load()[:1] + docs[3:], batch_size=2)
+    assert loader.load() == docs[1:3]
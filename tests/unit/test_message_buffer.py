@@ -0,0 +1,172 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pathlib
+import threading
+from typing import Any, List
+
+import pytest
+import sqlalchemy
+from langchain_core.messages import AIMessage, HumanMessage
+
+from langchain_google_cloud_sql_mysql import (
+    InMemoryMetricsSink,
+    MessageWriteBuffer,
+    MySQLEngine,
+    message_buffer,
+)
+
+
+@pytest.fixture(name="engine")
+def setup(tmp_path: pathlib.Path) -> MySQLEngine:
+    engine = MySQLEngine(
+        sqlalchemy.create_engine(f"sqlite:///{tmp_path / 'chat.db'}"),
+        metrics_sink=InMemoryMetricsSink(),
+    )
+    with engine.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                "CREATE TABLE message_store (id INTEGER PRIMARY KEY, "
+                "session_id TEXT, data TEXT, type TEXT)"
+            )
+        )
+        conn.commit()
+    return engine
+
+
+def _rows(engine: MySQLEngine) -> List[tuple]:
+    with engine.connect() as conn:
+        rows = conn.execute(
+            sqlalchemy.text("SELECT session_id, type FROM message_store ORDER BY id")
+        ).fetchall()
+    return [tuple(row) for row in rows]
+
+
+def _flushes(engine: MySQLEngine) -> int:
+    sink = engine._metrics_sink
+    return sum(
+        histogram["count"]
+        for histogram in sink.snapshot()["histograms"]  # type: ignore[union-attr]
+        if histogram["operation"] == "chat_history.flush"
+        and histogram["name"] == "statement.duration"
+    )
+
+
+def test_buffer_coalesces_sessions(engine: MySQLEngine) -> None:
+    with MessageWriteBuffer(engine, max_messages=100, flush_interval=60) as buffer:
+        buffer.add("message_store", "a", [HumanMessage(content="hi")])
+        buffer.add("message_store", "b", [HumanMessage(content="hello")])
+        buffer.add("message_store", "a", [AIMessage(content="whats up?")])
+        assert buffer.has_pending("message_store", "a")
+        assert _rows(engine) == []
+        buffer.flush()
+        assert not buffer.has_pending("message_store", "a")
+    assert _rows(engine) == [("a", "human"), ("b", "human"), ("a", "ai")]
+    # one executemany statement for all three messages
+    assert _flushes(engine) == 1
+
+
+def test_buffer_flushes_on_size(engine: MySQLEngine) -> None:
+    buffer = MessageWriteBuffer(
+        engine, max_messages=2, flush_interval=60, wait_for_flush=True
+    )
+    threads = [
+        threading.Thread(
+            target=buffer.add,
+            args=("message_store", str(i), [HumanMessage(content="hi")]),
+        )
+        for i in range(2)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(timeout=10)
+    # both writers returned once their messages were committed together
+    assert len(_rows(engine)) == 2
+    buffer.close()
+
+
+def test_buffer_flushes_on_close(engine: MySQLEngine) -> None:
+    buffer = MessageWriteBuffer(engine, flush_interval=60)
+    buffer.add("message_store", "a", [HumanMessage(content="hi")])
+    buffer.close()
+    assert _rows(engine) == [("a", "human")]
+    with pytest.raises(ValueError):
+        buffer.add("message_store", "a", [HumanMessage(content="hi")])
+
+
+def test_buffer_reports_flush_errors(engine: MySQLEngine) -> None:
+    buffer = MessageWriteBuffer(engine, flush_interval=60)
+    buffer.add("missing_table", "a", [HumanMessage(content="hi")])
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        buffer.flush()
+    # the failed rows are kept, ahead of the ones added since
+    assert buffer.has_pending("missing_table", "a")
+    buffer.add("missing_table", "b", [AIMessage(content="hello")])
+    with engine.connect() as conn:
+        conn.execute(
+            sqlalchemy.text(
+                "CREATE TABLE missing_table (id INTEGER PRIMARY KEY, "
+                "session_id TEXT, data TEXT, type TEXT)"
+            )
+        )
+        conn.commit()
+    buffer.flush()
+    assert not buffer.has_pending("missing_table", "a")
+    buffer.close()
+    with engine.connect() as conn:
+        rows = conn.execute(
+            sqlalchemy.text("SELECT session_id, type FROM missing_table ORDER BY id")
+        ).fetchall()
+    assert [tuple(row) for row in rows] == [("a", "human"), ("b", "ai")]
+
+
+def test_buffer_drops_failed_batch_of_waiting_writers(engine: MySQLEngine) -> None:
+    buffer = MessageWriteBuffer(
+        engine, max_messages=1, flush_interval=60, wait_for_flush=True
+    )
+    with pytest.raises(sqlalchemy.exc.OperationalError):
+        buffer.add("missing_table", "a", [HumanMessage(content="hi")])
+    # the writer was told, so the rows are neither retried nor reported again
+    assert not buffer.has_pending("missing_table", "a")
+    buffer.add("message_store", "a", [HumanMessage(content="hi")])
+    buffer.close()
+    assert _rows(engine) == [("a", "human")]
+
+
+def test_buffer_in_flight_messages_are_pending(
+    engine: MySQLEngine, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    inserting, release = threading.Event(), threading.Event()
+    insert_messages = message_buffer._insert_messages
+
+    def slow_insert(*args: Any) -> None:
+        inserting.set()
+        release.wait(10)
+        insert_messages(*args)
+
+    monkeypatch.setattr(message_buffer, "_insert_messages", slow_insert)
+    buffer = MessageWriteBuffer(engine, flush_interval=60)
+    buffer.add("message_store", "a", [HumanMessage(content="hi")])
+    flusher = threading.Thread(target=buffer.flush)
+    flusher.start()
+    assert inserting.wait(10)
+    assert buffer.has_pending("message_store", "a")
+    release.set()
+    # a read flushes first, which waits for the flush in progress
+    buffer.flush()
+    assert _rows(engine) == [("a", "human")]
+    assert not buffer.has_pending("message_store", "a")
+    flusher.join()
+    buffer.close()
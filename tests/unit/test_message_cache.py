@@ -0,0 +1,56 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from langchain_core.messages import HumanMessage
+
+from langchain_google_cloud_sql_mysql import MessageCache
+from langchain_google_cloud_sql_mysql.message_cache import _CacheEntry
+
+
+def _entry(size: int) -> _CacheEntry:
+    return _CacheEntry((HumanMessage(content="hi"),), 1, 1, size)
+
+
+def test_cache_evicts_least_recently_used_session() -> None:
+    cache = MessageCache(max_sessions=2)
+    cache.put(("t", "a"), _entry(1))
+    cache.put(("t", "b"), _entry(1))
+    assert cache.get(("t", "a")) is not None
+    cache.put(("t", "c"), _entry(1))
+    assert cache.get(("t", "b")) is None
+    assert cache.get(("t", "a")) is not None
+    assert len(cache) == 2
+
+
+def test_cache_bounded_by_bytes() -> None:
+    cache = MessageCache(max_bytes=10)
+    cache.put(("t", "a"), _entry(6))
+    cache.put(("t", "b"), _entry(6))
+    assert cache.get(("t", "a")) is None
+    assert cache.get(("t", "b")) is not None
+    # entries larger than the whole budget are not cached
+    cache.put(("t", "b"), _entry(11))
+    assert len(cache) == 0
+
+
+def test_cache_mark_stale_and_invalidate() -> None:
+    cache = MessageCache()
+    cache.put(("t", "a"), _entry(1))
+    cache.mark_stale(("t", "a"))
+    assert cache.get(("t", "a")).stale  # type: ignore[union-attr]
+    cache.invalidate(("t", "a"))
+    assert cache.get(("t", "a")) is None
+    with pytest.raises(ValueError):
+        MessageCache(max_sessions=0)
@@ -0,0 +1,63 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+import sqlalchemy
+
+from langchain_google_cloud_sql_mysql import (
+    InMemoryMetricsSink,
+    MetricEvent,
+    MySQLEngine,
+)
+
+
+def test_engine_metrics() -> None:
+    sink = InMemoryMetricsSink()
+    engine = MySQLEngine(
+        sqlalchemy.create_engine("sqlite://", poolclass=sqlalchemy.pool.QueuePool),
+        metrics_sink=sink,
+    )
+    with engine.connect("test.select") as conn:
+        conn.execute(sqlalchemy.text("SELECT 1"))
+        conn.execute(sqlalchemy.text("SELECT 2"))
+        with pytest.raises(sqlalchemy.exc.OperationalError):
+            conn.execute(sqlalchemy.text("SELECT * FROM missing_table"))
+
+    snapshot = sink.snapshot()
+    counters = {(c["name"], c["operation"]): c["value"] for c in snapshot["counters"]}
+    histograms = {(h["name"], h["operation"]): h for h in snapshot["histograms"]}
+    assert counters[("pool.connections_opened", "")] == 1
+    assert counters[("statement.errors", "test.select")] == 1
+    assert histograms[("pool.checkout_wait", "test.select")]["count"] == 1
+    statements = histograms[("statement.duration", "test.select")]
+    assert statements["count"] == 2
+    assert sum(statements["bucket_counts"]) == 2
+
+
+def test_engine_metrics_sink_errors_are_ignored() -> None:
+    def failing_sink(event: MetricEvent) -> None:
+        raise RuntimeError("sink is down")
+
+    engine = MySQLEngine(sqlalchemy.create_engine("sqlite://"))
+    engine.set_metrics_sink(failing_sink)
+    with engine.connect("test.select") as conn:
+        assert conn.execute(sqlalchemy.text("SELECT 1")).scalar() == 1
+
+
+def test_engine_metrics_disabled() -> None:
+    sink = InMemoryMetricsSink()
+    engine = MySQLEngine(sqlalchemy.create_engine("sqlite://"), metrics_sink=sink)
+    engine.set_metrics_sink(None)
+    with engine.connect("test.select") as conn:
+        conn.execute(sqlalchemy.text("SELECT 1"))
+    assert sink.snapshot() == {"counters": [], "histograms": []}
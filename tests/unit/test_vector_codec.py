@@ -0,0 +1,62 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import numpy as np
+import pytest
+
+from langchain_google_cloud_sql_mysql.vector_codec import EmbeddingCodec, EmbeddingDtype
+
+embedding = [0.5, -1.25, 3.0, 0.0]
+
+
+def test_float32_roundtrip():
+    codec = EmbeddingCodec("float32")
+    value = codec.encode(embedding)
+    assert len(value) == codec.byte_size(len(embedding)) == 16
+    assert value == np.array(embedding, dtype="<f4").tobytes()
+    decoded = codec.decode(value)
+    assert decoded.dtype == np.float32
+    assert decoded.tolist() == embedding
+    # float32 values are decoded without copying
+    assert not decoded.flags.writeable
+
+
+def test_float16_roundtrip():
+    codec = EmbeddingCodec(EmbeddingDtype.FLOAT16)
+    value = codec.encode(embedding)
+    assert len(value) == codec.byte_size(len(embedding)) == 8
+    assert codec.decode(value).tolist() == embedding
+
+
+def test_int8_roundtrip():
+    codec = EmbeddingCodec(EmbeddingDtype.INT8)
+    value = codec.encode(embedding)
+    assert len(value) == codec.byte_size(len(embedding)) == 8
+    np.testing.assert_allclose(codec.decode(value), embedding, atol=3.0 / 127)
+
+
+@pytest.mark.parametrize("dtype", list(EmbeddingDtype))
+def test_decode_many(dtype):
+    codec = EmbeddingCodec(dtype)
+    embeddings = np.random.default_rng(0).normal(size=(5, 8)).astype(np.float32)
+    values = [codec.encode(row) for row in embeddings]
+    matrix = codec.decode_many(values)
+    assert matrix.shape == (5, 8)
+    assert matrix.dtype == np.float32
+    for row, value in zip(matrix, values):
+        np.testing.assert_array_equal(row, codec.decode(value))
+
+
+def test_invalid_dtype():
+    with pytest.raises(ValueError):
+        EmbeddingCodec("float64")
@@ -0,0 +1,161 @@
+# Copyright 2024 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+import pytest
+
+from langchain_google_cloud_sql_mysql.mysql_vectorstore import (
+    _batch_rows,
+    _compile_filter,
+    _content_hash,
+    _estimate_row_bytes,
+)
+
+
+def test_batch_rows_by_count():
+    rows = [{"p0": str(i)} for i in range(7)]
+    batches = list(_batch_rows(rows, batch_size=3, max_batch_bytes=10**6))
+    assert [len(batch) for batch in batches] == [3, 3, 1]
+    assert [row for batch in batches for row in batch] == rows
+
+
+def test_batch_rows_by_bytes():
+    rows = [{"p0": "x" * 100} for _ in range(5)]
+    row_bytes = _estimate_row_bytes(rows[0])
+    batches = list(_batch_rows(rows, batch_size=100, max_batch_bytes=2 * row_bytes))
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_batch_rows_oversized_row():
+    rows = [{"p0": "x" * 1000}, {"p0": "y"}]
+    batches = list(_batch_rows(rows, batch_size=100, max_batch_bytes=10))
+    assert [len(batch) for batch in batches] == [1, 1]
+
+
+def test_batch_rows_invalid_batch_size():
+    with pytest.raises(ValueError):
+        list(_batch_rows([{"p0": "x"}], batch_size=0, max_batch_bytes=10))
+
+
+def test_content_hash():
+    assert _content_hash("foo") == _content_hash("foo")
+    assert _content_hash("foo") != _content_hash("bar")
+    # metadata is hashed in canonical key order
+    assert _content_hash("foo", {"a": 1, "b": 2}) == _content_hash(
+        "foo", {"b": 2, "a": 1}
+    )
+    assert _content_hash("foo", {"a": 1}) != _content_hash("foo", {"a": 2})
+    assert _content_hash("foo", {}) != _content_hash("foo")
+
+
+def test_compile_filter_columns_and_json():
+    where, params = _compile_filter(
+        {"tenant": "acme", "year": {"$gte": 2020, "$lt": 2024}},
+        ["tenant"],
+        "langchain_metadata",
+    )
+    assert where == (
+        "WHERE (`tenant` = :filter_0"
+        " AND JSON_EXTRACT(`langchain_metadata`, :filter_1) >= :filter_2"
+        " AND JSON_EXTRACT(`langchain_metadata`, :filter_3) < :filter_4)"
+    )
+    assert params == {
+        "filter_0": "acme",
+        "filter_1": '$."year"',
+        "filter_2": 2020,
+        "filter_3": '$."year"',
+        "filter_4": 2024,
+    }
+
+
+def test_compile_filter_logical_and_list_operators():
+    where, params = _compile_filter(
+        {
+            "$or": [
+                {"tenant": {"$in": ["a", "b"]}},
+                {"tags.primary": {"$nin": ["x"]}},
+            ],
+            "archived": False,
+        },
+        ["tenant"],
+        "langchain_metadata",
+    )
+    assert where == (
+        "WHERE (((`tenant` IN :filter_0)"
+        " OR (JSON_EXTRACT(`langchain_metadata`, :filter_1) IS NULL"
+        " OR NOT (JSON_EXTRACT(`langchain_metadata`, :filter_1) = :filter_2)))"
+        " AND JSON_EXTRACT(`langchain_metadata`, :filter_3)"
+        " = CAST(:filter_4 AS JSON))"
+    )
+    assert params["filter_0"] == ["a", "b"]
+    assert params["filter_1"] == '$."tags"."primary"'
+    assert params["filter_4"] == "false"
+
+
+def test_compile_filter_null_and_exists():
+    where, _ = _compile_filter(
+        {"tenant": None, "source": {"$exists": True, "$ne": None}},
+        ["tenant"],
+        "langchain_metadata",
+    )
+    assert where == (
+        "WHERE (`tenant` IS NULL"
+        " AND JSON_EXTRACT(`langchain_metadata`, :filter_0) IS NOT NULL"
+        " AND COALESCE(JSON_TYPE(JSON_EXTRACT(`langchain_metadata`, :filter_1)),"
+        " 'NULL') != 'NULL')"
+    )
+
+
+def test_compile_filter_ne_matches_null_columns():
+    where, params = _compile_filter(
+        {"tenant": {"$ne": "acme"}, "region": {"$nin": ["eu"]}},
+        ["tenant", "region"],
+        "langchain_metadata",
+    )
+    assert where == (
+        "WHERE ((`tenant` IS NULL OR `tenant` != :filter_0)"
+        " AND (`region` IS NULL OR NOT (`region` IN :filter_1)))"
+    )
+    assert params == {"filter_0": "acme", "filter_1": ["eu"]}
+
+
+def test_compile_filter_ne_matches_missing_json_keys():
+    where, params = _compile_filter(
+        {"source": {"$ne": "web"}}, ["tenant"], "langchain_metadata"
+    )
+    assert where == (
+        "WHERE (JSON_EXTRACT(`langchain_metadata`, :filter_0) IS NULL"
+        " OR JSON_EXTRACT(`langchain_metadata`, :filter_0) != :filter_1)"
+    )
+    assert params == {"filter_0": '$."source"', "filter_1": "web"}
+
+
+@pytest.mark.parametrize(
+    "filter",
+    [
+        {},
+        {"$not": {"a": 1}},
+        {"a": {"$like": "x"}},
+        {"a": {"$in": "x"}},
+        {"a": {"$eq": [1, 2]}},
+        {"a": [1, 2]},
+        {"$and": []},
+    ],
+)
+def test_compile_filter_invalid(filter):
+    with pytest.raises(ValueError):
+        _compile_filter(filter, ["tenant"], "langchain_metadata")
+
+
+def test_compile_filter_without_json_column():
+    with pytest.raises(ValueError):
+        _compile_filter({"other": 1}, ["tenant"], None)